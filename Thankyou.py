@@ -1,8 +1,8 @@
+import json
 import streamlit as st
 from datetime import datetime
-import subprocess
-import sys
-import os
+
+from session_summary import report_csv
 
 # Page config
 st.set_page_config(
@@ -295,6 +295,31 @@ st.markdown("""
 # Spacer
 st.markdown("<br>", unsafe_allow_html=True)
 
+# Trip summary (aggregated during the session, so this is instant)
+report = st.session_state.get("last_summary")
+if report:
+    st.markdown("### 📋 Your Session Summary")
+    mins, secs = divmod(int(report["duration_secs"]), 60)
+    cols = st.columns(5)
+    cols[0].metric("Duration", f"{mins:02d}:{secs:02d}")
+    cols[1].metric("Alerts", report["total_alerts"])
+    cols[2].metric("Longest closure", f"{report['longest_closure_secs']:.1f}s")
+    cols[3].metric("PERCLOS", f"{report['perclos']:.1%}" if report["perclos"] is not None else "--")
+    cols[4].metric("Blinks / min", report["blinks_per_min"] if report["blinks_per_min"] is not None else "--")
+    if report["alerts"]:
+        st.markdown("**Alerts by type:** " + ", ".join(f"{k.title()} {v}" for k, v in report["alerts"].items()))
+    if report["speed_bands"]:
+        st.markdown("**By speed:** " + " · ".join(
+            f"{band} km/h: {row['minutes']:.1f} min, {row['alerts']} alerts"
+            for band, row in report["speed_bands"].items()))
+    dl1, dl2 = st.columns(2)
+    dl1.download_button("⬇ Download JSON", json.dumps(report, indent=2),
+                        file_name="session_summary.json", mime="application/json")
+    dl2.download_button("⬇ Download CSV",
+                        report_csv(report),
+                        file_name="session_summary.csv", mime="text/csv")
+    st.markdown("<br>", unsafe_allow_html=True)
+
 # Contact Form Section
 st.markdown("""
     <div class="contact-section">
@@ -372,11 +397,7 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# Optional: Add a back button (FIXED - opens in new tab like login.py)
+# Back to the dashboard (same app, same session)
 st.markdown("<br>", unsafe_allow_html=True)
 if st.button("🔙 Back to Detection System"):
-    if os.path.exists("driver_fatigue_dashboard.py"):
-        subprocess.Popen([sys.executable, "-m", "streamlit", "run", "driver_fatigue_dashboard.py"])
-        st.success("🚗 Driver Fatigue Dashboard is opening in a new window!")
-    else:
-        st.error("❌ Could not find driver_fatigue_dashboard.py in the current directory")
\ No newline at end of file
+    st.switch_page("driver_fatigue_dashboard.py")
@@ -0,0 +1,70 @@
+"""Parsing of the alert log the dashboards append to (fatigue_log.txt).
+
+Three line layouts have been written over time:
+
+    2025-10-16 16:32:01 | ALERT #5 | EAR=0.109 | MAR=0.215 | Speed=60 km/h | Weather=Clear | Time=Day
+    2025-10-13 14:46:41.114583 | ALERT | EAR=0.229 | MAR=0.638 | Speed=30 | Weather=Clear | Time=Day
+    2025-10-14 09:19:31.614118 - EAR: 0.26, MAR: 0.27, Status: Alert
+
+The first may end in `| Type=DROWSINESS` and `| Clip=alert_clips/...`.
+`parse_line` turns any of them into one event dict; fields a layout doesn't
+carry are None.
+"""
+from datetime import datetime
+
+# ---------- Configuration ----------
+LOG_FILE = "fatigue_log.txt"
+EVENT_FIELDS = ("ts", "alert_no", "type", "ear", "mar", "speed", "weather", "time_period", "clip")
+
+_KEYS = {"EAR": "ear", "MAR": "mar", "Speed": "speed", "Weather": "weather",
+         "Time": "time_period", "Type": "type", "Clip": "clip"}
+
+
+def _number(text):
+    try:
+        return float(text.split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_line(line):
+    """Event dict for one log line, or None if the line isn't an alert record"""
+    line = line.strip()
+    if " | " in line:
+        parts = line.split(" | ")
+        stamp, tag, fields = parts[0], parts[1], parts[2:]
+        if not tag.startswith("ALERT"):
+            return None
+        alert_no = tag[len("ALERT #"):] if tag.startswith("ALERT #") else None
+        pairs = (f.partition("=") for f in fields)
+    elif " - " in line:
+        # Oldest layout: "EAR: 0.26, MAR: 0.27, Status: Alert"
+        stamp, _, rest = line.partition(" - ")
+        alert_no = None
+        pairs = (f.strip().partition(": ") for f in rest.split(", "))
+    else:
+        return None
+    try:
+        ts = datetime.fromisoformat(stamp).timestamp()
+    except ValueError:
+        return None
+
+    event = dict.fromkeys(EVENT_FIELDS)
+    event["ts"] = ts
+    event["alert_no"] = int(alert_no) if alert_no and alert_no.isdigit() else None
+    for key, _, value in pairs:
+        field = _KEYS.get(key)
+        if field in ("ear", "mar", "speed"):
+            event[field] = _number(value)
+        elif field:
+            event[field] = value
+    return event
+
+
+def read_log(path=LOG_FILE):
+    """Yield the parsed events of a log file, skipping lines that don't parse"""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            event = parse_line(line)
+            if event is not None:
+                yield event
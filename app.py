@@ -0,0 +1,30 @@
+"""Driver Fatigue Detection - single Streamlit app.
+
+Run with `streamlit run app.py`. The landing, login, dashboard and thank-you
+pages are served from this one process and share one session, so moving
+between them is an in-process page switch (`st.switch_page`) rather than a
+new Streamlit server. Each page still sets its own page config.
+"""
+import streamlit as st
+
+from session_resources import release
+
+# ---------- Pages ----------
+landing_page = st.Page("landing.py", title="Driver Fatigue Detection", icon="🚗", default=True)
+login_page = st.Page("login.py", title="Login", icon="🔑", url_path="login")
+dashboard_page = st.Page("driver_fatigue_dashboard.py", title="Dashboard", icon="📊",
+                         url_path="dashboard")
+thankyou_page = st.Page("Thankyou.py", title="Thank You", icon="💜", url_path="thank-you")
+
+page = st.navigation([landing_page, login_page, dashboard_page, thankyou_page],
+                     position="hidden")
+
+# The camera, metrics buffer and clip recorder are only held while the dashboard is on screen
+if page.url_path != dashboard_page.url_path:
+    if "cap" in st.session_state:
+        st.session_state.pop("cap").release()
+        st.session_state.pop("cap_source", None)
+    release("metrics_buffer")
+    release("clip_recorder")
+
+page.run()
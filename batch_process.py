@@ -0,0 +1,222 @@
+"""Parallel reprocessing of long recordings.
+
+    python batch_process.py trip.mp4 [--workers N] [--out results.csv]
+
+The video is split into segments, aligned to keyframes when ffprobe is
+available so every seek lands on a frame the decoder can start from.
+Segments are handed to a process pool in which every worker owns its own
+capture and landmark backend, and decodes a few frames ahead of its segment
+so landmark tracking is warm at the boundary. Workers only extract per-frame
+measurements (EAR, MAR, head pose, gaze); the alert state machine is stateful
+across frames, so the parent feeds the stitched, in-order measurements
+through one `FatigueDetector` on video time. Closures and yawns that straddle
+a segment boundary are therefore timed exactly as in a sequential run.
+
+Splitting relies on the container's frame count. When it is missing or wrong
+(no frame can be read at count - 1) the video is decoded sequentially by one
+worker instead. The last segment always reads to the end of the stream, and a
+segment that ends early raises rather than shifting later frame numbers.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import subprocess
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from detector import FatigueDetector
+
+SEGMENTS_PER_WORKER = 4      # Smaller segments balance load when some decode slower
+SEGMENT_OVERLAP = 12         # Frames decoded before each segment to warm up tracking
+
+
+# ---------- Planning ----------
+def video_info(path):
+    """Return (frame_count, fps) of a video file; frame_count is 0 when it can't be trusted"""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video {path!r}")
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    # Some containers report 0 or an estimate; an overestimate shows up as a failed seek
+    if frame_count > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count - 1)
+        if not cap.grab():
+            frame_count = 0
+    cap.release()
+    return max(0, frame_count), fps
+
+
+def keyframe_indices(path, fps):
+    """Frame indices of keyframes via ffprobe, or None if ffprobe isn't installed"""
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+             "-show_entries", "frame=pts_time", "-of", "csv=p=0", path],
+            capture_output=True, text=True, check=True
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    frames = sorted({round(float(t) * fps) for t in out.split() if t.strip() not in ("", "N/A")})
+    return frames or None
+
+
+def plan_segments(frame_count, segments, keyframes=None, overlap=SEGMENT_OVERLAP):
+    """Split [0, frame_count) into up to `segments` (decode_from, start, end) ranges.
+
+    Decoding starts `overlap` frames before the first emitted frame so the
+    landmark tracker and head-pose fit are warm when results start to count.
+    The last range's end is None: it reads until the stream ends, so frames
+    past an underestimated count are still processed. A count of 0 (unknown)
+    gives one range covering the whole video.
+    """
+    if frame_count <= 0:
+        return [(0, 0, None)]
+    step = max(1, frame_count // max(1, segments))
+    bounds = list(range(0, frame_count, step))[1:]
+    if keyframes:
+        import bisect
+
+        # Snap each decode start back to the closest keyframe at or before it
+        bounds = [keyframes[bisect.bisect_right(keyframes, b) - 1] for b in bounds]
+    decode_starts = sorted({0, *[b for b in bounds if 0 < b and b + overlap < frame_count]})
+    starts = [0] + [d + overlap for d in decode_starts[1:]]
+    return list(zip(decode_starts, starts, starts[1:] + [None]))
+
+
+# ---------- Workers ----------
+_worker = {}
+
+
+def _init_worker(path, backend):
+    from landmark_backends import create_backend
+    from head_pose import HeadPoseEstimator
+    from preprocess import LowLightEnhancer
+
+    _worker["path"] = path
+    _worker["backend"] = create_backend(backend)
+    _worker["head_pose"] = HeadPoseEstimator()
+    _worker["enhancer"] = LowLightEnhancer()
+
+
+def _process_segment(segment):
+    """Measurements for every frame in [start, end) (end None: to the end of the stream).
+
+    Returns (start, end, rows), rows holding (left_ear, right_ear, mar, pose, gaze)
+    or None for frames without a face.
+    """
+    import cv2
+    from fatigue_core import frame_metrics
+    from gaze import gaze_ratios
+
+    decode_from, start, end = segment
+    backend, head_pose, enhancer = _worker["backend"], _worker["head_pose"], _worker["enhancer"]
+    head_pose.reset()
+    cap = cv2.VideoCapture(_worker["path"])
+    if decode_from:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, decode_from)
+    rows = []
+    for index in itertools.count(decode_from):
+        if end is not None and index >= end:
+            break
+        ret, frame = cap.read()
+        if not ret:
+            break
+        h, w = frame.shape[:2]
+        frame_rgb = enhancer.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        lm = backend.detect(frame_rgb)
+        enhancer.track(lm, w, h)
+        pose = head_pose.estimate(lm, w, h) if lm is not None else None
+        if index < start:
+            continue
+        if lm is None:
+            rows.append(None)
+            continue
+        left_ear, right_ear, mar = frame_metrics(lm, w, h)
+        rows.append((left_ear, right_ear, mar, pose, gaze_ratios(lm)))
+    cap.release()
+    return start, end, rows
+
+
+# ---------- Driver ----------
+def process_video(path, workers=None, backend=None, speed=60, weather="Clear", time_period="Day"):
+    """Yield one detector result per frame, in order, with `t` in video seconds"""
+    frame_count, fps = video_info(path)
+    if frame_count <= 0:
+        print(f"{path}: frame count missing or unreliable, decoding sequentially")
+        workers = 1
+    workers = workers or os.cpu_count() or 1
+    segments = plan_segments(frame_count, workers * SEGMENTS_PER_WORKER,
+                             keyframe_indices(path, fps) if frame_count > 0 else None)
+    detector = FatigueDetector(speed=speed, weather=weather, time_period=time_period)
+
+    with Pool(workers, initializer=_init_worker, initargs=(path, backend)) as pool:
+        # imap keeps segment order while later segments are still being decoded
+        for start, end, rows in pool.imap(_process_segment, segments):
+            # A short segment would shift every later frame number off video time; the last
+            # one may end anywhere, but must start where the plan (a verified count) put it
+            short = len(rows) != end - start if end is not None else start and not rows
+            if short:
+                raise IOError(f"{path}: segment starting at frame {start} decoded {len(rows)} "
+                              f"of {'?' if end is None else end - start} frames "
+                              f"(seek or decode failure)")
+            for i, row in enumerate(rows):
+                now = (start + i) / fps
+                if row is None:
+                    result = detector.update(None, None, None, now)
+                else:
+                    result = detector.update(*row[:3], now, row[3], row[4])
+                result["frame"] = start + i
+                yield result
+
+
+RESULT_FIELDS = ["frame", "t", "status", "alert", "ear", "mar", "pitch",
+                 "closed_secs", "off_road_secs"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess a recorded trip on all cores")
+    parser.add_argument("video")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--out", help="per-frame results (.csv or .jsonl)")
+    parser.add_argument("--speed", type=float, default=60)
+    parser.add_argument("--weather", default="Clear")
+    parser.add_argument("--time", default="Day")
+    args = parser.parse_args()
+
+    out = open(args.out, "w", newline="") if args.out else None
+    writer = None
+    if out and not args.out.endswith(".jsonl"):
+        writer = csv.DictWriter(out, RESULT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+
+    started = time.perf_counter()
+    frames = 0
+    alerts = Counter()
+    try:
+        for result in process_video(args.video, args.workers, args.backend,
+                                    args.speed, args.weather, args.time):
+            frames += 1
+            if result["alert"]:
+                alerts[result["alert"]] += 1
+            if writer:
+                writer.writerow(result)
+            elif out:
+                out.write(json.dumps(result) + "\n")
+    finally:
+        if out:
+            out.close()
+
+    secs = time.perf_counter() - started
+    print(f"{frames} frames in {secs:.1f}s ({frames / secs:.1f} fps)")
+    print(f"Alerts: {dict(alerts) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare landmark backends on a recorded video.
+
+Runs every available backend over the same frames (the demo video by
+default, resized like the Streamlit app) and reports latency, sustainable
+fps, face detection rate and agreement with the refined MediaPipe mesh:
+mean EAR/MAR error and how often the eyes-closed decision matches.
+
+    python benchmark_backends.py [video] [--backends mediapipe,onnx] [--size 640x480]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from fatigue_core import frame_metrics
+from landmark_backends import BACKENDS, create_backend
+
+REFERENCE = "mediapipe"
+EAR_THRESH = 0.25
+
+
+def load_frames(path, size):
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB))
+    cap.release()
+    return frames
+
+
+def run_backend(name, frames):
+    """Per-frame latency (s) and (left_ear, right_ear, mar) or None for each frame"""
+    backend = create_backend(name)
+    backend.warm_up()
+    h, w = frames[0].shape[:2]
+    latencies, metrics = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        lm = backend.detect(frame)
+        latencies.append(time.perf_counter() - t0)
+        metrics.append(frame_metrics(lm, w, h) if lm is not None else None)
+    backend.close()
+    return np.array(latencies), metrics
+
+
+def compare(metrics, reference):
+    """Mean |EAR| / |MAR| error and eyes-closed agreement on frames both backends saw a face"""
+    pairs = [(m, r) for m, r in zip(metrics, reference) if m is not None and r is not None]
+    if not pairs:
+        return None, None, None
+    m = np.array([(a[0] + a[1]) / 2.0 for a, _ in pairs]), np.array([a[2] for a, _ in pairs])
+    r = np.array([(b[0] + b[1]) / 2.0 for _, b in pairs]), np.array([b[2] for _, b in pairs])
+    agree = np.mean((m[0] < EAR_THRESH) == (r[0] < EAR_THRESH))
+    return np.mean(np.abs(m[0] - r[0])), np.mean(np.abs(m[1] - r[1])), agree
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("video", nargs="?", default="driver_demo.mp4")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--size", default="640x480")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.split("x"))
+    frames = load_frames(args.video, size)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.video}")
+    print(f"{len(frames)} frames from {args.video} at {size[0]}x{size[1]}\n")
+
+    names = args.backends.split(",")
+    if REFERENCE not in names:
+        names.insert(0, REFERENCE)
+    results = {}
+    for name in names:
+        try:
+            results[name] = run_backend(name, frames)
+        except Exception as e:
+            print(f"{name:15s} skipped: {e}")
+
+    reference = results.get(REFERENCE, (None, None))[1]
+    print(f"\n{'backend':15s} {'mean ms':>8s} {'p95 ms':>8s} {'fps':>7s} {'face %':>7s} "
+          f"{'EAR err':>8s} {'MAR err':>8s} {'closed agree':>12s}")
+    for name, (lat, metrics) in results.items():
+        face = 100.0 * sum(m is not None for m in metrics) / len(metrics)
+        ear_err, mar_err, agree = compare(metrics, reference) if reference else (None,) * 3
+        fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+        print(f"{name:15s} {lat.mean() * 1000:8.2f} {np.percentile(lat, 95) * 1000:8.2f} "
+              f"{1.0 / lat.mean():7.1f} {face:7.1f} {fmt(ear_err, '8.4f'):>8s} "
+              f"{fmt(mar_err, '8.4f'):>8s} {fmt(None if agree is None else agree * 100, '11.1f'):>11s}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Open-eye calibration that runs inside the live detection loop.
+
+A `CalibrationSession` is fed the per-frame EAR the pipeline already
+computes, so calibrating never opens a second capture or blocks the UI.
+Progress and the final result are reported through callbacks; in the Tk app
+these are marshalled onto the main thread with `root.after`.
+
+`OnlineBaseline` keeps the open-eye baseline current during a shift by
+tracking the median EAR of attentive frames and easing the threshold
+towards it within fixed guard rails.
+"""
+import time
+
+import numpy as np
+
+# ---------- Configuration ----------
+CALIBRATION_SECS = 3.0
+MIN_SAMPLES = 10
+MIN_VALID_EAR = 0.1      # Filter out bad readings
+THRESH_RATIO = 0.65      # Alert threshold as a fraction of the open-eye EAR
+MIN_THRESH = 0.18
+
+
+# ---------- Helper Functions ----------
+def compute_baseline(ear_vals):
+    """Return (base_open_ear, ear_thresh) from raw samples, trimming the top/bottom 25%"""
+    ear_vals = sorted(ear_vals)
+    if len(ear_vals) > 4:
+        ear_vals = ear_vals[len(ear_vals)//4:-len(ear_vals)//4]
+    base_open_ear = float(np.mean(ear_vals))
+    return base_open_ear, max(MIN_THRESH, base_open_ear * THRESH_RATIO)
+
+
+# ---------- Calibration Session ----------
+class CalibrationSession:
+    """Collects open-eye EAR samples from the running stream for a fixed duration"""
+
+    def __init__(self, duration=CALIBRATION_SECS, min_samples=MIN_SAMPLES,
+                 on_progress=None, on_complete=None, on_error=None):
+        self.duration = duration
+        self.min_samples = min_samples
+        self.on_progress = on_progress
+        self.on_complete = on_complete
+        self.on_error = on_error
+        self.start_time = None
+        self.samples = []
+        self.active = True
+        self.base_open_ear = None
+        self.ear_thresh = None
+
+    def progress(self, now=None):
+        if self.start_time is None:
+            return 0.0
+        now = time.time() if now is None else now
+        return min(1.0, (now - self.start_time) / self.duration)
+
+    def feed(self, ear, now=None):
+        """Consume one frame's EAR (None when no face); returns False once finished"""
+        if not self.active:
+            return False
+        now = time.time() if now is None else now
+        if self.start_time is None:
+            self.start_time = now
+
+        if ear is not None and ear > MIN_VALID_EAR:
+            self.samples.append(ear)
+
+        fraction = self.progress(now)
+        if self.on_progress:
+            self.on_progress(fraction)
+        if fraction >= 1.0:
+            self._finish()
+        return self.active
+
+    def cancel(self):
+        self.active = False
+
+    def _finish(self):
+        self.active = False
+        if len(self.samples) < self.min_samples:
+            if self.on_error:
+                self.on_error("Not enough data. Face not detected properly.")
+            return
+        self.base_open_ear, self.ear_thresh = compute_baseline(self.samples)
+        if self.on_complete:
+            self.on_complete(self.base_open_ear, self.ear_thresh)
+
+
+# ---------- Online Recalibration ----------
+class P2Quantile:
+    """Streaming quantile estimate in O(1) memory (Jain & Chlamtac P-square)"""
+
+    def __init__(self, q=0.5):
+        self.q = q
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+
+    def add(self, x):
+        self.count += 1
+        if self.count <= 5:
+            self.heights.append(x)
+            self.heights.sort()
+            return
+
+        h, n = self.heights, self.positions
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # Nudge the three middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = candidate
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        h, n = self.heights, self.positions
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+
+    @property
+    def value(self):
+        if not self.heights:
+            return None
+        if self.count <= 5:
+            return self.heights[int(round(self.q * (len(self.heights) - 1)))]
+        return self.heights[2]
+
+
+class OnlineBaseline:
+    """Tracks the open-eye EAR from attentive frames and eases EAR_THRESH towards it"""
+
+    WARMUP_SAMPLES = 90          # ~3 s of attentive frames before adapting
+    GUARD_MIN = 0.15             # Same range as the threshold sliders
+    GUARD_MAX = 0.35
+    MAX_STEP_PER_SEC = 0.005     # Threshold never moves faster than this
+    WINDOW_SAMPLES = 9000        # Restart the estimate every ~5 min so it follows drift
+
+    def __init__(self, base_open_ear=None):
+        self.reset(base_open_ear)
+
+    def reset(self, base_open_ear=None):
+        """Start over, optionally seeded from a calibration or saved profile"""
+        self.estimator = P2Quantile(0.5)
+        self.previous = base_open_ear
+        self.base_open_ear = base_open_ear
+        self.last_update = None
+
+    def update(self, ear, current_thresh, now=None):
+        """Feed an attentive frame's EAR; returns the (possibly adjusted) threshold"""
+        now = time.time() if now is None else now
+        if ear is None or ear <= MIN_VALID_EAR:
+            return current_thresh
+
+        self.estimator.add(ear)
+        if self.estimator.count >= self.WINDOW_SAMPLES:
+            # Keep the current estimate as a prior while the next window fills
+            self.previous = self.estimator.value
+            self.estimator = P2Quantile(0.5)
+
+        if self.estimator.count >= self.WARMUP_SAMPLES:
+            self.base_open_ear = self.estimator.value
+        elif self.previous is not None:
+            self.base_open_ear = self.previous
+        if self.base_open_ear is None:
+            return current_thresh
+
+        target = max(MIN_THRESH, self.base_open_ear * THRESH_RATIO)
+        target = min(self.GUARD_MAX, max(self.GUARD_MIN, target))
+
+        # Gaps (eyes closed, no face) don't bank up a large jump
+        dt = 0.0 if self.last_update is None else min(1.0, now - self.last_update)
+        self.last_update = now
+        max_step = self.MAX_STEP_PER_SEC * dt
+        return current_thresh + max(-max_step, min(max_step, target - current_thresh))
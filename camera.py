@@ -0,0 +1,258 @@
+"""Capture manager with stall detection and background reconnect.
+
+`CaptureManager` owns the `cv2.VideoCapture`. For a live camera a reader
+thread keeps the newest frame, so `read()` never blocks longer than its
+timeout even if the driver hangs inside `cap.read()`. A read failure, or no
+new frame for `STALL_SECS`, marks the camera lost; the manager then reopens
+the device in the background with exponential backoff while the detection
+loop keeps running and shows CAMERA LOST. Video files are read in step with
+the caller (no frames dropped) and can loop for demo mode.
+
+Cameras are asked for exactly what the pipeline consumes (`CaptureConfig`):
+the processing resolution, a frame rate, MJPEG over USB and a one-frame
+driver buffer. What the device actually granted is kept in `negotiated`,
+and `delivered_fps` measures what it really sends.
+"""
+import threading
+import time
+
+# ---------- Configuration ----------
+STALL_SECS = 2.0         # No new frame for this long counts as a lost camera
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = 8.0
+READ_TIMEOUT = 0.5
+FPS_SMOOTHING = 0.05
+
+CAMERA_LOST = "CAMERA LOST"
+
+
+class CaptureConfig:
+    """Requested camera mode; None leaves a property at the driver default"""
+
+    def __init__(self, width=640, height=480, fps=30, fourcc="MJPG", buffer_size=1):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.fourcc = fourcc
+        self.buffer_size = buffer_size
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
+def fit_frame(frame, size):
+    """Resize to (width, height) only when the camera didn't already deliver that size"""
+    if frame.shape[1] == size[0] and frame.shape[0] == size[1]:
+        return frame
+    import cv2
+
+    return cv2.resize(frame, size)
+
+
+def _decode_fourcc(value):
+    code = int(value)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00")
+
+
+class CaptureManager:
+    """Drop-in for the `read()` / `isOpened()` / `release()` use of VideoCapture"""
+
+    def __init__(self, source=0, loop=False, metrics=None, stall_secs=STALL_SECS, config=None):
+        self.source = source
+        self.loop = loop
+        self.metrics = metrics
+        self.stall_secs = stall_secs
+        self.config = config or CaptureConfig()
+        self.negotiated = {}
+        self.delivered_fps = 0.0
+        self.is_file = not isinstance(source, int)
+        self.connected = False
+        self.reconnects = 0
+        self._cap = None
+        self._released = False
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._read_seq = 0
+        self._last_frame_time = None
+        self._generation = 0
+        self._stall_backoff = 0.0
+
+    # ---------- Lifecycle ----------
+    def open(self, retry=False):
+        """Open the source; returns False if it can't be opened right now.
+
+        With retry=True a camera that is missing at startup keeps being
+        retried in the background, as if it had been unplugged mid-trip.
+        """
+        import cv2
+
+        if self.is_file:
+            self._cap = cv2.VideoCapture(self.source)
+            self._set_connected(self._cap.isOpened())
+            return self.connected
+
+        cap = self._open_camera()
+        if cap is None:
+            if retry:
+                self._start_reader(None)
+            return False
+        self._start_reader(cap)
+        return True
+
+    @property
+    def source_fps(self):
+        """Frame rate reported by a video file (0 for cameras, which pace themselves)"""
+        import cv2
+
+        if self.is_file and self._cap is not None:
+            return self._cap.get(cv2.CAP_PROP_FPS) or 0
+        return 0
+
+    def isOpened(self):
+        """True until released; a lost camera is still 'open' while it reconnects"""
+        if self.is_file:
+            return self._cap is not None and self._cap.isOpened()
+        return not self._released
+
+    def release(self):
+        self._released = True
+        with self._cond:
+            self._generation += 1
+            self._cond.notify_all()
+        if self.is_file and self._cap is not None:
+            self._cap.release()
+        self._set_connected(False)
+
+    @property
+    def status(self):
+        return "OK" if self.connected else CAMERA_LOST
+
+    # ---------- Reading ----------
+    def read(self, timeout=READ_TIMEOUT):
+        """Return the next frame, or None if the camera is lost / nothing arrived in time"""
+        if self.is_file:
+            return self._read_file()
+
+        with self._cond:
+            if self._seq == self._read_seq:
+                self._cond.wait(timeout)
+            if self._seq != self._read_seq:
+                self._read_seq = self._seq
+                return self._frame
+            stalled = (self._last_frame_time is not None and time.monotonic()
+                       - self._last_frame_time > self.stall_secs + self._stall_backoff)
+        if stalled:
+            # The reader is stuck inside cap.read(); abandon it and start over,
+            # waiting longer each time so a hung driver doesn't pile up threads
+            self._stall_backoff = min(max(BACKOFF_MIN, self._stall_backoff * 2), BACKOFF_MAX)
+            self._set_connected(False)
+            self._start_reader(None)
+        return None
+
+    def _read_file(self):
+        import cv2
+
+        ret, frame = self._cap.read()
+        if not ret and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._cap.read()
+        return frame if ret else None
+
+    # ---------- Background Reader ----------
+    def _open_camera(self):
+        """Open the device and negotiate the configured mode; None if it can't be opened"""
+        import cv2
+
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        cfg = self.config
+        # FOURCC first: many UVC drivers only offer high resolutions/rates over MJPEG
+        if cfg.fourcc:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*cfg.fourcc))
+        if cfg.width and cfg.height:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, cfg.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cfg.height)
+        if cfg.fps:
+            cap.set(cv2.CAP_PROP_FPS, cfg.fps)
+        if cfg.buffer_size:
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, cfg.buffer_size)
+
+        self.negotiated = {
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": cap.get(cv2.CAP_PROP_FPS),
+            "fourcc": _decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+            "buffer_size": int(cap.get(cv2.CAP_PROP_BUFFERSIZE)),
+        }
+        print(f"Camera {self.source} mode: {self.negotiated}")
+        return cap
+
+    def _start_reader(self, cap):
+        with self._cond:
+            self._generation += 1
+            generation = self._generation
+            self._last_frame_time = None
+        threading.Thread(target=self._reader, args=(cap, generation), daemon=True).start()
+
+    def _current(self, generation):
+        return not self._released and generation == self._generation
+
+    def _reader(self, cap, generation):
+        delay = BACKOFF_MIN
+        while self._current(generation):
+            if cap is None:
+                cap = self._open_camera()
+                if cap is None:
+                    time.sleep(delay)
+                    delay = min(delay * 2, BACKOFF_MAX)
+                    continue
+                self.reconnects += 1
+                if self.metrics:
+                    self.metrics.camera_reconnect()
+                print(f"Camera {self.source} reopened")
+
+            with self._cond:
+                self._last_frame_time = time.monotonic()
+            delivered = False
+            while self._current(generation):
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                with self._cond:
+                    if generation != self._generation:
+                        break
+                    now = time.monotonic()
+                    if delivered and now > self._last_frame_time:
+                        rate = 1.0 / (now - self._last_frame_time)
+                        self.delivered_fps += FPS_SMOOTHING * (rate - self.delivered_fps)
+                    self._frame = frame
+                    self._seq += 1
+                    self._last_frame_time = now
+                    self._cond.notify_all()
+                if not delivered:
+                    delivered = True
+                    delay = BACKOFF_MIN
+                    self._stall_backoff = 0.0
+                    self.delivered_fps = self.negotiated.get("fps") or 0.0
+                    self._set_connected(True)
+                elif self.metrics and self._seq % 30 == 0:
+                    self.metrics.capture_fps(self.delivered_fps)
+
+            cap.release()
+            cap = None
+            if self._current(generation):
+                self._set_connected(False)
+                print(f"Camera {self.source} lost, reconnecting...")
+                if not delivered:
+                    # Opens but never delivers: back off like a failed open
+                    time.sleep(delay)
+                    delay = min(delay * 2, BACKOFF_MAX)
+
+    def _set_connected(self, connected):
+        self.connected = connected
+        if self.metrics:
+            self.metrics.camera(connected)
@@ -0,0 +1,160 @@
+"""Pre-alert video ring buffer and alert clip export.
+
+The detection loop hands every frame to `AlertClipRecorder.add_frame`, which
+only copies it onto a small queue. A background thread JPEG-encodes frames
+once, at a capped rate, into a ring buffer bounded by both duration and
+bytes. When an alert fires, `trigger` returns the clip path immediately; the
+clip (pre-roll from the ring plus the frames that follow) is written to disk
+by a separate writer thread, so the detection thread never waits on encoding
+or disk I/O.
+"""
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# ---------- Configuration ----------
+CLIP_DIR = "alert_clips"
+CLIP_FPS = 15            # Frames kept per second (camera frames beyond this are skipped)
+PRE_ALERT_SECS = 5.0
+POST_ALERT_SECS = 5.0
+MAX_CLIP_SECS = 30.0     # Repeated alerts extend a clip up to this length
+MAX_BUFFER_BYTES = 32 * 1024 * 1024
+JPEG_QUALITY = 70
+
+
+class _PendingClip:
+    def __init__(self, path, alert_time, frames):
+        self.path = path
+        self.alert_time = alert_time
+        self.end_time = alert_time + POST_ALERT_SECS
+        self.frames = frames
+
+
+# ---------- Recorder ----------
+class AlertClipRecorder:
+    """Keeps the last few seconds of video and writes clips around alerts"""
+
+    def __init__(self, out_dir=CLIP_DIR, fps=CLIP_FPS, pre_secs=PRE_ALERT_SECS,
+                 max_bytes=MAX_BUFFER_BYTES):
+        self.out_dir = out_dir
+        self.fps = fps
+        self.pre_secs = pre_secs
+        self.max_bytes = max_bytes
+
+        self._ring = deque()        # (timestamp, jpeg bytes, width, height)
+        self._ring_bytes = 0
+        self._pending = []
+        self._lock = threading.Lock()
+        self._last_accepted = 0.0
+        self._frames = queue.Queue(maxsize=4)
+        self._clips = queue.Queue()
+        self._running = True
+        self._encoder = threading.Thread(target=self._encode_loop, daemon=True)
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._encoder.start()
+        self._writer.start()
+
+    # ---------- Detection-thread API ----------
+    def add_frame(self, frame, t=None):
+        """Offer a BGR frame; cheap, never blocks, skips frames above the clip fps"""
+        t = time.time() if t is None else t
+        if t - self._last_accepted < 1.0 / self.fps:
+            return
+        self._last_accepted = t
+        try:
+            # Copy now: the caller keeps drawing on its frame
+            self._frames.put_nowait((t, frame.copy()))
+        except queue.Full:
+            pass
+
+    def trigger(self, label="ALERT", t=None):
+        """Start (or extend) a clip around an alert; returns the clip path"""
+        t = time.time() if t is None else t
+        with self._lock:
+            for clip in self._pending:
+                if t <= clip.end_time:
+                    clip.end_time = min(t + POST_ALERT_SECS, clip.alert_time + MAX_CLIP_SECS)
+                    return clip.path
+            stamp = datetime.fromtimestamp(t).strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(self.out_dir, f"{stamp}_{label.lower()}.avi")
+            pre_roll = [item for item in self._ring if item[0] >= t - self.pre_secs]
+            self._pending.append(_PendingClip(path, t, pre_roll))
+        return path
+
+    # ---------- Background Threads ----------
+    def _encode_loop(self):
+        while self._running or not self._frames.empty():
+            try:
+                t, frame = self._frames.get(timeout=0.5)
+            except queue.Empty:
+                self._flush_finished(time.time())
+                continue
+            import cv2  # Bound on the first frame so idle recorders stay cheap
+
+            ok, jpeg = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY])
+            if not ok:
+                continue
+            item = (t, jpeg.tobytes(), frame.shape[1], frame.shape[0])
+
+            with self._lock:
+                self._ring.append(item)
+                self._ring_bytes += len(item[1])
+                while self._ring and (self._ring_bytes > self.max_bytes
+                                      or self._ring[0][0] < t - self.pre_secs):
+                    self._ring_bytes -= len(self._ring.popleft()[1])
+                for clip in self._pending:
+                    if clip.frames and clip.frames[-1][0] >= t:
+                        continue
+                    clip.frames.append(item)
+            self._flush_finished(t)
+
+    def _flush_finished(self, now):
+        with self._lock:
+            done = [c for c in self._pending if now > c.end_time]
+            self._pending = [c for c in self._pending if now <= c.end_time]
+        for clip in done:
+            self._clips.put(clip)
+
+    def _write_loop(self):
+        while True:
+            clip = self._clips.get()
+            if clip is None:
+                return
+            try:
+                write_clip(clip.path, clip.frames, self.fps)
+            except Exception as e:
+                print(f"Could not write alert clip {clip.path}: {e}")
+
+    def close(self):
+        """Finish pending clips and stop the background threads"""
+        self._running = False
+        self._encoder.join(timeout=2)
+        with self._lock:
+            done, self._pending = self._pending, []
+        for clip in done:
+            self._clips.put(clip)
+        self._clips.put(None)
+        self._writer.join(timeout=10)
+
+
+def write_clip(path, frames, fps):
+    """Decode the buffered JPEGs and write them as an MJPG AVI"""
+    import cv2
+    import numpy as np
+
+    if not frames:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    w, h = frames[0][2], frames[0][3]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (w, h))
+    try:
+        for _, jpeg, fw, fh in frames:
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if (fw, fh) != (w, h):
+                frame = cv2.resize(frame, (w, h))
+            writer.write(frame)
+    finally:
+        writer.release()
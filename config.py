@@ -0,0 +1,244 @@
+"""Typed runtime configuration, loaded from a file and the environment and hot-reloaded.
+
+Every tunable the detectors use lives in one frozen `AppConfig`:
+
+    detection   ear_thresh, mar_thresh, yawn_secs, alert_debounce_secs, smoothing_frames
+    capture     desktop_width/height (Tk), web_width/height (Streamlit), fps
+    face_mesh   min_detection_confidence, min_tracking_confidence
+
+fatigue_config.json (or $FATIGUE_CONFIG) holds any subset of these as
+{"section": {"field": value}}; omitted fields keep their defaults. An
+environment variable FATIGUE_<SECTION>_<FIELD> (e.g. FATIGUE_DETECTION_EAR_THRESH)
+overrides the file. Unknown keys and out-of-range values are errors, so a
+typo is reported instead of silently ignored.
+
+A watcher thread checks the file's mtime every RELOAD_CHECK_SECS and swaps in
+a new config whole; an invalid edit is reported and the previous config stays
+active. Consumers either compare `current_config()` by identity once per
+frame or `subscribe()` to be called with (old, new), and apply only the
+fields `diff()` reports, so a threshold changed by calibration is kept
+unless the file changes that same threshold.
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field, fields
+
+# ---------- Configuration ----------
+CONFIG_FILE = os.environ.get("FATIGUE_CONFIG", "fatigue_config.json")
+ENV_PREFIX = "FATIGUE_"
+RELOAD_CHECK_SECS = 2.0
+
+
+def _check(ok, message):
+    if not ok:
+        raise ValueError(message)
+
+
+# ---------- Sections ----------
+@dataclass(frozen=True)
+class DetectionConfig:
+    """Eye / yawn state machine"""
+
+    ear_thresh: float = 0.25
+    mar_thresh: float = 0.65
+    yawn_secs: float = 1.0               # Mouth open longer than this is a yawn
+    alert_debounce_secs: float = 2.0     # Minimum gap between two alerts
+    smoothing_frames: int = 3            # EAR moving-average window
+
+    def __post_init__(self):
+        _check(0 < self.ear_thresh < 1, "detection.ear_thresh must be between 0 and 1")
+        _check(0 < self.mar_thresh < 2, "detection.mar_thresh must be between 0 and 2")
+        _check(self.yawn_secs >= 0, "detection.yawn_secs must not be negative")
+        _check(self.alert_debounce_secs >= 0, "detection.alert_debounce_secs must not be negative")
+        _check(self.smoothing_frames >= 1, "detection.smoothing_frames must be at least 1")
+
+
+@dataclass(frozen=True)
+class CaptureSettings:
+    """Frame sizes the apps capture and display at"""
+
+    desktop_width: int = 800
+    desktop_height: int = 600
+    web_width: int = 640
+    web_height: int = 480
+    fps: int = 30
+
+    def __post_init__(self):
+        for f in fields(self):
+            _check(getattr(self, f.name) > 0, f"capture.{f.name} must be positive")
+
+    @property
+    def desktop_size(self):
+        return (self.desktop_width, self.desktop_height)
+
+    @property
+    def web_size(self):
+        return (self.web_width, self.web_height)
+
+
+@dataclass(frozen=True)
+class FaceMeshConfig:
+    """MediaPipe face mesh confidences; a change rebuilds the graph in the background"""
+
+    min_detection_confidence: float = 0.5
+    min_tracking_confidence: float = 0.5
+
+    def __post_init__(self):
+        for f in fields(self):
+            _check(0 <= getattr(self, f.name) <= 1, f"face_mesh.{f.name} must be between 0 and 1")
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    detection: DetectionConfig = field(default_factory=DetectionConfig)
+    capture: CaptureSettings = field(default_factory=CaptureSettings)
+    face_mesh: FaceMeshConfig = field(default_factory=FaceMeshConfig)
+    source: str = "default"
+
+
+SECTIONS = {f.name: f.type for f in fields(AppConfig) if f.name != "source"}
+
+
+# ---------- Loading ----------
+def _coerce(value, kind, name):
+    """Convert a JSON or environment value to the field's type"""
+    if isinstance(value, str):
+        value = value.strip()
+    try:
+        if kind is int:
+            number = float(value)
+            _check(number == int(number), f"{name} must be a whole number")
+            return int(number)
+        if kind is float:
+            return float(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{name}: {value!r} is not a valid {kind.__name__}") from e
+    return kind(value)
+
+
+def load_config(path=CONFIG_FILE, environ=None):
+    """Defaults, overlaid with the file (if it exists) and then the environment"""
+    environ = os.environ if environ is None else environ
+    data = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+        _check(isinstance(data, dict), f"{path} must hold a JSON object")
+    unknown = set(data) - set(SECTIONS)
+    _check(not unknown, f"unknown config section(s): {', '.join(sorted(unknown))}")
+
+    sections = {}
+    for section, cls in SECTIONS.items():
+        values = data.get(section) or {}
+        _check(isinstance(values, dict), f"config section {section!r} must be an object")
+        known = {f.name: f.type for f in fields(cls)}
+        unknown = set(values) - set(known)
+        _check(not unknown, f"unknown {section} setting(s): {', '.join(sorted(unknown))}")
+        values = dict(values)
+        for name, kind in known.items():
+            env = environ.get(f"{ENV_PREFIX}{section.upper()}_{name.upper()}")
+            if env is not None:
+                values[name] = env
+            if name in values:
+                values[name] = _coerce(values[name], kind, f"{section}.{name}")
+        sections[section] = cls(**values)
+    return AppConfig(**sections, source=path if data else "default")
+
+
+def diff(old, new):
+    """{section: {field: new value}} for every setting that differs"""
+    changes = {}
+    for section in SECTIONS:
+        a, b = getattr(old, section), getattr(new, section)
+        changed = {f.name: getattr(b, f.name) for f in fields(b)
+                   if getattr(a, f.name) != getattr(b, f.name)}
+        if changed:
+            changes[section] = changed
+    return changes
+
+
+# ---------- Hot Reload ----------
+class ConfigStore:
+    """Current config for a file; a watcher thread swaps in a new one when the file changes"""
+
+    def __init__(self, path=CONFIG_FILE):
+        self.path = path
+        self.config = load_config(None)
+        self._mtime = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.reload_if_changed()
+
+    def start(self):
+        threading.Thread(target=self._watch, daemon=True, name="config").start()
+        return self
+
+    def subscribe(self, callback):
+        """Call callback(old, new) from the watcher thread after each reload"""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def _watch(self):
+        while True:
+            time.sleep(RELOAD_CHECK_SECS)
+            self.reload_if_changed()
+
+    def reload_if_changed(self):
+        """Load the file if its mtime changed; returns True when a new config was applied"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            new = load_config(self.path)
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Config {self.path} not applied, keeping previous: {e}")
+            return False
+        old, changes = self.config, diff(self.config, new)
+        self.config = new
+        if not changes:
+            return False
+        print(f"Config loaded from {new.source}: {changes}")
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(old, new)
+            except Exception as e:
+                print(f"Config listener failed: {e}")
+        return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def config_store():
+    """The process-wide store, watching CONFIG_FILE"""
+    if _store is None:
+        _start_store()
+    return _store
+
+
+def current_config():
+    """The process-wide config, hot-reloaded from CONFIG_FILE"""
+    if _store is None:
+        _start_store()
+    return _store.config
+
+
+def _start_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConfigStore().start()
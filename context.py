@@ -0,0 +1,187 @@
+"""Driving context (speed, weather, time of day) from pluggable sources.
+
+A provider keeps the current `DrivingContext` as an immutable snapshot and
+replaces it by a single reference swap when its source reports a change, so
+the detection loop reads it without a lock and always sees a consistent
+speed / weather / time triple. Sources:
+
+    ui              the Tk / Streamlit controls push their values in
+    sim             simulated CAN speed + GPS clock (drive cycle, weather changes)
+    replay:<file>   CSV with columns t, speed, weather, time_period (t in seconds)
+
+`ContextThresholds` sits on the consumer side: it recomputes the duration
+thresholds only when the snapshot object (or the threshold policy) changes,
+which is an identity check per frame instead of a threshold evaluation.
+"""
+import csv
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+
+from fatigue_core import get_distraction_threshold
+from threshold_policy import active_policy
+
+# ---------- Configuration ----------
+CONTEXT_ENV = "FATIGUE_CONTEXT"
+DEFAULT_SOURCE = "ui"
+SIM_INTERVAL = 0.1           # 10 Hz, the rate a CAN speed frame typically arrives at
+
+DrivingContext = namedtuple("DrivingContext", "speed weather time_period source")
+
+
+def time_period_at(t=None):
+    hour = time.localtime(t).tm_hour
+    return "Day" if 6 <= hour < 20 else "Night"
+
+
+# ---------- Providers ----------
+class ContextProvider:
+    """Holds the latest snapshot; subclasses feed it from their source"""
+
+    name = "static"
+
+    def __init__(self, speed=60, weather="Clear", time_period="Day"):
+        self.snapshot = DrivingContext(float(speed), weather, time_period, self.name)
+        self.updates = 0
+
+    def publish(self, speed=None, weather=None, time_period=None):
+        """Swap in a new snapshot if anything changed; returns True when it did"""
+        current = self.snapshot
+        new = DrivingContext(current.speed if speed is None else float(speed),
+                             weather or current.weather, time_period or current.time_period,
+                             self.name)
+        if new == current:
+            return False
+        self.snapshot = new
+        self.updates += 1
+        return True
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+class UIContextProvider(ContextProvider):
+    """Values come from the dashboard controls via `publish`"""
+
+    name = "ui"
+
+
+class _ThreadedProvider(ContextProvider):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True,
+                                            name=f"context-{self.name}")
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        raise NotImplementedError
+
+
+class SimulatedCanProvider(_ThreadedProvider):
+    """Drive cycle of cruising, slowing and stops, with occasional weather changes"""
+
+    name = "sim"
+    WEATHER_CHANGE_PROB = 0.0005     # Per tick: roughly every few minutes
+    STOP_PROB = 0.002
+
+    def __init__(self, speed=60, weather="Clear", time_period=None, seed=None):
+        super().__init__(speed, weather, time_period or time_period_at())
+        self.rng = random.Random(seed)
+        self.target = speed
+
+    def step(self, now):
+        rng = self.rng
+        speed = self.snapshot.speed
+        if rng.random() < self.STOP_PROB:
+            self.target = 0
+        elif abs(speed - self.target) < 1 and rng.random() < 0.01:
+            self.target = rng.choice([30, 50, 70, 90, 110])
+        # ~3 km/h per tick acceleration limit, plus sensor noise
+        speed += max(-3.0, min(3.0, self.target - speed)) + rng.gauss(0, 0.3)
+        weather = None
+        if rng.random() < self.WEATHER_CHANGE_PROB:
+            weather = rng.choice(["Clear", "Clear", "Rain", "Fog", "Storm"])
+        # CAN speed is reported in whole km/h
+        self.publish(round(max(0.0, speed)), weather, time_period_at(now))
+
+    def _run(self):
+        while not self._stop.wait(SIM_INTERVAL):
+            self.step(time.time())
+
+
+class ReplayContextProvider(_ThreadedProvider):
+    """Replays a recorded context CSV (t, speed, weather, time_period) in real time"""
+
+    name = "replay"
+
+    def __init__(self, path, loop=True):
+        with open(path, newline="") as f:
+            self.rows = [(float(r["t"]), float(r["speed"]), r.get("weather") or None,
+                          r.get("time_period") or None) for r in csv.DictReader(f)]
+        if not self.rows:
+            raise ValueError(f"{path} has no context rows")
+        _, speed, weather, time_period = self.rows[0]
+        super().__init__(speed, weather or "Clear", time_period or "Day")
+        self.loop = loop
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            for t, speed, weather, time_period in self.rows:
+                if self._stop.wait(max(0.0, t - (time.monotonic() - started))):
+                    return
+                self.publish(speed, weather, time_period)
+            if not self.loop:
+                return
+
+
+def create_provider(source=None, **initial):
+    """Provider for 'ui', 'sim' or 'replay:<path>' (default from FATIGUE_CONTEXT)"""
+    source = source or os.environ.get(CONTEXT_ENV, DEFAULT_SOURCE)
+    kind, _, arg = source.partition(":")
+    if kind == "ui":
+        return UIContextProvider(**initial)
+    if kind == "sim":
+        return SimulatedCanProvider(**initial)
+    if kind == "replay":
+        return ReplayContextProvider(arg)
+    raise ValueError(f"Unknown context source {source!r}; use ui, sim or replay:<file>")
+
+
+# ---------- Consumer Side ----------
+class ContextThresholds:
+    """Thresholds for a provider's snapshot, recomputed only when it or the policy changes"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.context = None
+        self.policy = None
+        self.fatigue_secs = None
+        self.distraction_secs = None
+        self.recomputes = 0
+
+    def refresh(self):
+        """Return the current snapshot, updating the thresholds if it is new"""
+        ctx = self.provider.snapshot
+        policy = active_policy()
+        if ctx is not self.context or policy is not self.policy:
+            self.fatigue_secs = policy.lookup(ctx.speed, ctx.weather, ctx.time_period)
+            self.distraction_secs = get_distraction_threshold(ctx.speed)
+            self.context = ctx
+            self.policy = policy
+            self.recomputes += 1
+        return ctx
@@ -0,0 +1,506 @@
+"""Headless detection service with an HTTP / WebSocket streaming API.
+
+    python detection_server.py --source 0                # live camera
+    python detection_server.py --source driver_demo.mp4  # replay a file
+    python detection_server.py                           # clients push frames
+
+Endpoints
+    GET  /health          service status as JSON
+    POST /frame           body is a JPEG/PNG image; responds with the result
+    POST /context         JSON {"speed": 80, "weather": "Rain", "time": "Night"}
+                          (409 when --context takes it from a CAN/GPS or replay feed)
+    GET  /events          Server-Sent Events stream of results
+    GET  /ws              WebSocket stream of results; binary messages sent
+                          by the client are decoded as frames and processed
+
+`/events` and `/ws` accept `?alerts=1` to receive alert events only and
+`/ws` accepts `?format=binary` for the compact struct encoding below.
+
+Backpressure: detection runs on a single worker thread and a new frame is
+dropped (HTTP 503 / skipped) while the previous one is still queued, so a
+fast producer never builds latency. Each subscriber has a bounded outbox; when
+a slow client falls behind, its oldest frame results are discarded but alert
+events are kept.
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+from camera import CaptureManager, CaptureConfig
+from detector import FatigueDetector, STATUSES, ALERT_TYPES
+from telemetry import TelemetryRecorder
+from context import create_provider
+from config import current_config
+from fatigue_core import get_fatigue_threshold
+from metrics import DetectorMetrics, start_metrics_server, DEFAULT_METRICS_PORT
+
+# ---------- Configuration ----------
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+OUTBOX_SIZE = 64
+MAX_BODY_BYTES = 8 * 1024 * 1024
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# t, status, alert, ear, mar, closed_secs (NaN when missing)
+RESULT_STRUCT = struct.Struct("<dBBfff")
+
+
+# ---------- Encoding ----------
+def encode_json(result):
+    msg = dict(result, type="alert" if result["alert"] else "frame")
+    return json.dumps(msg, separators=(",", ":"))
+
+def encode_binary(result):
+    return RESULT_STRUCT.pack(
+        result["t"],
+        STATUSES.index(result["status"]),
+        ALERT_TYPES.index(result["alert"]),
+        math.nan if result["ear"] is None else result["ear"],
+        math.nan if result["mar"] is None else result["mar"],
+        result["closed_secs"],
+    )
+
+
+# ---------- Subscribers ----------
+class Subscriber:
+    """Bounded outbox for one client; drops stale frame results, never alerts"""
+
+    def __init__(self, alerts_only=False, binary=False, size=OUTBOX_SIZE):
+        self.alerts_only = alerts_only
+        self.binary = binary
+        self.size = size
+        self.outbox = deque()
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def push(self, result):
+        is_alert = result["alert"] is not None
+        if self.alerts_only and not is_alert:
+            return
+        if len(self.outbox) >= self.size:
+            stale = next((m for m in self.outbox if m["alert"] is None), None)
+            if stale is not None:
+                self.outbox.remove(stale)
+            elif not is_alert:
+                self.dropped += 1
+                return
+            else:
+                self.outbox.popleft()
+            self.dropped += 1
+        self.outbox.append(result)
+        self._ready.set()
+
+    async def drain(self):
+        """Wait for and return everything queued so far"""
+        await self._ready.wait()
+        self._ready.clear()
+        items = list(self.outbox)
+        self.outbox.clear()
+        return items
+
+
+# ---------- Detection Service ----------
+class DetectionService:
+    """Owns the detector and fans its results out to subscribers"""
+
+    def __init__(self, detector, capture_config=None):
+        self.detector = detector
+        self.capture_config = capture_config
+        self.subscribers = set()
+        self.frames = 0
+        self.busy_drops = 0
+        self.camera = None
+        # MediaPipe graphs are not thread-safe: one worker runs all detection
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detector")
+        self._pending = 0
+
+    def publish(self, result):
+        self.frames += 1
+        for sub in self.subscribers:
+            sub.push(result)
+
+    async def process(self, frame):
+        """Detect on a decoded BGR frame, or return None if the worker is still busy"""
+        if self._pending:
+            self.busy_drops += 1
+            return None
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._worker, self.detector.process_frame, frame)
+        finally:
+            self._pending -= 1
+        self.publish(result)
+        return result
+
+    async def process_image_bytes(self, data):
+        frame = decode_image(data)
+        if frame is None:
+            raise ValueError("could not decode image")
+        return await self.process(frame)
+
+    def swap_backend(self, face_mesh):
+        """Replace the landmark backend between two frames on the detection worker"""
+        def swap():
+            old, self.detector.face_mesh = self.detector.face_mesh, face_mesh
+            if old is not None:
+                old.close()
+        self._worker.submit(swap)
+
+    def set_context(self, speed, weather, time_period):
+        """Publish new conditions; the detector picks them up on its next frame"""
+        self.detector.context.publish(speed, weather, time_period)
+        return get_fatigue_threshold(speed, weather, time_period)
+
+    async def run_source(self, source):
+        """Read frames from a camera index or video file and process them"""
+        loop = asyncio.get_running_loop()
+        cap = self.camera = CaptureManager(source, loop=True, metrics=self.detector.metrics,
+                                           config=self.capture_config)
+        if not await loop.run_in_executor(self._worker, cap.open, True):
+            if cap.is_file:
+                print(f"Cannot open video {source!r}")
+                return
+            print(f"Camera {source} not available yet; retrying in the background")
+        frame_interval = 1.0 / (cap.source_fps or 30) if cap.is_file else 0
+        lost_reported = False
+
+        def read_and_detect():
+            nonlocal lost_reported
+            t0 = time.perf_counter()
+            frame = cap.read()
+            if self.detector.metrics:
+                self.detector.metrics.observe_stage("capture", time.perf_counter() - t0)
+            if frame is None:
+                # Report a lost camera once per outage rather than on every poll
+                if cap.connected or lost_reported:
+                    return None
+                lost_reported = True
+                return self.detector.camera_lost()
+            lost_reported = False
+            return self.detector.process_frame(frame)
+
+        try:
+            while True:
+                start = time.monotonic()
+                result = await loop.run_in_executor(self._worker, read_and_detect)
+                if result is not None:
+                    self.publish(result)
+                # Files are replayed at their native frame rate
+                await asyncio.sleep(max(0.0, frame_interval - (time.monotonic() - start)))
+        finally:
+            cap.release()
+
+    def health(self):
+        return {
+            "status": "ok",
+            "frames": self.frames,
+            "busy_drops": self.busy_drops,
+            "subscribers": len(self.subscribers),
+            "total_alerts": self.detector.total_alerts,
+            "threshold_secs": self.detector.threshold_time,
+            "context": self.detector.context.snapshot._asdict(),
+            "config": self.detector.config.source,
+            "ear_thresh": self.detector.EAR_THRESH,
+            "mar_thresh": self.detector.MAR_THRESH,
+            "camera": self.camera.status if self.camera else None,
+            "capture": dict(self.camera.negotiated, delivered_fps=round(self.camera.delivered_fps, 1))
+                       if self.camera and not self.camera.is_file else None,
+        }
+
+
+def decode_image(data):
+    import cv2
+    import numpy as np
+
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def parse_context(body, current):
+    """(speed, weather, time_period) from a POST /context body; omitted keys keep current values.
+
+    Raises ValueError (a 400) for anything but a JSON object of a finite speed
+    and string weather / time.
+    """
+    ctx = json.loads(body or b"{}")
+    if not isinstance(ctx, dict):
+        raise ValueError("context must be a JSON object")
+    try:
+        speed = float(ctx.get("speed", current.speed))
+    except (TypeError, ValueError):
+        raise ValueError("speed must be a number") from None
+    if not math.isfinite(speed):
+        raise ValueError("speed must be a finite number")
+    weather = ctx.get("weather", current.weather)
+    time_period = ctx.get("time", current.time_period)
+    if not isinstance(weather, str) or not isinstance(time_period, str):
+        raise ValueError("weather and time must be strings")
+    return speed, weather, time_period
+
+
+# ---------- HTTP ----------
+async def read_request(reader):
+    """Parse one HTTP/1.1 request: (method, path, query, headers, body)"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError("request body too large")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    return method.upper(), url.path, parse_qs(url.query), headers, body
+
+async def send_response(writer, status, body, content_type="application/json", extra=""):
+    if isinstance(body, (dict, list)):
+        body = json.dumps(body)
+    if isinstance(body, str):
+        body = body.encode()
+    writer.write(
+        f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n{extra}\r\n".encode() + body
+    )
+    await writer.drain()
+
+
+# ---------- WebSocket ----------
+async def ws_send(writer, payload, binary=False):
+    data = payload if isinstance(payload, bytes) else payload.encode()
+    header = bytearray([0x82 if binary else 0x81])
+    if len(data) < 126:
+        header.append(len(data))
+    elif len(data) < 65536:
+        header.append(126)
+        header += struct.pack(">H", len(data))
+    else:
+        header.append(127)
+        header += struct.pack(">Q", len(data))
+    writer.write(bytes(header) + data)
+    await writer.drain()
+
+async def ws_receive(reader):
+    """Return (opcode, payload) for the next complete client message"""
+    import numpy as np
+
+    message = b""
+    first_opcode = None
+    while True:
+        b1, b2 = await reader.readexactly(2)
+        fin, opcode = b1 & 0x80, b1 & 0x0F
+        length = b2 & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", await reader.readexactly(8))[0]
+        if length > MAX_BODY_BYTES:
+            raise ValueError("websocket message too large")
+        mask = await reader.readexactly(4) if b2 & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask:
+            # Vectorized: a per-byte Python loop over a large frame would stall the event loop
+            key = np.tile(np.frombuffer(mask, np.uint8), length // 4 + 1)[:length]
+            payload = (np.frombuffer(payload, np.uint8) ^ key).tobytes()
+        if opcode >= 0x8:
+            # Control frames may arrive between fragments
+            return opcode, payload
+        if first_opcode is None:
+            first_opcode = opcode
+        message += payload
+        if fin:
+            return first_opcode, message
+
+
+# ---------- Connection Handling ----------
+class DetectionServer:
+    def __init__(self, service):
+        self.service = service
+
+    async def handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, query, headers, body = request
+            alerts_only = query.get("alerts", ["0"])[0] == "1"
+
+            if method == "GET" and path == "/health":
+                await send_response(writer, "200 OK", self.service.health())
+            elif method == "POST" and path == "/frame":
+                try:
+                    result = await self.service.process_image_bytes(body)
+                except ValueError as e:
+                    await send_response(writer, "400 Bad Request", {"error": str(e)})
+                    return
+                if result is None:
+                    await send_response(writer, "503 Service Unavailable",
+                                        {"error": "detector busy"}, extra="Retry-After: 0\r\n")
+                else:
+                    await send_response(writer, "200 OK", encode_json(result))
+            elif method == "POST" and path == "/context":
+                current = self.service.detector.context.snapshot
+                if current.source != "ui":
+                    await send_response(writer, "409 Conflict",
+                                        {"error": f"context comes from the {current.source} feed"})
+                    return
+                threshold = self.service.set_context(*parse_context(body, current))
+                await send_response(writer, "200 OK", {"threshold_secs": threshold})
+            elif method == "GET" and path == "/events":
+                await self.stream_events(writer, Subscriber(alerts_only))
+            elif method == "GET" and path == "/ws" and \
+                    headers.get("upgrade", "").lower() == "websocket":
+                if not headers.get("sec-websocket-key"):
+                    await send_response(writer, "400 Bad Request",
+                                        {"error": "missing Sec-WebSocket-Key"})
+                    return
+                binary = query.get("format", ["json"])[0] == "binary"
+                await self.stream_websocket(reader, writer, headers,
+                                            Subscriber(alerts_only, binary))
+            else:
+                await send_response(writer, "404 Not Found", {"error": "not found"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            try:
+                await send_response(writer, "400 Bad Request", {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def stream_events(self, writer, sub):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n")
+        await writer.drain()
+        self.service.subscribers.add(sub)
+        try:
+            while True:
+                for result in await sub.drain():
+                    event = "alert" if result["alert"] else "frame"
+                    writer.write(f"event: {event}\ndata: {encode_json(result)}\n\n".encode())
+                await writer.drain()
+        finally:
+            self.service.subscribers.discard(sub)
+
+    async def stream_websocket(self, reader, writer, headers, sub):
+        accept = base64.b64encode(hashlib.sha1(
+            (headers["sec-websocket-key"] + WS_GUID).encode()).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        self.service.subscribers.add(sub)
+
+        async def sender():
+            while True:
+                for result in await sub.drain():
+                    if sub.binary:
+                        await ws_send(writer, encode_binary(result), binary=True)
+                    else:
+                        await ws_send(writer, encode_json(result))
+
+        send_task = asyncio.create_task(sender())
+        try:
+            while True:
+                opcode, payload = await ws_receive(reader)
+                if opcode == 0x8:
+                    writer.write(b"\x88\x00")
+                    break
+                if opcode == 0x9:
+                    writer.write(bytes([0x8A, len(payload)]) + payload)
+                elif opcode == 0x2:
+                    # Results reach this client through its subscription
+                    try:
+                        await self.service.process_image_bytes(payload)
+                    except ValueError:
+                        pass
+        finally:
+            send_task.cancel()
+            self.service.subscribers.discard(sub)
+
+
+# ---------- Main ----------
+async def serve(host, port, service, source=None):
+    server = await asyncio.start_server(DetectionServer(service).handle, host, port)
+    print(f"Detection server listening on http://{host}:{port}")
+    tasks = [asyncio.create_task(server.serve_forever())]
+    if source is not None:
+        tasks.append(asyncio.create_task(service.run_source(source)))
+    await asyncio.gather(*tasks)
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless driver fatigue detection service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--source", help="camera index or video file to process")
+    parser.add_argument("--size", default=None,
+                        help="camera resolution to request (default: capture.web_* in the config)")
+    parser.add_argument("--fps", type=int, default=None,
+                        help="camera frame rate to request (default: capture.fps in the config)")
+    parser.add_argument("--context", default="ui",
+                        help="driving context source: ui (POST /context), sim or replay:<csv>")
+    parser.add_argument("--speed", type=float, default=60)
+    parser.add_argument("--weather", default="Clear")
+    parser.add_argument("--time", default="Day")
+    parser.add_argument("--backend", default=None,
+                        help="landmark backend: mediapipe, mediapipe-lite or onnx")
+    parser.add_argument("--telemetry", action="store_true",
+                        help="record per-frame telemetry under telemetry/")
+    parser.add_argument("--metrics-port", type=int, default=DEFAULT_METRICS_PORT,
+                        help="Prometheus /metrics port (0 to disable)")
+    args = parser.parse_args()
+
+    from startup import ModelLoader, rebuild_on_config_change
+
+    loader = ModelLoader(backend=args.backend).start()
+    metrics = None
+    if args.metrics_port:
+        metrics = DetectorMetrics()
+        metrics.running(True)
+        start_metrics_server(args.metrics_port)
+    telemetry = TelemetryRecorder() if args.telemetry else None
+    context = create_provider(args.context, speed=args.speed, weather=args.weather,
+                              time_period=args.time)
+    detector = FatigueDetector(loader.wait(), metrics=metrics, telemetry=telemetry,
+                               context=context.start())
+    print(f"Model ready: {loader.timer.report()}")
+
+    source = args.source
+    if source is not None and source.isdigit():
+        source = int(source)
+    capture = current_config().capture
+    width, height = ((int(v) for v in args.size.split("x")) if args.size
+                     else capture.web_size)
+    service = DetectionService(detector, CaptureConfig(width, height, args.fps or capture.fps))
+    stop_rebuilds = rebuild_on_config_change(
+        service.swap_backend, backend=args.backend,
+        on_error=lambda e: print(f"Backend rebuild failed: {e}"))
+    try:
+        asyncio.run(serve(args.host, args.port, service, source))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_rebuilds()
+        context.stop()
+        if telemetry:
+            telemetry.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""UI-free fatigue detection pipeline.
+
+`FatigueDetector` is the one eye-closure / yawn / nod / distraction state
+machine: it takes frames (or landmark results) and returns a plain result
+dict instead of drawing on a window. The Tk and Streamlit dashboards, the
+headless server and the batch tools all build on it; the dashboards only
+add drawing, sound and their controls. Timing uses the `now` passed in, so
+recorded video can be replayed on its own clock.
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+from fatigue_core import frame_metrics
+from head_pose import HeadPoseEstimator, NodDetector
+from gaze import gaze_ratios, DistractionDetector
+from preprocess import LowLightEnhancer
+from context import UIContextProvider, ContextThresholds
+from config import current_config
+
+# ---------- Status / Alert Codes ----------
+# Order matters: the index is the compact wire / record encoding
+STATUSES = ["ATTENTIVE", "EYES_CLOSING", "DROWSINESS", "YAWNING", "NO_FACE", "NODDING",
+            "EYES_OFF_ROAD", "DISTRACTION", "CAMERA_LOST"]
+ALERT_TYPES = [None, "DROWSINESS", "YAWNING", "NODDING", "DISTRACTION"]
+
+
+def new_result(now, **fields):
+    """Per-frame result dict with every key present"""
+    result = {
+        "t": now,
+        "face": False,
+        "ear": None,
+        "frame_ear": None,
+        "mar": None,
+        "pitch": None,
+        "status": "ATTENTIVE",
+        "alert": None,
+        "closed_secs": 0.0,
+        "off_road_secs": 0.0,
+    }
+    result.update(fields)
+    return result
+
+
+# ---------- Detector ----------
+class FatigueDetector:
+    """Per-stream detection state; not thread-safe, use one per stream"""
+
+    def __init__(self, face_mesh=None, ear_thresh=None, mar_thresh=None,
+                 speed=60, weather="Clear", time_period="Day", metrics=None, low_light=True,
+                 telemetry=None, context=None):
+        self.face_mesh = face_mesh
+        self.metrics = metrics
+        self.telemetry = telemetry
+        self.enhancer = LowLightEnhancer(low_light)
+        self.config = current_config()
+        self.EAR_THRESH = self.config.detection.ear_thresh if ear_thresh is None else ear_thresh
+        self.MAR_THRESH = self.config.detection.mar_thresh if mar_thresh is None else mar_thresh
+        # Without a feed the context is whatever set_context() last pushed
+        self.context = context or UIContextProvider(speed, weather, time_period)
+        self.thresholds = ContextThresholds(self.context)
+        self._sync_context()
+        self.ear_history = deque(maxlen=self.config.detection.smoothing_frames)
+        self.head_pose = HeadPoseEstimator()
+        self.nod_detector = NodDetector()
+        self.distraction = DistractionDetector()
+        self.reset()
+
+    def reset(self):
+        self.eyes_closed_start = None
+        self.yawn_start = None
+        self.last_alert_time = 0
+        self.total_alerts = 0
+        self.ear_history.clear()
+        self.head_pose.reset()
+        self.nod_detector.reset()
+        self.distraction.reset()
+
+    def set_context(self, speed, weather, time_period):
+        """Push new driving conditions into the context provider"""
+        self.context.publish(speed, weather, time_period)
+        self._sync_context()
+
+    def _sync_context(self):
+        """Current driving conditions; the thresholds are only recomputed when they change"""
+        ctx = self.thresholds.refresh()
+        self.speed, self.weather, self.time_period = ctx.speed, ctx.weather, ctx.time_period
+        self.threshold_time = self.thresholds.fatigue_secs
+        self.distraction_time = self.thresholds.distraction_secs
+
+    def _sync_config(self):
+        """Apply the settings a config reload changed; others (e.g. a calibrated EAR) stay"""
+        config = current_config()
+        if config is self.config:
+            return
+        old, self.config = self.config.detection, config
+        new = config.detection
+        if new.ear_thresh != old.ear_thresh:
+            self.EAR_THRESH = new.ear_thresh
+        if new.mar_thresh != old.mar_thresh:
+            self.MAR_THRESH = new.mar_thresh
+        if new.smoothing_frames != old.smoothing_frames:
+            self.ear_history = deque(self.ear_history, maxlen=new.smoothing_frames)
+
+    # ---------- Processing ----------
+    def process_frame(self, frame_bgr, now=None):
+        """Run the landmark backend on a BGR frame and update the state machine"""
+        frame_rgb, lm = self.detect(frame_bgr)
+        h, w = frame_bgr.shape[:2]
+        t0 = time.perf_counter()
+        result = self.process_landmarks(lm, w, h, now)
+        if self.metrics:
+            self.metrics.observe_stage("logic", time.perf_counter() - t0)
+        return result
+
+    def detect(self, frame_bgr):
+        """Low-light boost and landmark inference on a BGR frame: (frame_rgb, landmarks or None)"""
+        import cv2
+
+        h, w = frame_bgr.shape[:2]
+        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        t_pre = time.perf_counter()
+        self.enhancer.process(frame_rgb)
+        t0 = time.perf_counter()
+        lm = self.face_mesh.detect(frame_rgb)
+        self.enhancer.track(lm, w, h)
+        if self.metrics:
+            self.metrics.observe_stage("preprocess", t0 - t_pre)
+            self.metrics.low_light(self.enhancer.active)
+            self.metrics.observe_stage("inference", time.perf_counter() - t0)
+        return frame_rgb, lm
+
+    def process_landmarks(self, lm, w, h, now=None):
+        """Update the state machine from one face's landmarks (None if no face)"""
+        now = time.time() if now is None else now
+        if lm is None:
+            return self.update(None, None, None, now)
+        left_ear, right_ear, mar = frame_metrics(lm, w, h)
+        pose = self.head_pose.estimate(lm, w, h)
+        return self.update(left_ear, right_ear, mar, now, pose, gaze_ratios(lm))
+
+    def camera_lost(self, now=None):
+        """Result for a frame slot with no camera; running timers restart on reconnect"""
+        now = time.time() if now is None else now
+        self.ear_history.clear()
+        self.eyes_closed_start = None
+        self.yawn_start = None
+        self.head_pose.reset()
+        self.nod_detector.reset()
+        self.distraction.reset()
+        return new_result(now, status="CAMERA_LOST")
+
+    def update(self, left_ear, right_ear, mar, now, pose=None, gaze=None):
+        """Advance the state machine from per-frame metrics.
+
+        pose is (pitch, yaw, roll) in degrees and gaze the `gaze_ratios` pair;
+        either may be None when the landmark backend can't provide it.
+        """
+        self._sync_context()
+        self._sync_config()
+        result = self._update(left_ear, right_ear, mar, now, pose, gaze)
+        if self.telemetry:
+            self.telemetry.record(now, left_ear, right_ear, mar, result["status"], result["alert"],
+                                  self.EAR_THRESH, self.MAR_THRESH, self.threshold_time)
+        if self.metrics:
+            self.metrics.frame(result["face"])
+            if result["alert"]:
+                self.metrics.alert(result["alert"], self.speed, self.weather, self.time_period)
+        return result
+
+    def _update(self, left_ear, right_ear, mar, now, pose, gaze):
+        pitch, yaw = (pose[0], pose[1]) if pose else (None, None)
+        nodded = self.nod_detector.update(pitch, now)
+        result = new_result(now, face=left_ear is not None, mar=mar, pitch=pitch)
+
+        if left_ear is None:
+            self.ear_history.clear()
+            self.eyes_closed_start = None
+            self.yawn_start = None
+            self.distraction.update(None, None, now)
+            result["status"] = "NO_FACE"
+            return result
+
+        result["frame_ear"] = (left_ear + right_ear) / 2.0
+        self.ear_history.append(result["frame_ear"])
+        smooth_ear = float(np.mean(self.ear_history))
+        result["ear"] = smooth_ear
+
+        alert_type = "NODDING" if nodded else None
+        if smooth_ear < self.EAR_THRESH:
+            if self.eyes_closed_start is None:
+                self.eyes_closed_start = now
+            elapsed = now - self.eyes_closed_start
+            result["closed_secs"] = elapsed
+            if elapsed > self.threshold_time:
+                alert_type = "DROWSINESS"
+            else:
+                result["status"] = "EYES_CLOSING"
+        else:
+            self.eyes_closed_start = None
+
+        # Iris points are unreliable once the lids are closing
+        off_road = self.distraction.update(None if self.eyes_closed_start else gaze, yaw, now)
+        result["off_road_secs"] = off_road
+        if off_road > self.distraction_time:
+            alert_type = "DISTRACTION"
+        elif off_road and result["status"] == "ATTENTIVE":
+            result["status"] = "EYES_OFF_ROAD"
+
+        if mar is not None and mar > self.MAR_THRESH:
+            if self.yawn_start is None:
+                self.yawn_start = now
+            if now - self.yawn_start > self.config.detection.yawn_secs:
+                alert_type = "YAWNING"
+        else:
+            self.yawn_start = None
+
+        if alert_type:
+            result["status"] = alert_type
+            # Prevent alert spam (at least alert_debounce_secs between alerts)
+            if now - self.last_alert_time > self.config.detection.alert_debounce_secs:
+                self.total_alerts += 1
+                self.last_alert_time = now
+                result["alert"] = alert_type
+        return result
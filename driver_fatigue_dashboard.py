@@ -1,17 +1,29 @@
+from startup import StartupTimer, ModelLoader, rebuild_on_config_change, retire_backend
+
 import cv2
-import mediapipe as mp
 import numpy as np
-from scipy.spatial import distance as dist
 import streamlit as st
-from PIL import Image
 import time
 import datetime
 from collections import deque
 import os
 from io import BytesIO
 import base64
-import subprocess
-import sys
+
+from detector import FatigueDetector
+from metrics_buffer import MetricsRingBuffer, unique_name
+from calibration import CalibrationSession, OnlineBaseline
+from metrics import DetectorMetrics, start_metrics_server
+from clip_recorder import AlertClipRecorder
+from session_resources import session_resource, release
+from alert_log import LOG_FILE
+from context import create_provider, UIContextProvider, CONTEXT_ENV, DEFAULT_SOURCE
+from config import current_config
+from telemetry import TelemetryRecorder
+from session_summary import SessionSummary, export_report, new_summary_path, format_report
+from camera import CaptureManager, CaptureConfig, CAMERA_LOST, fit_frame
+from profile_store import (load_profile, save_profile, record_calibration,
+                           merge_ear_stats, driver_from_argv, RunningStats)
 
 # Try to import audio libraries
 try:
@@ -21,46 +33,34 @@ except ImportError:
     PYGAME_AVAILABLE = False
     print("pygame not available, will use browser-based audio")
 
-# ---------- Landmarks ----------
-L_EYE = [33, 160, 158, 133, 153, 144]
-R_EYE = [263, 387, 385, 362, 380, 373]
-UPPER_LIP = [13, 14]
-LOWER_LIP = [17, 18]
-LEFT_MOUTH = 78
-RIGHT_MOUTH = 308
+# ---------- Model loading ----------
+@st.cache_resource(show_spinner=False)
+def get_model_loader():
+    """Build and warm up the face mesh once per server process, off the script thread.
 
-# ---------- Helper Functions ----------
-def eye_aspect_ratio(eye):
-    if len(eye) < 6:
-        return 0.0
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
-    if C == 0:
-        return 0.0
-    return (A + B) / (2.0 * C)
-
-def mouth_aspect_ratio(upper_pts, lower_pts, left_pt, right_pt):
-    vertical = np.mean([dist.euclidean(u, l) for u, l in zip(upper_pts, lower_pts)])
-    horizontal = dist.euclidean(left_pt, right_pt)
-    if horizontal == 0:
-        return 0.0
-    return vertical / horizontal
-
-def get_fatigue_threshold(speed, weather, time_period):
-    base_thresh = 2.0
-    if speed < 15:
-        return float('inf')
-    elif speed < 40:
-        base_thresh = 3.0
-    elif speed >= 80:
-        base_thresh = 1.5
-    if time_period.lower() == "night":
-        base_thresh *= 0.7
-    if weather.lower() in ["fog", "rain", "storm"]:
-        base_thresh *= 0.8
-    return base_thresh
+    A face mesh config change rebuilds it in the background; the new graph
+    replaces loader.face_mesh and the old one is closed after a grace period.
+    """
+    loader = ModelLoader(StartupTimer()).start()
+
+    def swap(face_mesh):
+        old, loader.face_mesh = loader.face_mesh, face_mesh
+        retire_backend(old)
+
+    rebuild_on_config_change(swap, on_error=lambda e: print(f"Backend rebuild failed: {e}"))
+    return loader
+
+config = current_config()
+model_loader = get_model_loader()
+startup_timer = model_loader.timer
 
+# ---------- Driving context ----------
+@st.cache_resource(show_spinner=False)
+def get_context_feed(source):
+    """A CAN/GPS or replay feed describes the vehicle, not a viewer: one thread per process"""
+    return create_provider(source).start()
+
+# ---------- Helper Functions ----------
 def generate_beep_sound(frequency=1000, duration=0.5, sample_rate=44100):
     """Generate a beep sound as numpy array"""
     t = np.linspace(0, duration, int(sample_rate * duration))
@@ -149,6 +149,23 @@ st.markdown("""
 if 'play_sound' not in st.session_state:
     st.session_state.play_sound = False
 
+# ---------- Driver profile ----------
+# Loaded once per browser session; seeds the threshold sliders so drivers skip re-calibration
+driver = st.session_state.get("username") or driver_from_argv()
+if driver and "profile" not in st.session_state:
+    st.session_state.profile = load_profile(driver)
+    st.session_state.session_ear_stats = RunningStats()
+    if st.session_state.profile['ear_thresh']:
+        st.session_state.ear_thresh = round(st.session_state.profile['ear_thresh'], 2)
+    if st.session_state.profile['mar_thresh']:
+        st.session_state.mar_thresh = round(round(st.session_state.profile['mar_thresh'] / 0.05) * 0.05, 2)
+profile = st.session_state.get("profile")
+session_ear_stats = st.session_state.get("session_ear_stats", RunningStats())
+if "online_baseline" not in st.session_state:
+    st.session_state.online_baseline = OnlineBaseline(profile['base_open_ear'] if profile else None)
+online_baseline = st.session_state.online_baseline
+PROFILE_FLUSH_SECS = 60
+
 # Layout columns
 left_col, right_col = st.columns([3, 1])
 
@@ -162,11 +179,38 @@ with right_col:
         time_period = st.selectbox("🕐 Time of Day", ["Day", "Night"])
         weather = st.selectbox("🌤️ Weather Condition", ["Clear", "Fog", "Rain", "Storm"])
         demo_mode = st.checkbox("🎬 Demo Mode (driver_demo.mp4)")
+
+    # Driving context: the controls above, or a CAN/GPS or replay feed (FATIGUE_CONTEXT)
+    if "context" not in st.session_state:
+        source = os.environ.get(CONTEXT_ENV, DEFAULT_SOURCE)
+        if source == DEFAULT_SOURCE:
+            st.session_state.context = create_provider(
+                source, speed=speed, weather=weather, time_period=time_period)
+        else:
+            st.session_state.context = get_context_feed(source)
+    context_provider = st.session_state.context
+    if isinstance(context_provider, UIContextProvider):
+        context_provider.publish(speed, weather, time_period)
+    else:
+        st.caption(f"🛰️ Driving context from **{context_provider.name}** feed")
     
     with st.expander("🎚️ Threshold Settings", expanded=False):
-        EAR_THRESH = st.slider("EAR Threshold", 0.15, 0.35, 0.25, 0.01)
-        MAR_THRESH = st.slider("MAR Threshold", 0.5, 0.8, 0.65, 0.05)
+        # Calibration / auto-adapt hand their threshold to the slider on the next rerun
+        # (a config file reload does the same)
+        if "pending_ear_thresh" in st.session_state:
+            st.session_state.ear_thresh = round(st.session_state.pop("pending_ear_thresh"), 2)
+        if "pending_mar_thresh" in st.session_state:
+            st.session_state.mar_thresh = round(st.session_state.pop("pending_mar_thresh"), 2)
+        # The sliders take their value from session state only (seeded once from the config)
+        if "ear_thresh" not in st.session_state:
+            st.session_state.ear_thresh = config.detection.ear_thresh
+        if "mar_thresh" not in st.session_state:
+            st.session_state.mar_thresh = config.detection.mar_thresh
+        EAR_THRESH = st.slider("EAR Threshold", 0.15, 0.35, step=0.01, key="ear_thresh")
+        MAR_THRESH = st.slider("MAR Threshold", 0.5, 0.8, step=0.05, key="mar_thresh")
         sound_enabled = st.checkbox("🔊 Enable Audio Alerts", value=True)
+        auto_adapt = st.checkbox("🔄 Auto-adapt EAR threshold", value=True)
+        low_light = st.checkbox("🌙 Low-light boost (auto)", value=True)
     
     st.markdown("---")
     
@@ -186,210 +230,255 @@ with right_col:
     session_text = st.empty()
     alerts_text = st.empty()
     status_display = st.empty()
+    startup_caption = st.empty()
 
 # Video display in left column
 with left_col:
     video_placeholder = st.empty()
+    chart_placeholder = st.empty()
     calibration_progress = st.empty()
     alert_placeholder = st.empty()
 
+startup_timer.mark("ui ready")
+
 # ---------- MediaPipe setup ----------
-mp_face = mp.solutions.face_mesh
-face_mesh = mp_face.FaceMesh(
-    static_image_mode=False,
-    max_num_faces=1,
-    refine_landmarks=True,
-    min_detection_confidence=0.5,
-    min_tracking_confidence=0.5
-)
+# Only blocks if the background warm-up hasn't finished by the time we need it
+face_mesh = None
+if calibrate_btn or start_btn:
+    with st.spinner("Loading detection model..."):
+        face_mesh = model_loader.wait()
+startup_caption.caption(f"⏱️ Startup: {startup_timer.report()}")
+
+# ---------- Metrics buffer ----------
+def get_metrics_buffer():
+    """One buffer per browser session, so each has a single writer; viewers attach by name"""
+    return session_resource("metrics_buffer", lambda: MetricsRingBuffer(unique_name()))
+
+metrics_buffer = get_metrics_buffer()
+with right_col:
+    st.caption(f"📈 Watch live metrics: `python metrics_buffer.py {metrics_buffer.name}`")
+CHART_REFRESH_SECS = 1.0
+
+def render_metrics_chart():
+    t, ear, mar = metrics_buffer.snapshot(300)
+    if len(t) < 2:
+        return
+    chart_placeholder.line_chart(
+        {"EAR": ear, "MAR": mar, "EAR threshold": np.full(len(t), EAR_THRESH)},
+        height=180
+    )
+
+# ---------- Health metrics ----------
+@st.cache_resource
+def get_detector_metrics():
+    """Prometheus endpoint started once per server process"""
+    start_metrics_server()
+    return DetectorMetrics()
+
+detector_metrics = get_detector_metrics()
+
+# ---------- Detector ----------
+# The state machine shared with the Tk app and the server; one per browser session,
+# kept across reruns. This page only adds drawing, sound and the controls.
+if "detector" not in st.session_state:
+    st.session_state.detector = FatigueDetector(metrics=detector_metrics, context=context_provider)
+detector = st.session_state.detector
+detector.EAR_THRESH = EAR_THRESH
+detector.MAR_THRESH = MAR_THRESH
+detector.enhancer.enabled = low_light
+
+STATUS_TEXT = {
+    "NO_FACE": "⚠️ NO FACE DETECTED",
+    "EYES_CLOSING": "⚠️ Eyes Closing... ({closed_secs:.1f}s)",
+    "EYES_OFF_ROAD": "⚠️ Eyes Off Road... ({off_road_secs:.1f}s)",
+    "DROWSINESS": "🚨 DROWSINESS ALERT ({closed_secs:.1f}s)",
+    "DISTRACTION": "🚨 EYES OFF ROAD ({off_road_secs:.1f}s)",
+    "YAWNING": "🚨 YAWNING DETECTED",
+    "NODDING": "🚨 HEAD NOD DETECTED",
+}
+
+# ---------- Alert clips ----------
+def get_clip_recorder():
+    """Pre-alert video buffer of this browser session, kept across its reruns"""
+    return session_resource("clip_recorder", AlertClipRecorder)
+
+def close_clip_recorder():
+    """Finish this session's pending clips; the next run starts a fresh pre-alert buffer"""
+    release("clip_recorder")
 
 # ---------- Detection variables ----------
 cap = None
 running = False
 base_open_ear = None
-eyes_closed_start = None
-yawn_start = None
-ear_history = deque(maxlen=3)
-consecutive_drowsy = 0
-total_alerts = 0
 session_start = None
 ear_values = deque(maxlen=100)
 mar_values = deque(maxlen=100)
 timestamps = deque(maxlen=100)
-last_alert_time = 0
+last_chart_time = 0
+last_profile_flush = time.time()
 
 # ---------- Helper functions ----------
-def compute_frame_ear(frame):
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = face_mesh.process(frame_rgb)
-    if not results.multi_face_landmarks:
+def log_event(ear, mar, alert_type=None, clip=None):
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(LOG_FILE, "a") as f:
+        f.write(f"{timestamp} | ALERT #{detector.total_alerts} | EAR={ear:.3f} | MAR={mar:.3f} | "
+                f"Speed={int(detector.speed)} km/h | Weather={detector.weather} | "
+                f"Time={detector.time_period}"
+                + (f" | Type={alert_type}" if alert_type else "")
+                + (f" | Clip={clip}" if clip else "") + "\n")
+
+def get_capture(demo_mode):
+    """Reuse the capture across reruns; reopening a USB camera costs ~1 s"""
+    source = "driver_demo.mp4" if demo_mode else 0
+    cap = st.session_state.get("cap")
+    if cap is not None and cap.isOpened() and st.session_state.get("cap_source") == source:
+        return cap
+    release_capture()
+
+    if demo_mode and not os.path.exists("driver_demo.mp4"):
+        st.error("❌ Demo video 'driver_demo.mp4' not found!")
         return None
-    lm = results.multi_face_landmarks[0]
-    h, w = frame.shape[:2]
-    left_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) for i in L_EYE]
-    right_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) for i in R_EYE]
-    l_ear = eye_aspect_ratio(left_pts)
-    r_ear = eye_aspect_ratio(right_pts)
-    if l_ear > 0 and r_ear > 0:
-        return (l_ear + r_ear) / 2
-    elif l_ear > 0:
-        return l_ear
-    elif r_ear > 0:
-        return r_ear
-    else:
+    capture = current_config().capture
+    cap = CaptureManager(source, loop=demo_mode, metrics=detector_metrics,
+                         config=CaptureConfig(*capture.web_size, capture.fps))
+    if not cap.open():
+        st.error("❌ Cannot open camera/video!")
         return None
+    st.session_state.cap = cap
+    st.session_state.cap_source = source
+    return cap
+
+def release_capture():
+    cap = st.session_state.pop("cap", None)
+    st.session_state.pop("cap_source", None)
+    if cap is not None:
+        cap.release()
 
-def log_event(ear, mar):
-    global total_alerts
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open("fatigue_log.txt", "a") as f:
-        f.write(f"{timestamp} | ALERT #{total_alerts} | EAR={ear:.3f} | MAR={mar:.3f} | "
-                f"Speed={speed} km/h | Weather={weather} | Time={time_period}\n")
-
-# ---------- Calibration with Live Feed ----------
-if calibrate_btn:
-    cap_calib = cv2.VideoCapture(0)
-    if demo_mode:
-        if os.path.exists("driver_demo.mp4"):
-            cap_calib = cv2.VideoCapture("driver_demo.mp4")
-        else:
-            st.error("Demo video not found")
-            cap_calib = None
-    
-    if cap_calib:
-        calibration_progress.info("👁️ **Calibrating...** Keep your eyes wide open!")
-        progress_bar = calibration_progress.progress(0)
-        
-        ear_vals = []
-        start_time = time.time()
-        frame_count = 0
-        
-        while time.time() - start_time < 3:
-            ret, frame = cap_calib.read()
-            if not ret:
-                if demo_mode:
-                    cap_calib.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                break
-            
-            frame = cv2.resize(frame, (640, 480))
-            
-            # Show calibration on frame
-            elapsed = time.time() - start_time
-            remaining = 3 - elapsed
-            cv2.putText(frame, f"Calibrating: {remaining:.1f}s", 
-                       (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.2, (0, 255, 255), 3)
-            cv2.putText(frame, "Keep eyes WIDE OPEN!", 
-                       (20, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-            
-            # Show live feed during calibration
-            video_placeholder.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), 
-                                   channels="RGB", use_container_width=True)
-            
-            ear = compute_frame_ear(frame)
-            if ear is not None and ear > 0.1:
-                ear_vals.append(ear)
-            
-            # Update progress bar
-            progress = int((elapsed / 3.0) * 100)
-            progress_bar.progress(min(progress, 100))
-            
-            frame_count += 1
-            time.sleep(0.033)  # ~30 FPS
-        
-        cap_calib.release()
-        progress_bar.empty()
-        
-        if ear_vals:
-            ear_vals = sorted(ear_vals)
-            # Remove outliers
-            ear_vals = ear_vals[len(ear_vals)//4:-len(ear_vals)//4] if len(ear_vals) > 4 else ear_vals
-            base_open_ear = np.mean(ear_vals)
-            EAR_THRESH = max(0.18, base_open_ear * 0.65)
-            calibration_progress.success(
-                f"✅ **Calibration Complete!**\n\n"
-                f"Open-eye EAR: **{base_open_ear:.3f}**\n\n"
-                f"New Threshold: **{EAR_THRESH:.3f}**"
-            )
-        else:
-            calibration_progress.error("❌ Calibration failed. Face not detected clearly.")
+def close_telemetry():
+    recorder = st.session_state.pop("telemetry", None)
+    if recorder:
+        detector.telemetry = None
+        recorder.close()
+
+
+def finish_summary():
+    """Close out the running session summary; returns the latest report, if any"""
+    summary = st.session_state.pop("summary", None)
+    if summary:
+        report = summary.report(time.time())
+        export_report(report, new_summary_path("json"))
+        st.session_state.last_summary = report
+    return st.session_state.get("last_summary")
+
+
+def on_calibration_complete(base, thresh):
+    global base_open_ear, EAR_THRESH
+    base_open_ear = base
+    EAR_THRESH = detector.EAR_THRESH = thresh
+    if profile:
+        # Use the smoothed long-term baseline rather than this one reading
+        record_calibration(profile, base, thresh)
+        base_open_ear = profile['base_open_ear']
+        EAR_THRESH = detector.EAR_THRESH = profile['ear_thresh']
+        save_driver_profile()
+    online_baseline.reset(base_open_ear)
+    st.session_state.pending_ear_thresh = EAR_THRESH
+    calibration_progress.success(
+        f"✅ **Calibration Complete!**\n\n"
+        f"Open-eye EAR: **{base_open_ear:.3f}**\n\n"
+        f"New Threshold: **{EAR_THRESH:.3f}**"
+    )
+
+def save_driver_profile():
+    global session_ear_stats
+    if not profile:
+        return
+    profile['ear_thresh'] = EAR_THRESH
+    if online_baseline.base_open_ear is not None:
+        profile['base_open_ear'] = online_baseline.base_open_ear
+    profile['mar_thresh'] = MAR_THRESH
+    merge_ear_stats(profile, session_ear_stats)
+    session_ear_stats = st.session_state.session_ear_stats = RunningStats()
+    try:
+        save_profile(profile)
+    except OSError as e:
+        print(f"Could not save driver profile: {e}")
+
+def on_calibration_error(message):
+    calibration_progress.error(f"❌ Calibration failed. {message}")
 
 # ---------- Start Detection ----------
-if start_btn:
-    running = True
+if start_btn or calibrate_btn:
+    cap = get_capture(demo_mode)
+    running = cap is not None
+    detector_metrics.running(running)
+
+if start_btn and running:
     session_start = time.time()
-    total_alerts = 0
-    consecutive_drowsy = 0
-    eyes_closed_start = None
-    yawn_start = None
-    last_alert_time = 0
-    ear_history.clear()
+    st.session_state.session_start = session_start
+    detector.reset()
     alert_placeholder.empty()
-    
-    cap = cv2.VideoCapture(0)
-    if demo_mode:
-        if not os.path.exists("driver_demo.mp4"):
-            st.error("❌ Demo video 'driver_demo.mp4' not found!")
-            running = False
-        else:
-            cap = cv2.VideoCapture("driver_demo.mp4")
-    
-    if not cap.isOpened():
-        st.error("❌ Cannot open camera/video!")
-        running = False
+    close_telemetry()
+    st.session_state.telemetry = detector.telemetry = TelemetryRecorder()
+    st.session_state.summary = SessionSummary(session_start)
+
+# ---------- Calibration on the Live Feed ----------
+# Calibration is a mode of the detection loop below: same capture, same frames
+calibration = None
+if calibrate_btn and running:
+    session_start = st.session_state.get("session_start", time.time())
+    progress_bar = calibration_progress.progress(0, text="👁️ Calibrating... Keep your eyes wide open!")
+    calibration = CalibrationSession(
+        on_progress=lambda frac: progress_bar.progress(
+            frac, text="👁️ Calibrating... Keep your eyes wide open!"),
+        on_complete=on_calibration_complete,
+        on_error=on_calibration_error
+    )
 
 # ---------- Stop Detection ----------
 if stop_btn:
     running = False
-    eyes_closed_start = None
-    yawn_start = None
-    ear_history.clear()
-    consecutive_drowsy = 0
     alert_placeholder.empty()
-    if cap:
-        cap.release()
+    release_capture()
+    close_telemetry()
+    close_clip_recorder()
+    detector_metrics.running(False)
+    save_driver_profile()
+    report = finish_summary()
+    if report:
+        alert_placeholder.info("**📋 Session summary**  \n" + "  \n".join(format_report(report)))
 
 # ---------- Detection Loop ----------
+clip_recorder = get_clip_recorder() if running else None
 while running and cap and cap.isOpened():
-    ret, frame = cap.read()
-    if not ret:
-        if demo_mode:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            continue
-        break
-
-    frame = cv2.resize(frame, (640, 480))
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-    results = face_mesh.process(frame_rgb)
-
-    avg_ear = None
-    mar = None
-
-    if results.multi_face_landmarks:
-        lm = results.multi_face_landmarks[0]
-        h, w = frame.shape[:2]
-
-        # Eyes
-        left_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) for i in L_EYE]
-        right_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) for i in R_EYE]
-        left_ear = eye_aspect_ratio(left_pts)
-        right_ear = eye_aspect_ratio(right_pts)
-        avg_ear = (left_ear + right_ear) / 2.0
-
-        # Mouth
-        up = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) for i in UPPER_LIP]
-        low = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) for i in LOWER_LIP]
-        left_mouth = (int(lm.landmark[LEFT_MOUTH].x * w), int(lm.landmark[LEFT_MOUTH].y * h))
-        right_mouth = (int(lm.landmark[RIGHT_MOUTH].x * w), int(lm.landmark[RIGHT_MOUTH].y * h))
-        mar = mouth_aspect_ratio(up, low, left_mouth, right_mouth)
-
-    # Smoothing
-    if avg_ear:
-        ear_history.append(avg_ear)
-        smooth_ear = np.mean(ear_history)
-    else:
-        smooth_ear = None
-        ear_history.clear()
+    # A face mesh config change swaps in a rebuilt graph once it is warm; detection
+    # settings from a config file edit are applied by the detector between frames
+    detector.face_mesh = model_loader.face_mesh
+
+    t_capture = time.perf_counter()
+    frame = cap.read()
+    if frame is None:
+        if cap.is_file:
+            break
+        if not cap.connected:
+            # Keep the loop alive; the capture manager reconnects in the background
+            status_display.error(f"📷 **Status:** {CAMERA_LOST} - reconnecting...")
+            detector.camera_lost()
+        continue
+
+    frame = fit_frame(frame, current_config().capture.web_size)
+    clip_recorder.add_frame(frame)
+    t_preprocess = time.perf_counter()
+    _, lm = detector.detect(frame)
+    t_logic = time.perf_counter()
+
+    h, w = frame.shape[:2]
+    result = detector.process_landmarks(lm, w, h, time.time())
+    smooth_ear, mar = result["ear"], result["mar"]
+
+    # Calibration consumes the same per-frame EAR
+    if calibration is not None and calibration.active:
+        calibration.feed(result["frame_ear"])
 
     # Store metrics
     if smooth_ear:
@@ -397,67 +486,46 @@ while running and cap and cap.isOpened():
         timestamps.append(time.time())
     if mar:
         mar_values.append(mar)
+    metrics_buffer.push(time.time(), smooth_ear, mar)
+
+    # Attentive frames keep the open-eye baseline current
+    if result["face"] and detector.eyes_closed_start is None:
+        session_ear_stats.add(smooth_ear)
+        if auto_adapt and detector.yawn_start is None:
+            detector.EAR_THRESH = online_baseline.update(smooth_ear, detector.EAR_THRESH)
+    # Auto-adapt and config reloads hand their thresholds to the sliders on the next rerun
+    if detector.EAR_THRESH != EAR_THRESH:
+        EAR_THRESH = st.session_state.pending_ear_thresh = detector.EAR_THRESH
+    if detector.MAR_THRESH != MAR_THRESH:
+        MAR_THRESH = st.session_state.pending_mar_thresh = detector.MAR_THRESH
+
+    status_text = STATUS_TEXT.get(result["status"], "✅ ATTENTIVE").format(**result)
+
+    # Alerts are debounced by the detector
+    if result["alert"]:
+        alert_type = result["alert"]
+        clip = clip_recorder.trigger(alert_type)
+        log_event(smooth_ear if smooth_ear else 0, mar if mar else 0, alert_type, clip)
+
+        # Play sound
+        if sound_enabled:
+            if PYGAME_AVAILABLE:
+                play_alert_sound()
+            else:
+                # Use HTML audio for web
+                sound_array = generate_beep_sound(1200, 0.3)
+                audio_html = autoplay_audio(sound_array)
+                alert_placeholder.markdown(audio_html, unsafe_allow_html=True)
 
-    # Detection logic
-    threshold_time = get_fatigue_threshold(speed, weather, time_period)
-    alert = False
-    status_text = "✅ ATTENTIVE"
-    alert_type = ""
+        # Show visual alert
+        alert_placeholder.error(f"🚨 **{alert_type} ALERT!** Wake up!")
 
-    if smooth_ear is None:
-        status_text = "⚠️ NO FACE DETECTED"
-        eyes_closed_start = None
-        consecutive_drowsy = 0
-    else:
-        # Eyes closed
-        if smooth_ear < EAR_THRESH:
-            if eyes_closed_start is None:
-                eyes_closed_start = time.time()
-            elapsed = time.time() - eyes_closed_start
-            if elapsed > threshold_time:
-                alert = True
-                alert_type = "DROWSINESS"
-                status_text = f"🚨 DROWSINESS ALERT ({elapsed:.1f}s)"
-                consecutive_drowsy += 1
-            else:
-                status_text = f"⚠️ Eyes Closing... ({elapsed:.1f}s)"
-        else:
-            eyes_closed_start = None
-            consecutive_drowsy = max(0, consecutive_drowsy - 1)
-        
-        # Yawn
-        if mar and mar > MAR_THRESH:
-            if yawn_start is None:
-                yawn_start = time.time()
-            yawn_duration = time.time() - yawn_start
-            if yawn_duration > 1.0:
-                alert = True
-                alert_type = "YAWNING"
-                status_text = "🚨 YAWNING DETECTED"
-        else:
-            yawn_start = None
-        
-        # Trigger alert
-        if alert:
-            current_time = time.time()
-            # Prevent alert spam (at least 2 seconds between alerts)
-            if current_time - last_alert_time > 2.0:
-                total_alerts += 1
-                last_alert_time = current_time
-                log_event(smooth_ear if smooth_ear else 0, mar if mar else 0)
-                
-                # Play sound
-                if sound_enabled:
-                    if PYGAME_AVAILABLE:
-                        play_alert_sound()
-                    else:
-                        # Use HTML audio for web
-                        sound_array = generate_beep_sound(1200, 0.3)
-                        audio_html = autoplay_audio(sound_array)
-                        alert_placeholder.markdown(audio_html, unsafe_allow_html=True)
-                
-                # Show visual alert
-                alert_placeholder.error(f"🚨 **{alert_type} ALERT!** Wake up!")
+    summary = st.session_state.get("summary")
+    if summary:
+        summary.update(time.time(), result["status"], smooth_ear, EAR_THRESH, detector.speed,
+                       result["alert"])
+
+    t_render = time.perf_counter()
 
     # Draw metrics on frame
     color = (0, 255, 0) if "ATTENTIVE" in status_text else (0, 0, 255)
@@ -475,13 +543,17 @@ while running and cap and cap.isOpened():
     
     # Status at bottom
     status_bg_color = (0, 100, 0) if "ATTENTIVE" in status_text else (0, 0, 150)
-    cv2.rectangle(frame, (0, 440), (640, 480), status_bg_color, -1)
-    cv2.putText(frame, status_text, (20, 470), 
+    frame_h, frame_w = frame.shape[:2]
+    cv2.rectangle(frame, (0, frame_h - 40), (frame_w, frame_h), status_bg_color, -1)
+    cv2.putText(frame, status_text, (20, frame_h - 10), 
                 cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
 
     # Display frame
     video_placeholder.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), 
                            channels="RGB", use_container_width=True)
+    if startup_timer.elapsed("first frame") is None:
+        startup_timer.mark("first frame")
+        startup_caption.caption(f"⏱️ Startup: {startup_timer.report()}")
 
     # Update session info
     if session_start:
@@ -489,7 +561,7 @@ while running and cap and cap.isOpened():
         mins = elapsed // 60
         secs = elapsed % 60
         session_text.markdown(f"**⏱️ Duration:** {mins:02d}:{secs:02d}")
-        alerts_text.markdown(f"**🚨 Total Alerts:** {total_alerts}")
+        alerts_text.markdown(f"**🚨 Total Alerts:** {detector.total_alerts}")
         
         # Status indicator
         if "ATTENTIVE" in status_text:
@@ -499,17 +571,33 @@ while running and cap and cap.isOpened():
         else:
             status_display.error("🔴 **Status:** Alert!")
 
+    # Chart redraws are throttled so they don't eat into the frame budget
+    if time.time() - last_chart_time > CHART_REFRESH_SECS:
+        render_metrics_chart()
+        last_chart_time = time.time()
+
+    # Streamlit may cut the loop short on any rerun, so persist stats periodically
+    if profile and time.time() - last_profile_flush > PROFILE_FLUSH_SECS:
+        save_driver_profile()
+        last_profile_flush = time.time()
+
+    t_done = time.perf_counter()
+    detector_metrics.observe_stage("capture", t_preprocess - t_capture)
+    detector_metrics.observe_stage("logic", t_render - t_logic)
+    detector_metrics.observe_stage("render", t_done - t_render)
+
     time.sleep(0.033)  # ~30 FPS  
 
-# Optional: Add a back button (FIXED - opens in new tab like login.py)
 st.markdown("<br>", unsafe_allow_html=True)
 if st.button("Thank you page"):
-    if os.path.exists("Thankyou.py"):
-        subprocess.Popen([sys.executable, "-m", "streamlit", "run", "Thankyou.py"])
-        st.success("🚗 Thank You page is opening in a new window!")
-    else:
-        st.error("❌ Could not find Thankyou.py in the current directory")
-
-# Cleanup
+    save_driver_profile()
+    release_capture()
+    close_telemetry()
+    close_clip_recorder()
+    finish_summary()
+    st.switch_page("Thankyou.py")
+
+# Cleanup (only reached when the stream itself ended)
 if cap:
-    cap.release()
\ No newline at end of file
+    release_capture()
+    close_clip_recorder()
\ No newline at end of file
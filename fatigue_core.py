@@ -0,0 +1,94 @@
+"""Detection helpers shared by the Tk and Streamlit apps.
+
+Only the standard library and numpy are imported here so that importing this
+module is cheap; mediapipe is loaded on demand by `create_face_mesh`.
+"""
+import math
+
+import numpy as np
+
+from threshold_policy import active_policy
+from config import current_config
+
+# ---------- Landmarks ----------
+L_EYE = [33, 160, 158, 133, 153, 144]
+R_EYE = [263, 387, 385, 362, 380, 373]
+UPPER_LIP = [13, 14]
+LOWER_LIP = [17, 18]
+LEFT_MOUTH = 78
+RIGHT_MOUTH = 308
+
+# ---------- Helper Functions ----------
+def eye_aspect_ratio(eye):
+    if len(eye) < 6:
+        return 0.0
+    A = math.dist(eye[1], eye[5])
+    B = math.dist(eye[2], eye[4])
+    C = math.dist(eye[0], eye[3])
+    if C == 0:
+        return 0.0
+    return (A + B) / (2.0 * C)
+
+def mouth_aspect_ratio(upper_pts, lower_pts, left_pt, right_pt):
+    vertical = np.mean([math.dist(u, l) for u, l in zip(upper_pts, lower_pts)])
+    horizontal = math.dist(left_pt, right_pt)
+    if horizontal == 0:
+        return 0.0
+    return vertical / horizontal
+
+def get_fatigue_threshold(speed, weather, time_period):
+    """Returns threshold in seconds for eye closure, from the (hot-reloaded) policy table"""
+    return active_policy().lookup(speed, weather, time_period)
+
+def get_distraction_threshold(speed):
+    """Returns how long (seconds) eyes may stay off the road"""
+    if speed < 15:
+        return float('inf')
+    elif speed < 40:
+        return 3.0
+    elif speed >= 80:
+        return 1.0  # A second at 80+ km/h is over 20 m travelled blind
+    return 2.0
+
+def speed_band(speed):
+    """Label for the speed ranges used by get_fatigue_threshold"""
+    if speed < 15:
+        return "0-15"
+    elif speed < 40:
+        return "15-40"
+    elif speed < 80:
+        return "40-80"
+    return "80+"
+
+def landmark_points(lm, indices, w, h):
+    """Pixel coordinates of the given face-mesh landmarks"""
+    return [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) for i in indices]
+
+def frame_metrics(lm, w, h):
+    """Return (left_ear, right_ear, mar) for one face's landmarks"""
+    left_ear = eye_aspect_ratio(landmark_points(lm, L_EYE, w, h))
+    right_ear = eye_aspect_ratio(landmark_points(lm, R_EYE, w, h))
+    up = landmark_points(lm, UPPER_LIP, w, h)
+    low = landmark_points(lm, LOWER_LIP, w, h)
+    left_mouth, right_mouth = landmark_points(lm, [LEFT_MOUTH, RIGHT_MOUTH], w, h)
+    mar = mouth_aspect_ratio(up, low, left_mouth, right_mouth)
+    return left_ear, right_ear, mar
+
+# ---------- Face Mesh ----------
+def create_face_mesh(refine_landmarks=True):
+    """Build the MediaPipe face mesh with the configured confidences, importing mediapipe only when needed"""
+    import mediapipe as mp
+
+    settings = current_config().face_mesh
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=False,
+        max_num_faces=1,
+        refine_landmarks=refine_landmarks,
+        min_detection_confidence=settings.min_detection_confidence,
+        min_tracking_confidence=settings.min_tracking_confidence
+    )
+
+def warm_up_face_mesh(face_mesh, size=(480, 640)):
+    """Run a blank frame through the model so graph setup isn't paid on the first real frame"""
+    dummy = np.zeros((size[0], size[1], 3), dtype=np.uint8)
+    face_mesh.process(dummy)
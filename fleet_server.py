@@ -0,0 +1,154 @@
+"""Fleet aggregation service: merges the alert streams of many vehicles.
+
+    python fleet_server.py                                     # serve on :8770
+    python fleet_server.py --ingest fatigue_log.txt --vehicle cab-12 --driver alice
+
+Endpoints
+    GET  /health                      totals as JSON
+    POST /ingest                      JSON array or newline-delimited JSON events:
+                                      {"vehicle", "ts", "type", "seq", "driver", "ear",
+                                       "mar", "speed", "weather", "time_period"}
+    POST /ingest/log?vehicle=&driver= body is raw fatigue_log.txt content
+    GET  /rollups/hourly?day=&vehicle=
+    GET  /rollups/drivers?day=
+    GET  /rollups/conditions?day=
+    GET  /events?day=&vehicle=&limit= raw events of one day partition
+
+Re-sending a batch is safe: events are deduplicated on (vehicle, ts, seq,
+type). All writes go through one worker thread so SQLite never sees two
+writers, while the event loop keeps accepting connections.
+See fleet_store.py for the storage layout and fleet_simulator.py for a
+local stand-in for the vehicles.
+"""
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from alert_log import parse_line, read_log
+from detection_server import read_request, send_response
+from fleet_store import FleetStore, FLEET_DATA_DIR
+
+# ---------- Configuration ----------
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8770
+
+
+def parse_events(body):
+    """Events from a JSON array or newline-delimited JSON body"""
+    text = body.decode("utf-8")
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def log_events(text, vehicle, driver=None):
+    """Events from raw alert log text, attributed to one vehicle"""
+    events = []
+    for line in text.splitlines():
+        event = parse_line(line)
+        if event is not None:
+            event.update(vehicle=vehicle, driver=driver)
+            events.append(event)
+    return events
+
+
+# ---------- Connection Handling ----------
+class FleetServer:
+    def __init__(self, store):
+        self.store = store
+        self.batches = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fleet-writer")
+
+    async def ingest(self, events):
+        loop = asyncio.get_running_loop()
+        self.batches += 1
+        return await loop.run_in_executor(self._writer, self.store.ingest, events)
+
+    async def query(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, path, query, headers, body = request
+            arg = lambda name, default=None: query.get(name, [default])[0]
+
+            if method == "GET" and path == "/health":
+                totals = await self.query(self.store.totals)
+                await send_response(writer, "200 OK", dict(totals, status="ok", batches=self.batches))
+            elif method == "POST" and path == "/ingest":
+                await send_response(writer, "200 OK", await self.ingest(parse_events(body)))
+            elif method == "POST" and path == "/ingest/log":
+                if not arg("vehicle"):
+                    raise ValueError("vehicle is required")
+                events = log_events(body.decode("utf-8", "replace"), arg("vehicle"), arg("driver"))
+                await send_response(writer, "200 OK", await self.ingest(events))
+            elif method == "GET" and path == "/rollups/hourly":
+                await send_response(writer, "200 OK",
+                                    await self.query(self.store.hourly, arg("day"), arg("vehicle")))
+            elif method == "GET" and path == "/rollups/drivers":
+                await send_response(writer, "200 OK", await self.query(self.store.drivers, arg("day")))
+            elif method == "GET" and path == "/rollups/conditions":
+                await send_response(writer, "200 OK",
+                                    await self.query(self.store.conditions, arg("day")))
+            elif method == "GET" and path == "/events":
+                if not arg("day"):
+                    raise ValueError("day is required")
+                await send_response(writer, "200 OK", await self.query(
+                    self.store.events, arg("day"), arg("vehicle"), int(arg("limit", 1000))))
+            else:
+                await send_response(writer, "404 Not Found", {"error": "not found"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:
+            try:
+                await send_response(writer, "400 Bad Request", {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+
+# ---------- Main ----------
+async def serve(host, port, store):
+    server = await asyncio.start_server(FleetServer(store).handle, host, port)
+    print(f"Fleet server listening on http://{host}:{port}")
+    await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet alert aggregation service")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--data", default=FLEET_DATA_DIR, help="storage directory")
+    parser.add_argument("--ingest", metavar="LOG", nargs="+",
+                        help="ingest alert log files and exit instead of serving")
+    parser.add_argument("--vehicle", help="vehicle id for --ingest")
+    parser.add_argument("--driver", help="driver for --ingest")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="recompute the rollups from the raw partitions and exit")
+    args = parser.parse_args()
+
+    store = FleetStore(args.data)
+    try:
+        if args.rebuild:
+            store.rebuild_rollups()
+            print(store.totals())
+        elif args.ingest:
+            if not args.vehicle:
+                parser.error("--ingest needs --vehicle")
+            for path in args.ingest:
+                events = [dict(e, vehicle=args.vehicle, driver=args.driver) for e in read_log(path)]
+                print(f"{path}: {store.ingest(events)}")
+        else:
+            asyncio.run(serve(args.host, args.port, store))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Local stand-in for a fleet of vehicles posting alerts to fleet_server.py.
+
+    python fleet_server.py --data /tmp/fleet &
+    python fleet_simulator.py --vehicles 200 --events 1000000 [--resend 0.05]
+
+Each simulated vehicle has a driver and a drifting speed / weather / time of
+day, and produces alerts with realistic EAR / MAR values. Events are posted
+in batches; a fraction of batches is sent twice, as a vehicle with a flaky
+uplink would, so the server's deduplication gets exercised. At the end the
+server's totals are checked against the number of unique events sent.
+"""
+import argparse
+import json
+import random
+import time
+import urllib.request
+
+WEATHERS = ["Clear", "Rain", "Fog", "Snow"]
+ALERT_MIX = [("DROWSINESS", 0.5), ("YAWNING", 0.25), ("NODDING", 0.1), ("DISTRACTION", 0.15)]
+
+
+class SimulatedVehicle:
+    def __init__(self, index, start, rng):
+        self.vehicle = f"cab-{index:04d}"
+        self.driver = f"driver-{rng.randrange(index + 1, index + 3):04d}"
+        self.rng = rng
+        self.t = start + rng.uniform(0, 600)
+        self.seq = 0
+        self.speed = rng.uniform(20, 90)
+
+    def next_event(self):
+        rng = self.rng
+        self.t += rng.expovariate(1 / 90.0)    # An alert every ~90 s of driving
+        self.seq += 1
+        self.speed = min(130, max(0, self.speed + rng.gauss(0, 10)))
+        kind = rng.choices([k for k, _ in ALERT_MIX], [w for _, w in ALERT_MIX])[0]
+        hour = time.gmtime(self.t).tm_hour
+        return {
+            "vehicle": self.vehicle,
+            "driver": self.driver,
+            "ts": round(self.t, 3),
+            "seq": self.seq,
+            "type": kind,
+            "ear": round(rng.uniform(0.08, 0.2) if kind == "DROWSINESS" else rng.uniform(0.2, 0.32), 3),
+            "mar": round(rng.uniform(0.7, 1.0) if kind == "YAWNING" else rng.uniform(0.2, 0.5), 3),
+            "speed": round(self.speed),
+            "weather": rng.choices(WEATHERS, [0.7, 0.2, 0.05, 0.05])[0],
+            "time_period": "Day" if 6 <= hour < 20 else "Night",
+        }
+
+
+def post(url, events):
+    body = "\n".join(json.dumps(e) for e in events).encode()
+    req = urllib.request.Request(url + "/ingest", data=body,
+                                 headers={"Content-Type": "application/x-ndjson"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        return json.loads(resp.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate vehicles posting alerts")
+    parser.add_argument("--url", default="http://127.0.0.1:8770")
+    parser.add_argument("--vehicles", type=int, default=50)
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--resend", type=float, default=0.05, help="fraction of batches sent twice")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.time() - 7 * 86400
+    fleet = [SimulatedVehicle(i, start, rng) for i in range(args.vehicles)]
+    before = json.loads(urllib.request.urlopen(args.url + "/health", timeout=10).read())["events"]
+
+    sent = accepted = duplicates = 0
+    started = time.perf_counter()
+    while sent < args.events:
+        vehicle = rng.choice(fleet)
+        n = min(args.batch, args.events - sent)
+        batch = [vehicle.next_event() for _ in range(n)]
+        result = post(args.url, batch)
+        if rng.random() < args.resend:
+            resent = post(args.url, batch)
+            duplicates += resent["duplicates"]
+        sent += n
+        accepted += result["accepted"]
+    secs = time.perf_counter() - started
+
+    after = json.loads(urllib.request.urlopen(args.url + "/health", timeout=10).read())["events"]
+    print(f"{sent} events from {args.vehicles} vehicles in {secs:.1f}s ({sent / secs:.0f}/s)")
+    print(f"accepted {accepted}, resent duplicates dropped {duplicates}, "
+          f"rollup total grew by {after - before}")
+    if after - before != accepted:
+        raise SystemExit("rollup totals do not match accepted events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Fleet-wide alert storage with pre-aggregated rollups.
+
+Raw events are partitioned by UTC day, one SQLite file per day under
+`events/`, and clustered by vehicle inside it (a WITHOUT ROWID table keyed
+on vehicle, time, sequence and type). That key is also the dedupe key: a
+vehicle resending a batch, or a log ingested twice, is ignored row by row.
+Unnumbered (legacy) log lines have no sequence of their own, so repeats of
+one timestamp and type within a batch are numbered -1, -2, ... in order;
+re-ingesting the same log gives the same numbers.
+Old days can be archived or dropped by moving a single file.
+
+Only events that were actually new are folded into the rollups in
+`rollups.db` (per hour and vehicle, per day and driver, per day and driving
+condition), so dashboard queries read a few small tables instead of
+scanning tens of millions of raw events. `rebuild_rollups()` recomputes them
+from the partitions if the two ever disagree (e.g. after a crash between
+the two commits).
+"""
+import glob
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from fatigue_core import speed_band
+
+# ---------- Configuration ----------
+FLEET_DATA_DIR = "fleet_data"
+OPEN_PARTITIONS = 8          # Day files kept open; ingest is mostly today and yesterday
+DEFAULT_TYPE = "ALERT"       # Older log lines don't say which alert fired
+MAX_TS = 253402300800        # 10000-01-01 UTC; later times have no day partition
+MAX_SEQ = 2 ** 63 - 1        # SQLite INTEGER range
+
+_EVENT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    vehicle     TEXT NOT NULL,
+    ts          REAL NOT NULL,
+    seq         INTEGER NOT NULL,
+    type        TEXT NOT NULL,
+    driver      TEXT,
+    ear         REAL,
+    mar         REAL,
+    speed       REAL,
+    weather     TEXT,
+    time_period TEXT,
+    PRIMARY KEY (vehicle, ts, seq, type)
+) WITHOUT ROWID;
+"""
+_ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hourly (
+    hour TEXT, vehicle TEXT, type TEXT,
+    alerts INTEGER NOT NULL, ear_sum REAL NOT NULL, ear_n INTEGER NOT NULL,
+    PRIMARY KEY (hour, vehicle, type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS drivers (
+    day TEXT, driver TEXT, type TEXT, alerts INTEGER NOT NULL,
+    PRIMARY KEY (day, driver, type)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS conditions (
+    day TEXT, speed_band TEXT, weather TEXT, time_period TEXT, type TEXT, alerts INTEGER NOT NULL,
+    PRIMARY KEY (day, speed_band, weather, time_period, type)
+) WITHOUT ROWID;
+"""
+_INSERT = ("INSERT OR IGNORE INTO events (vehicle, ts, seq, type, driver, ear, mar, speed, "
+           "weather, time_period) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _number(event, name):
+    value = event.get(name)
+    if value is None:
+        return None
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def _text(event, name):
+    value = event.get(name)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{name} must be a string")
+    return value
+
+
+def normalize_event(event):
+    """Validated event tuple in _INSERT column order; raises ValueError on bad input.
+
+    Every field is checked and coerced here, so a row that passes can neither
+    fail to insert nor fail to roll up after its day partition has committed.
+    """
+    vehicle = event.get("vehicle")
+    if not vehicle or not isinstance(vehicle, str):
+        raise ValueError("event needs a vehicle id")
+    ts = float(event["ts"])
+    if not 0 <= ts < MAX_TS:
+        raise ValueError("ts must be a Unix time between 1970 and 9999")
+    seq = event.get("seq", event.get("alert_no"))
+    seq = -1 if seq is None else int(seq)
+    if abs(seq) > MAX_SEQ:
+        raise ValueError("seq is out of range")
+    return (vehicle, ts, seq, _text(event, "type") or DEFAULT_TYPE, _text(event, "driver"),
+            _number(event, "ear"), _number(event, "mar"), _number(event, "speed"),
+            _text(event, "weather"), _text(event, "time_period"))
+
+
+def _day(ts):
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+class _Rollup:
+    """Rollup deltas for one ingest batch"""
+
+    def __init__(self):
+        self.hourly = Counter()
+        self.ear_sum = Counter()
+        self.ear_n = Counter()
+        self.drivers = Counter()
+        self.conditions = Counter()
+
+    def add(self, row):
+        vehicle, ts, _, kind, driver, ear, _, speed, weather, time_period = row
+        hour_key = (time.strftime("%Y-%m-%dT%H", time.gmtime(ts)), vehicle, kind)
+        self.hourly[hour_key] += 1
+        if ear is not None:
+            self.ear_sum[hour_key] += ear
+            self.ear_n[hour_key] += 1
+        day = hour_key[0][:10]
+        self.drivers[(day, driver or "", kind)] += 1
+        band = speed_band(speed) if speed is not None else ""
+        self.conditions[(day, band, weather or "", time_period or "", kind)] += 1
+
+    def apply(self, conn):
+        conn.executemany(
+            "INSERT INTO hourly VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (hour, vehicle, type) DO UPDATE SET "
+            "alerts = alerts + excluded.alerts, ear_sum = ear_sum + excluded.ear_sum, "
+            "ear_n = ear_n + excluded.ear_n",
+            [(*k, n, self.ear_sum[k], self.ear_n[k]) for k, n in self.hourly.items()])
+        conn.executemany(
+            "INSERT INTO drivers VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (day, driver, type) DO UPDATE SET "
+            "alerts = alerts + excluded.alerts", [(*k, n) for k, n in self.drivers.items()])
+        conn.executemany(
+            "INSERT INTO conditions VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (day, speed_band, weather, time_period, type) DO UPDATE SET "
+            "alerts = alerts + excluded.alerts", [(*k, n) for k, n in self.conditions.items()])
+
+
+# ---------- Fleet Store ----------
+class FleetStore:
+    """Day-partitioned event store plus rollup tables; safe to share between threads"""
+
+    def __init__(self, directory=FLEET_DATA_DIR):
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "events"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._partitions = OrderedDict()
+        self._rollups = _connect(os.path.join(directory, "rollups.db"))
+        with self._rollups:
+            self._rollups.executescript(_ROLLUP_SCHEMA)
+
+    def _partition(self, day):
+        conn = self._partitions.pop(day, None)
+        if conn is None:
+            conn = _connect(os.path.join(self.directory, "events", day + ".db"))
+            conn.executescript(_EVENT_SCHEMA)
+            if len(self._partitions) >= OPEN_PARTITIONS:
+                self._partitions.popitem(last=False)[1].close()
+        self._partitions[day] = conn
+        return conn
+
+    def days(self):
+        return sorted(os.path.basename(p)[:-3]
+                      for p in glob.glob(os.path.join(self.directory, "events", "*.db")))
+
+    # ---------- Ingest ----------
+    def ingest(self, events):
+        """Store a batch of event dicts; returns {"accepted", "duplicates", "rejected"}"""
+        by_day = {}
+        rejected = 0
+        legacy = Counter()
+        for event in events:
+            if not isinstance(event, dict):
+                rejected += 1
+                continue
+            try:
+                row = normalize_event(event)
+            except (KeyError, TypeError, ValueError, OverflowError):
+                rejected += 1
+                continue
+            if row[2] == -1:
+                key = (row[0], row[1], row[3])
+                legacy[key] += 1
+                row = row[:2] + (-legacy[key],) + row[3:]
+            by_day.setdefault(_day(row[1]), []).append(row)
+
+        rollup = _Rollup()
+        accepted = duplicates = 0
+        with self._lock:
+            for day, rows in by_day.items():
+                conn = self._partition(day)
+                with conn:
+                    cur = conn.cursor()
+                    for row in rows:
+                        cur.execute(_INSERT, row)
+                        if cur.rowcount == 1:
+                            accepted += 1
+                            rollup.add(row)
+                        else:
+                            duplicates += 1
+            if accepted:
+                with self._rollups:
+                    rollup.apply(self._rollups)
+        return {"accepted": accepted, "duplicates": duplicates, "rejected": rejected}
+
+    def rebuild_rollups(self):
+        """Recompute every rollup from the raw partitions"""
+        with self._lock:
+            with self._rollups:
+                for table in ("hourly", "drivers", "conditions"):
+                    self._rollups.execute(f"DELETE FROM {table}")
+                for day in self.days():
+                    rollup = _Rollup()
+                    for row in self._partition(day).execute(
+                            "SELECT vehicle, ts, seq, type, driver, ear, mar, speed, weather, "
+                            "time_period FROM events"):
+                        rollup.add(row)
+                    rollup.apply(self._rollups)
+
+    # ---------- Queries ----------
+    def _select(self, sql, where, order):
+        clauses = [f"{col} {op} ?" for col, op, v in where if v is not None]
+        params = [v for _, _, v in where if v is not None]
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            cur = self._rollups.execute(sql + " " + order, params)
+            cols = [d[0] for d in cur.description]
+            return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def hourly(self, day=None, vehicle=None):
+        return self._select(
+            "SELECT hour, vehicle, type, alerts, ear_sum / NULLIF(ear_n, 0) AS mean_ear FROM hourly",
+            [("hour", ">=", day and day + "T00"), ("hour", "<=", day and day + "T23"),
+             ("vehicle", "=", vehicle)],
+            "ORDER BY hour, vehicle, type")
+
+    def drivers(self, day=None):
+        return self._select(
+            "SELECT driver, type, SUM(alerts) AS alerts FROM drivers",
+            [("day", "=", day)], "GROUP BY driver, type ORDER BY alerts DESC")
+
+    def conditions(self, day=None):
+        return self._select(
+            "SELECT speed_band, weather, time_period, type, SUM(alerts) AS alerts FROM conditions",
+            [("day", "=", day)],
+            "GROUP BY speed_band, weather, time_period, type ORDER BY alerts DESC")
+
+    def events(self, day, vehicle=None, limit=1000):
+        """Raw events of one day partition (optionally one vehicle), oldest first"""
+        if day not in self.days():
+            return []
+        sql = ("SELECT vehicle, ts, seq, type, driver, ear, mar, speed, weather, time_period "
+               "FROM events")
+        params = []
+        if vehicle:
+            sql += " WHERE vehicle = ?"
+            params.append(vehicle)
+        with self._lock:
+            cur = self._partition(day).execute(sql + " ORDER BY vehicle, ts LIMIT ?",
+                                               params + [int(limit)])
+            cols = [d[0] for d in cur.description]
+            return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def totals(self):
+        with self._lock:
+            alerts, vehicles = self._rollups.execute(
+                "SELECT COALESCE(SUM(alerts), 0), COUNT(DISTINCT vehicle) FROM hourly").fetchone()
+        return {"events": alerts, "vehicles": vehicles, "days": len(self.days())}
+
+    def close(self):
+        with self._lock:
+            for conn in self._partitions.values():
+                conn.close()
+            self._partitions.clear()
+            self._rollups.close()
@@ -0,0 +1,86 @@
+"""Gaze direction and eyes-off-road detection from the refined iris landmarks.
+
+`create_face_mesh` already runs the iris refinement, so landmarks 468-477
+are available on every frame. Both eyes are handled in one numpy pass: the
+iris centre is projected onto each eye's corner-to-corner axis, giving
+horizontal / vertical gaze ratios with no extra inference. The eye corners
+are the reference because, unlike the lids, they don't move when the
+driver blinks.
+"""
+import numpy as np
+
+# ---------- Landmarks ----------
+# Per eye, image-left eye first: iris centre, then the eye corners (image left, right)
+IRIS_CENTER = [468, 473]
+CORNER_LEFT = [33, 362]
+CORNER_RIGHT = [133, 263]
+GAZE_LANDMARKS = IRIS_CENTER + CORNER_LEFT + CORNER_RIGHT
+REFINED_LANDMARK_COUNT = 478
+
+
+def gaze_ratios(lm):
+    """Return (horizontal, vertical) iris position, averaged over both eyes.
+
+    Horizontal is the position along the corner-to-corner axis (0..1, growing
+    towards the right of the image); vertical is the distance below that axis
+    in eye widths. Returns None when the landmarks have no iris points.
+    """
+    pts = lm.landmark
+    if len(pts) < REFINED_LANDMARK_COUNT:
+        return None
+    iris, left, right = np.array([(pts[i].x, pts[i].y) for i in GAZE_LANDMARKS]).reshape(3, 2, 2)
+
+    axis = right - left
+    rel = iris - left
+    length_sq = np.maximum(np.einsum("ij,ij->i", axis, axis), 1e-12)
+    h = np.einsum("ij,ij->i", rel, axis) / length_sq
+    v = (axis[:, 0] * rel[:, 1] - axis[:, 1] * rel[:, 0]) / length_sq
+    return float(h.mean()), float(v.mean())
+
+
+# ---------- Distraction Detection ----------
+class DistractionDetector:
+    """Times how long gaze (or the head) has been pointed away from the road"""
+
+    H_LIMIT = 0.15          # Horizontal offset from neutral
+    V_LIMIT = 0.12          # Vertical offset from neutral (looking down at a phone)
+    YAW_LIMIT = 30.0        # deg; a turned head counts even if the iris is centred
+    NEUTRAL_ALPHA = 0.01
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.neutral = None
+        self.offset = (0.0, 0.0)
+        self.off_road_start = None
+
+    def update(self, gaze, yaw, now):
+        """Feed one frame; returns seconds spent off-road so far (0.0 when on-road).
+
+        Pass gaze=None while the eyes are closing: the iris points are guesses
+        then, and closure is the drowsiness detector's job.
+        """
+        if gaze is None and yaw is None:
+            self.off_road_start = None
+            return 0.0
+
+        off_road = yaw is not None and abs(yaw) > self.YAW_LIMIT
+        if gaze is not None:
+            g = np.array(gaze)
+            if self.neutral is None:
+                self.neutral = g
+            dh, dv = g - self.neutral
+            self.offset = (float(dh), float(dv))
+            gaze_off = abs(dh) > self.H_LIMIT or abs(dv) > self.V_LIMIT
+            off_road = off_road or gaze_off
+            # Neutral follows the driver's usual on-road gaze (camera placement, eye shape)
+            if not off_road:
+                self.neutral = self.neutral + self.NEUTRAL_ALPHA * (g - self.neutral)
+
+        if not off_road:
+            self.off_road_start = None
+            return 0.0
+        if self.off_road_start is None:
+            self.off_road_start = now
+        return now - self.off_road_start
@@ -0,0 +1,125 @@
+"""Head pose and nod detection from the face-mesh landmarks.
+
+The pose comes from the same landmark result the EAR/MAR code uses: six
+fixed points are fitted to a generic 3D face with solvePnP, so no extra
+inference pass is needed. The previous frame's solution seeds the next fit,
+which keeps the per-frame cost in the tens of microseconds.
+"""
+import math
+
+import numpy as np
+
+# ---------- Landmarks ----------
+# Nose tip, chin, eye outer corners, mouth corners (image left first)
+POSE_LANDMARKS = [1, 152, 33, 263, 61, 291]
+
+# Generic face in camera-style axes (x right, y down, z away from camera), mm
+MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),
+    (0.0, 330.0, 65.0),
+    (-225.0, -170.0, 135.0),
+    (225.0, -170.0, 135.0),
+    (-150.0, 150.0, 125.0),
+    (150.0, 150.0, 125.0),
+], dtype=np.float64)
+
+DIST_COEFFS = np.zeros((4, 1))
+
+
+# ---------- Pose Estimation ----------
+class HeadPoseEstimator:
+    """solvePnP on a fixed landmark subset; camera matrices are cached per frame size"""
+
+    def __init__(self):
+        self._camera = {}
+        self._rvec = None
+        self._tvec = None
+
+    def camera_matrix(self, w, h):
+        cam = self._camera.get((w, h))
+        if cam is None:
+            # Focal length approximated by the image width, principal point at the centre
+            cam = np.array([[w, 0, w / 2.0], [0, w, h / 2.0], [0, 0, 1]], dtype=np.float64)
+            self._camera[(w, h)] = cam
+        return cam
+
+    def reset(self):
+        self._rvec = None
+        self._tvec = None
+
+    def estimate(self, lm, w, h):
+        """Return (pitch, yaw, roll) in degrees; pitch is positive with the head tilted down"""
+        import cv2
+
+        pts = lm.landmark
+        image_points = np.array([(pts[i].x * w, pts[i].y * h) for i in POSE_LANDMARKS],
+                                dtype=np.float64)
+        guess = self._rvec is not None
+        ok, rvec, tvec = cv2.solvePnP(
+            MODEL_POINTS, image_points, self.camera_matrix(w, h), DIST_COEFFS,
+            self._rvec, self._tvec, useExtrinsicGuess=guess, flags=cv2.SOLVEPNP_ITERATIVE
+        )
+        if not ok:
+            self.reset()
+            return None
+        self._rvec, self._tvec = rvec, tvec
+        return rotation_to_euler(cv2.Rodrigues(rvec)[0])
+
+
+def rotation_to_euler(R):
+    """(pitch, yaw, roll) in degrees from a rotation matrix"""
+    pitch = math.degrees(math.atan2(R[2, 1], R[2, 2]))
+    yaw = math.degrees(math.atan2(-R[2, 0], math.hypot(R[2, 1], R[2, 2])))
+    roll = math.degrees(math.atan2(R[1, 0], R[0, 0]))
+    return pitch, yaw, roll
+
+
+# ---------- Nod Detection ----------
+class NodDetector:
+    """Flags a nod when the head drops quickly below its neutral pitch"""
+
+    NOD_VELOCITY = 35.0     # deg/s downward
+    NOD_DROP = 12.0         # deg below neutral
+    STILL_VELOCITY = 10.0   # deg/s; neutral pitch only adapts while the head is still
+    NEUTRAL_ALPHA = 0.02
+    SMOOTHING = 0.5
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.neutral = None
+        self.pitch = None
+        self.velocity = 0.0
+        self.dropped = False
+        self._last_time = None
+
+    def update(self, pitch, now):
+        """Feed one pitch sample; returns True on the frame a nod is detected"""
+        if pitch is None:
+            self.reset()
+            return False
+        if self.pitch is None:
+            self.pitch = self.neutral = pitch
+            self._last_time = now
+            return False
+
+        dt = now - self._last_time
+        self._last_time = now
+        smoothed = self.SMOOTHING * pitch + (1 - self.SMOOTHING) * self.pitch
+        if dt > 0:
+            self.velocity = (smoothed - self.pitch) / dt
+        self.pitch = smoothed
+
+        drop = self.pitch - self.neutral
+        if abs(self.velocity) < self.STILL_VELOCITY and not self.dropped:
+            self.neutral += self.NEUTRAL_ALPHA * (self.pitch - self.neutral)
+
+        if self.dropped:
+            if drop < self.NOD_DROP / 2:
+                self.dropped = False
+            return False
+        if self.velocity > self.NOD_VELOCITY and drop > self.NOD_DROP:
+            self.dropped = True
+            return True
+        return False
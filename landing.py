@@ -1,7 +1,4 @@
 import streamlit as st
-import subprocess
-import sys
-import os
 
 # ---------- Page Configuration ----------
 st.set_page_config(
@@ -468,20 +465,7 @@ col1, col2, col3 = st.columns([1, 1, 1])
 with col2:
     st.markdown('<div class="spacing-md"></div>', unsafe_allow_html=True)
     if st.button("🔐 START NOW", key="start_button",use_container_width=True):
-        # Check if login.py exists
-        if os.path.exists("login.py"):
-            st.success("✅ Launching login page...")
-            # Launch login page in a new process
-            try:
-                subprocess.Popen([sys.executable, "-m", "streamlit", "run", "login.py"])
-                st.balloons()
-                st.info("🚀 Login page is opening in a new window. You can close this tab if needed.")
-            except Exception as e:
-                st.error(f"❌ Error launching login page: {e}")
-                st.info("💡 Please run manually: `streamlit run login.py`")
-        else:
-            st.error("❌ login.py not found in the current directory")
-            st.info("📝 Please ensure login.py exists in the same folder as this landing page")
+        st.switch_page("login.py")
 
 st.markdown('<div class="spacing-lg"></div>', unsafe_allow_html=True)
 
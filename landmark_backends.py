@@ -0,0 +1,186 @@
+"""Interchangeable face landmark backends.
+
+Every backend takes an RGB frame and returns one face's landmarks (an object
+whose `.landmark[i]` has normalised `.x` / `.y`, like MediaPipe's) or None.
+The detection code only indexes landmarks, so any model using the 468-point
+face-mesh topology plugs in. Pick one per deployment with the
+FATIGUE_LANDMARK_BACKEND environment variable or a `--backend` flag:
+
+    mediapipe       refined MediaPipe face mesh (478 points, iris included)
+    mediapipe-lite  MediaPipe without iris refinement (468 points, faster)
+    onnx            face-mesh ONNX model on onnxruntime or OpenCV DNN (CPU)
+
+`python benchmark_backends.py` compares them on the demo video.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_BACKEND = os.environ.get("FATIGUE_LANDMARK_BACKEND", "mediapipe")
+ONNX_MODEL_PATH = os.environ.get("FATIGUE_ONNX_MODEL", "models/face_landmark.onnx")
+
+Point = namedtuple("Point", "x y z")
+
+
+class Landmarks:
+    """Landmark container with MediaPipe's `.landmark[i].x` access pattern"""
+
+    __slots__ = ("landmark",)
+
+    def __init__(self, points):
+        self.landmark = [Point(*p) for p in points]
+
+
+# ---------- MediaPipe ----------
+class MediaPipeBackend:
+    name = "mediapipe"
+    refined = True
+
+    def __init__(self):
+        from fatigue_core import create_face_mesh
+
+        self.face_mesh = create_face_mesh(refine_landmarks=self.refined)
+
+    def detect(self, frame_rgb):
+        results = self.face_mesh.process(frame_rgb)
+        return results.multi_face_landmarks[0] if results.multi_face_landmarks else None
+
+    def warm_up(self, size=(480, 640)):
+        from fatigue_core import warm_up_face_mesh
+
+        warm_up_face_mesh(self.face_mesh, size)
+
+    def close(self):
+        self.face_mesh.close()
+
+
+class MediaPipeLiteBackend(MediaPipeBackend):
+    """No iris refinement: cheaper, but gaze detection is unavailable"""
+    name = "mediapipe-lite"
+    refined = False
+
+
+# ---------- ONNX / OpenCV DNN ----------
+class OnnxFaceMeshBackend:
+    """MediaPipe face-landmark topology exported to ONNX, run on the CPU.
+
+    The model sees a square crop around the face: the previous frame's
+    landmarks when tracking, otherwise OpenCV's bundled Haar face detector.
+    onnxruntime is used when installed, else OpenCV's DNN module.
+    """
+    name = "onnx"
+    INPUT_SIZE = 192
+    CROP_SCALE = 1.5          # Crop side relative to the face box
+    MIN_FACE_SCORE = 0.5
+
+    def __init__(self, model_path=ONNX_MODEL_PATH):
+        import cv2
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX landmark model not found at '{model_path}' (set FATIGUE_ONNX_MODEL)")
+        self.detector = cv2.CascadeClassifier(
+            os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+        self._box = None
+        try:
+            import onnxruntime as ort
+
+            self.session = ort.InferenceSession(model_path, providers=["CPUExecutionProvider"])
+            inp = self.session.get_inputs()[0]
+            self.input_name = inp.name
+            self.nchw = inp.shape[1] == 3
+            self.net = None
+        except ImportError:
+            self.session = None
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            self.nchw = True
+        self.refined = False
+
+    def _face_box(self, frame_rgb):
+        import cv2
+
+        if self._box is not None:
+            return self._box
+        gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+        faces = self.detector.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5,
+                                               minSize=(60, 60))
+        if len(faces) == 0:
+            return None
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return x + w / 2.0, y + h / 2.0, float(max(w, h))
+
+    def _run(self, crop):
+        blob = crop.astype(np.float32) / 255.0
+        if self.nchw:
+            blob = blob.transpose(2, 0, 1)
+        blob = blob[None]
+        if self.session is not None:
+            outputs = self.session.run(None, {self.input_name: blob})
+        else:
+            self.net.setInput(blob)
+            outputs = self.net.forward(self.net.getUnconnectedOutLayersNames())
+        coords = score = None
+        for out in outputs:
+            out = np.asarray(out).reshape(-1)
+            if out.size in (468 * 3, 478 * 3):
+                coords = out.reshape(-1, 3)
+            elif out.size == 1:
+                score = float(out[0])
+        if score is not None and not 0.0 <= score <= 1.0:
+            score = 1.0 / (1.0 + np.exp(-score))
+        return coords, score
+
+    def detect(self, frame_rgb):
+        import cv2
+
+        fh, fw = frame_rgb.shape[:2]
+        box = self._face_box(frame_rgb)
+        if box is None:
+            return None
+        cx, cy, size = box
+        side = size * self.CROP_SCALE
+        x0, y0 = cx - side / 2.0, cy - side / 2.0
+        scale = self.INPUT_SIZE / side
+        # Affine crop handles boxes that run off the frame edge (padded with black)
+        M = np.array([[scale, 0, -x0 * scale], [0, scale, -y0 * scale]], dtype=np.float32)
+        crop = cv2.warpAffine(frame_rgb, M, (self.INPUT_SIZE, self.INPUT_SIZE))
+
+        coords, score = self._run(crop)
+        if coords is None or (score is not None and score < self.MIN_FACE_SCORE):
+            self._box = None
+            return None
+        self.refined = len(coords) >= 478
+
+        pts = np.empty_like(coords)
+        pts[:, 0] = (coords[:, 0] / scale + x0) / fw
+        pts[:, 1] = (coords[:, 1] / scale + y0) / fh
+        pts[:, 2] = coords[:, 2] / scale / fw
+
+        # Track: next crop comes from these landmarks instead of the detector
+        xs, ys = pts[:, 0] * fw, pts[:, 1] * fh
+        self._box = ((xs.min() + xs.max()) / 2.0, (ys.min() + ys.max()) / 2.0,
+                     float(max(xs.max() - xs.min(), ys.max() - ys.min())))
+        return Landmarks(pts)
+
+    def warm_up(self, size=(480, 640)):
+        self._run(np.zeros((self.INPUT_SIZE, self.INPUT_SIZE, 3), dtype=np.uint8))
+
+    def close(self):
+        self.session = self.net = None
+
+
+# ---------- Registry ----------
+BACKENDS = {
+    "mediapipe": MediaPipeBackend,
+    "mediapipe-lite": MediaPipeLiteBackend,
+    "onnx": OnnxFaceMeshBackend,
+}
+
+
+def create_backend(name=None):
+    """Instantiate a backend by name (default: FATIGUE_LANDMARK_BACKEND or mediapipe)"""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown landmark backend '{name}' (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
@@ -0,0 +1,234 @@
+"""Compaction of the alert log into compressed columnar segments.
+
+    python log_archive.py compact              # rotate fatigue_log.txt and compact closed segments
+    python log_archive.py query --since 2025-10-16 [--until 2025-10-17]
+    python log_archive.py stats
+
+`rotate()` closes the live log by renaming it into `log_segments/`; the
+dashboards open the log for every alert, so their next write starts a fresh
+file. `compact()` converts each closed text segment into one Parquet file
+(zstd) in which weather, time period and alert type are dictionary-encoded
+categoricals, then deletes the text. Without a working pyarrow (the pinned
+17.x runs on numpy 1.26; newer releases need numpy 2) it writes the same
+columns as a compressed .npz with integer codes plus category tables.
+
+`load_alerts()` reads compacted segments, closed text segments not yet
+compacted and the live log as one DataFrame. Segment names carry their
+rotation time, so a time-bounded query opens only the segments that can
+overlap it.
+"""
+import argparse
+import glob
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from alert_log import LOG_FILE, read_log
+
+# ---------- Configuration ----------
+SEGMENT_DIR = "log_segments"
+GRACE_SECS = 5.0             # A dashboard may still be finishing a write into a just-rotated file
+SEGMENT_PREFIX = "fatigue_log-"
+STAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+CATEGORICAL = ("type", "weather", "time_period", "clip")
+NUMERIC = {"ts": np.float64, "alert_no": np.int32, "ear": np.float32,
+           "mar": np.float32, "speed": np.float32}
+COLUMNS = ("ts", "alert_no", "type", "ear", "mar", "speed", "weather", "time_period", "clip")
+
+
+def _have_pyarrow():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# ---------- Building Frames ----------
+def events_to_frame(events):
+    """DataFrame of parsed events with compact dtypes (alert_no -1 when unnumbered)"""
+    import pandas as pd
+
+    events = list(events)
+    data = {}
+    for col in COLUMNS:
+        values = [e[col] for e in events]
+        if col in CATEGORICAL:
+            data[col] = pd.Categorical(values)
+        elif col == "alert_no":
+            data[col] = np.array([-1 if v is None else v for v in values], dtype=np.int32)
+        else:
+            data[col] = np.array([np.nan if v is None else v for v in values], dtype=NUMERIC[col])
+    return pd.DataFrame(data, columns=list(COLUMNS))
+
+
+def _write_npz(frame, path):
+    arrays = {}
+    for col in COLUMNS:
+        if col in CATEGORICAL:
+            arrays[col + "__codes"] = frame[col].cat.codes.to_numpy()
+            arrays[col + "__categories"] = np.array(frame[col].cat.categories, dtype=str)
+        else:
+            arrays[col] = frame[col].to_numpy()
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def _read_npz(path):
+    import pandas as pd
+
+    with np.load(path) as z:
+        data = {}
+        for col in COLUMNS:
+            if col in CATEGORICAL:
+                data[col] = pd.Categorical.from_codes(z[col + "__codes"], z[col + "__categories"])
+            else:
+                data[col] = z[col]
+    return pd.DataFrame(data, columns=list(COLUMNS))
+
+
+def _read_segment(path, start=None, end=None):
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        filters = [f for f in (("ts", ">=", start), ("ts", "<", end)) if f[2] is not None]
+        frame = pd.read_parquet(path, filters=filters or None)
+    elif path.endswith(".npz"):
+        frame = _read_npz(path)
+    else:
+        frame = events_to_frame(read_log(path))
+    return _window(frame, start, end)
+
+
+def _window(frame, start, end):
+    if start is not None:
+        frame = frame[frame["ts"] >= start]
+    if end is not None:
+        frame = frame[frame["ts"] < end]
+    return frame
+
+
+# ---------- Rotation & Compaction ----------
+def _segment_time(path):
+    """Rotation time encoded in a segment's name (an upper bound on its timestamps)"""
+    stem = os.path.basename(path)[len(SEGMENT_PREFIX):].split(".")[0]
+    return time.mktime(time.strptime(stem, STAMP_FORMAT))
+
+
+def segments(segment_dir=SEGMENT_DIR):
+    """Closed segments oldest first; a compacted file wins over a leftover text copy"""
+    found = {}
+    for path in glob.glob(os.path.join(segment_dir, SEGMENT_PREFIX + "*")):
+        stem, ext = os.path.splitext(path)
+        if ext in (".parquet", ".npz") or stem not in found:
+            found[stem] = path
+    return [found[stem] for stem in sorted(found)]
+
+
+def rotate(log_path=LOG_FILE, segment_dir=SEGMENT_DIR):
+    """Close the live log as a text segment; returns its path or None if the log is empty"""
+    if not os.path.exists(log_path) or os.path.getsize(log_path) == 0:
+        return None
+    os.makedirs(segment_dir, exist_ok=True)
+    stamp = datetime.now().strftime(STAMP_FORMAT)
+    path = os.path.join(segment_dir, f"{SEGMENT_PREFIX}{stamp}.txt")
+    while os.path.exists(path):
+        time.sleep(1)
+        stamp = datetime.now().strftime(STAMP_FORMAT)
+        path = os.path.join(segment_dir, f"{SEGMENT_PREFIX}{stamp}.txt")
+    os.replace(log_path, path)
+    return path
+
+
+def compact(segment_dir=SEGMENT_DIR, fmt=None, grace=GRACE_SECS):
+    """Compact closed text segments; returns [(text_path, text_bytes, compacted_path), ...]"""
+    fmt = fmt or ("parquet" if _have_pyarrow() else "npz")
+    done = []
+    for path in glob.glob(os.path.join(segment_dir, SEGMENT_PREFIX + "*.txt")):
+        stem = os.path.splitext(path)[0]
+        if any(os.path.exists(stem + ext) for ext in (".parquet", ".npz")):
+            os.remove(path)          # Compacted before a crash; the text is a leftover
+            continue
+        if time.time() - os.path.getmtime(path) < grace:
+            continue
+        frame = events_to_frame(read_log(path))
+        out = f"{stem}.{fmt}"
+        tmp = out + ".tmp"
+        if fmt == "parquet":
+            frame.to_parquet(tmp, engine="pyarrow", compression="zstd", index=False)
+        else:
+            _write_npz(frame, tmp)
+        os.replace(tmp, out)
+        size = os.path.getsize(path)
+        os.remove(path)
+        done.append((path, size, out))
+    return done
+
+
+# ---------- Reading ----------
+def load_alerts(start=None, end=None, log_path=LOG_FILE, segment_dir=SEGMENT_DIR):
+    """All alerts with start <= ts < end (Unix seconds) across segments and the live log"""
+    import pandas as pd
+
+    frames = []
+    previous = None
+    for path in segments(segment_dir):
+        rotated = _segment_time(path)
+        # Segment holds (previous rotation, this rotation]; skip it if that misses the window
+        if (start is None or rotated >= start) and (end is None or previous is None
+                                                   or previous < end):
+            frames.append(_read_segment(path, start, end))
+        previous = rotated
+    if os.path.exists(log_path):
+        frames.append(_read_segment(log_path, start, end))
+    if not frames:
+        return events_to_frame([])
+
+    frame = pd.concat(frames, ignore_index=True)
+    # Segments have different category sets; concat falls back to object columns
+    for col in CATEGORICAL:
+        frame[col] = frame[col].astype("category")
+    return frame.sort_values("ts", kind="stable").reset_index(drop=True)
+
+
+def _parse_day(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact and query the alert log")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("compact", help="rotate the live log and compact closed segments")
+    p.add_argument("--format", choices=["parquet", "npz"], default=None)
+    p.add_argument("--no-rotate", action="store_true", help="only compact already-closed segments")
+    p = sub.add_parser("query", help="summarize alerts in a time window")
+    p.add_argument("--since", help="ISO date/time")
+    p.add_argument("--until", help="ISO date/time")
+    sub.add_parser("stats", help="storage used by the live log and segments")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        if not args.no_rotate and rotate():
+            time.sleep(GRACE_SECS)
+        for src, size, out in compact(fmt=args.format):
+            print(f"{src} ({size} bytes) -> {out} ({os.path.getsize(out)} bytes)")
+    elif args.command == "query":
+        started = time.perf_counter()
+        frame = load_alerts(_parse_day(args.since), _parse_day(args.until))
+        secs = time.perf_counter() - started
+        print(f"{len(frame)} alerts in {secs * 1000:.1f} ms")
+        if len(frame):
+            days = frame["ts"].map(lambda t: datetime.fromtimestamp(t).date().isoformat())
+            print(frame.groupby([days, "type", "weather", "time_period"], observed=True,
+                                dropna=False).size().to_string())
+    else:
+        paths = ([LOG_FILE] if os.path.exists(LOG_FILE) else []) + segments()
+        for path in paths:
+            print(f"{os.path.getsize(path):10d}  {path}")
+
+
+if __name__ == "__main__":
+    main()
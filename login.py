@@ -1,34 +1,19 @@
 import streamlit as st
 import hashlib
-import json
-import os
 from datetime import datetime
 import re
-import subprocess
-import sys
 
-# ---------- Configuration ----------
-USER_DATA_FILE = "users.json"
+from user_store import UserStore, DuplicateUserError
 
 # ---------- Helper Functions ----------
 def hash_password(password):
     """Hash password using SHA-256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
-def load_users():
-    """Load users from JSON file"""
-    if os.path.exists(USER_DATA_FILE):
-        try:
-            with open(USER_DATA_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_users(users):
-    """Save users to JSON file"""
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
+@st.cache_resource(show_spinner=False)
+def get_user_store():
+    """One store per server process, shared by every session"""
+    return UserStore()
 
 def validate_email(email):
     """Validate email format"""
@@ -47,51 +32,58 @@ def validate_password(password):
 
 def create_user(username, email, password, full_name):
     """Create a new user"""
-    users = load_users()
+    store = get_user_store()
     
-    if username in users:
+    if store.get(username) is not None:
         return False, "Username already exists"
     
     # Check if email already exists
-    for user_data in users.values():
-        if user_data.get('email') == email:
+    if store.email_exists(email):
+        return False, "Email already registered"
+    
+    try:
+        store.add(username, {
+            'email': email,
+            'password': hash_password(password),
+            'full_name': full_name,
+            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'last_login': None
+        })
+    except DuplicateUserError as e:
+        # Lost a race with another session signing up at the same moment
+        if e.field == "email":
             return False, "Email already registered"
-    
-    users[username] = {
-        'email': email,
-        'password': hash_password(password),
-        'full_name': full_name,
-        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'last_login': None
-    }
-    
-    save_users(users)
+        return False, "Username already exists"
     return True, "Account created successfully!"
 
 def authenticate_user(username, password):
     """Authenticate user credentials"""
-    users = load_users()
+    store = get_user_store()
+    user = store.get(username)
     
-    if username not in users:
+    if user is None:
         return False, "Username not found"
     
-    if users[username]['password'] != hash_password(password):
+    if user['password'] != hash_password(password):
         return False, "Incorrect password"
     
     # Update last login
-    users[username]['last_login'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    save_users(users)
+    user['last_login'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    store.touch_login(username, user['last_login'])
     
-    return True, users[username]
+    return True, user
 
 def launch_dashboard():
-    """Launch the driver fatigue dashboard"""
-    if os.path.exists("driver_fatigue_dashboard.py"):
-        # Launch the dashboard in a new process
-        subprocess.Popen([sys.executable, "-m", "streamlit", "run", "driver_fatigue_dashboard.py"])
-        return True
-    else:
-        return False
+    """Switch to the driver fatigue dashboard; it reads the driver from session state"""
+    st.switch_page("driver_fatigue_dashboard.py")
+
+# ---------- Page Configuration ----------
+st.set_page_config(
+    page_title="Driver Monitoring - Login",
+    page_icon="🚗",
+    layout="centered",
+    initial_sidebar_state="collapsed"
+)
 
 # ---------- Initialize Session State ----------
 if 'logged_in' not in st.session_state:
@@ -264,14 +256,6 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# ---------- Page Configuration ----------
-st.set_page_config(
-    page_title="Driver Monitoring - Login",
-    page_icon="🚗",
-    layout="centered",
-    initial_sidebar_state="collapsed"
-)
-
 # ---------- Main Application ----------
 def login_page():
     """Display login page"""
@@ -311,17 +295,7 @@ def login_page():
                             st.session_state.logged_in = True
                             st.session_state.username = username
                             st.session_state.user_data = result
-                            st.success("✅ Login successful! Launching dashboard...")
-                            
-                            # Try to launch the dashboard
-                            if launch_dashboard():
-                                st.info("🚗 Driver Fatigue Dashboard is opening in a new window...")
-                                st.balloons()
-                            else:
-                                st.warning("⚠️ driver_fatigue_dashboard.py not found in current directory. Please ensure the file exists.")
-                            
-                            # Keep the success message visible
-                            st.stop()
+                            launch_dashboard()
                         else:
                             st.error(f"❌ {result}")
         
@@ -382,18 +356,15 @@ if st.session_state.logged_in:
             <div style='text-align: center; color: #00ff88;'>
                 <h1 style='font-size: clamp(2rem, 6vw, 3rem);'>✅ Welcome, {st.session_state.user_data['full_name']}!</h1>
                 <p style='font-size: clamp(1rem, 3vw, 1.5rem); color: #88ffaa; margin-top: 1rem;'>
-                    Dashboard is launching...
+                    You are signed in.
                 </p>
             </div>
         """, unsafe_allow_html=True)
         
         st.markdown("<br>", unsafe_allow_html=True)
         
-        if st.button("🔄 Relaunch Dashboard", use_container_width=True):
-            if launch_dashboard():
-                st.success("🚗 Dashboard launched successfully!")
-            else:
-                st.error("❌ Could not find driver_fatigue_dashboard.py")
+        if st.button("🚗 Open Dashboard", use_container_width=True):
+            launch_dashboard()
         
         if st.button("🚪 Logout", use_container_width=True):
             st.session_state.logged_in = False
@@ -0,0 +1,251 @@
+"""Prometheus-style metrics for detector health and throughput.
+
+A tiny dependency-free implementation of counters, gauges and histograms
+rendered in the Prometheus text exposition format, plus the detector's own
+metric set. `start_metrics_server()` serves them on http://HOST:PORT/metrics
+from a daemon thread; recording a sample is a dict lookup and a short lock,
+so it can stay on in production.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ---------- Configuration ----------
+DEFAULT_METRICS_PORT = int(os.environ.get("FATIGUE_METRICS_PORT", 9108))
+DEFAULT_METRICS_HOST = os.environ.get("FATIGUE_METRICS_HOST", "127.0.0.1")
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.02, 0.035, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0)
+
+
+# ---------- Metric Types ----------
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=(), registry=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels() if not self.labelnames else None
+
+    def _label_str(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_str(key)} {child.value}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=STAGE_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help_text, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _render_child(self, key, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{self._label_str(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_str(key)} {child.sum}")
+        lines.append(f"{self.name}_count{self._label_str(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ---------- Detector Metrics ----------
+FRAMES = Counter("fatigue_frames_total", "Frames processed by the detector")
+FACE_FRAMES = Counter("fatigue_face_frames_total", "Frames in which a face was found")
+FPS = Gauge("fatigue_fps", "Processed frames per second (smoothed)")
+FACE_RATIO = Gauge("fatigue_face_detection_ratio", "Share of recent frames with a face (smoothed)")
+STAGE_SECONDS = Histogram("fatigue_stage_seconds", "Per-frame latency of each pipeline stage",
+                          ["stage"])
+ALERTS = Counter("fatigue_alerts_total", "Alerts raised",
+                 ["type", "speed_band", "weather", "time_period"])
+UP = Gauge("fatigue_detector_running", "1 while monitoring is active")
+CAMERA_UP = Gauge("fatigue_camera_connected", "1 while the capture source is delivering frames")
+CAPTURE_FPS = Gauge("fatigue_capture_fps", "Frames per second actually delivered by the camera")
+CAMERA_RECONNECTS = Counter("fatigue_camera_reconnects_total", "Successful camera reconnects")
+LOW_LIGHT = Gauge("fatigue_low_light_active", "1 while low-light enhancement is applied")
+
+
+class DetectorMetrics:
+    """Convenience wrapper used by the detection loops"""
+
+    SMOOTHING = 0.05   # EMA weight of the newest frame
+
+    def __init__(self):
+        self._last_frame = None
+        self._fps = 0.0
+        self._face_ratio = 1.0
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(stage=name).observe(time.perf_counter() - start)
+
+    def observe_stage(self, name, seconds):
+        STAGE_SECONDS.labels(stage=name).observe(seconds)
+
+    def frame(self, face_found, now=None):
+        now = time.perf_counter() if now is None else now
+        FRAMES.inc()
+        if face_found:
+            FACE_FRAMES.inc()
+        a = self.SMOOTHING
+        if self._last_frame is not None and now > self._last_frame:
+            self._fps = (1 - a) * self._fps + a / (now - self._last_frame)
+            FPS.set(round(self._fps, 2))
+        self._last_frame = now
+        self._face_ratio = (1 - a) * self._face_ratio + a * (1.0 if face_found else 0.0)
+        FACE_RATIO.set(round(self._face_ratio, 4))
+
+    def alert(self, alert_type, speed, weather, time_period):
+        from fatigue_core import speed_band
+
+        ALERTS.labels(type=alert_type, speed_band=speed_band(speed),
+                      weather=weather, time_period=time_period).inc()
+
+    def camera(self, connected):
+        CAMERA_UP.set(1 if connected else 0)
+
+    def capture_fps(self, fps):
+        CAPTURE_FPS.set(round(fps, 2))
+
+    def camera_reconnect(self):
+        CAMERA_RECONNECTS.inc()
+
+    def low_light(self, active):
+        LOW_LIGHT.set(1 if active else 0)
+
+    def running(self, is_running):
+        UP.set(1 if is_running else 0)
+        if not is_running:
+            self._last_frame = None
+
+
+# ---------- HTTP Endpoint ----------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=DEFAULT_METRICS_PORT, host=DEFAULT_METRICS_HOST):
+    """Serve /metrics on a daemon thread; returns the server or None if the port is taken"""
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,209 @@
+"""Shared-memory ring buffer for live EAR / MAR metrics.
+
+The detector is the single writer and never waits on readers. Viewers (the
+Tk chart, the Streamlit chart or the CLI below) attach to the same segment by
+name and read the most recent samples straight out of shared memory.
+
+Each writer owns its own segment: creating over a segment whose writer is
+still running raises `BufferInUseError` (a second app then uses
+`unique_name()`), and each Streamlit session gets a uniquely named buffer,
+shown on its dashboard and closed when the session ends.
+
+Layout of the segment (all little-endian 8-byte slots):
+
+    [capacity, count, writer pid, pad...]   header, HEADER_SLOTS int64
+    timestamps[capacity]        float64
+    ear[capacity]               float64
+    mar[capacity]               float64
+
+`count` is the total number of samples ever written. A sample lives at
+index `count % capacity`; readers use `count` before and after their copy to
+drop any slot the writer may have overwritten in the meantime, so no lock is
+needed on either side.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+
+# ---------- Configuration ----------
+DEFAULT_NAME = os.environ.get("FATIGUE_METRICS_SHM", "fatigue_metrics")
+DEFAULT_CAPACITY = 900  # 30 s at 30 fps
+HEADER_SLOTS = 8
+
+
+def _segment_size(capacity):
+    return (HEADER_SLOTS + 3 * capacity) * 8
+
+
+def unique_name(prefix=DEFAULT_NAME):
+    """Segment name no other writer in this or another process uses"""
+    global _name_counter
+    _name_counter += 1
+    return f"{prefix}_{os.getpid()}_{_name_counter}"
+
+
+_name_counter = 0
+
+
+def _pid_alive(pid):
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class BufferInUseError(FileExistsError):
+    """Another running writer owns a segment with this name"""
+
+
+# ---------- Ring Buffer ----------
+class MetricsRingBuffer:
+    """Single-writer / multi-reader time series of (timestamp, EAR, MAR)"""
+
+    def __init__(self, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY, create=True):
+        self.name = name
+        self.owner = create
+
+        if create:
+            try:
+                self._shm = shared_memory.SharedMemory(
+                    name=name, create=True, size=_segment_size(capacity))
+            except FileExistsError:
+                existing = shared_memory.SharedMemory(name=name)
+                pid = int(np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=existing.buf)[2]) \
+                    if existing.size >= HEADER_SLOTS * 8 else 0
+                if _pid_alive(pid):
+                    if pid != os.getpid():
+                        _untrack(existing)
+                    existing.close()
+                    raise BufferInUseError(f"metrics buffer {name!r} is in use by process {pid}")
+                # Left over from a detector that did not shut down cleanly
+                existing.close()
+                existing.unlink()
+                self._shm = shared_memory.SharedMemory(
+                    name=name, create=True, size=_segment_size(capacity))
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            _untrack(self._shm)
+
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=self._shm.buf)
+        if create:
+            header[:] = 0
+            header[0] = capacity
+            header[2] = os.getpid()
+        self.capacity = int(header[0])
+        self._header = header
+
+        data = np.ndarray((3, self.capacity), dtype=np.float64,
+                          buffer=self._shm.buf, offset=HEADER_SLOTS * 8)
+        self._t, self._ear, self._mar = data[0], data[1], data[2]
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        """Open an existing buffer as a read-only viewer"""
+        return cls(name=name, create=False)
+
+    # ---------- Writer ----------
+    def push(self, timestamp, ear=None, mar=None):
+        """Append one sample; missing values are stored as NaN"""
+        count = int(self._header[1])
+        i = count % self.capacity
+        self._t[i] = timestamp
+        self._ear[i] = np.nan if ear is None else ear
+        self._mar[i] = np.nan if mar is None else mar
+        # Publish only after the slot is fully written
+        self._header[1] = count + 1
+
+    # ---------- Readers ----------
+    @property
+    def count(self):
+        return int(self._header[1])
+
+    def latest(self):
+        """Return the newest (timestamp, ear, mar) or None if empty"""
+        t, ear, mar = self.snapshot(1)
+        if len(t) == 0:
+            return None
+        return float(t[0]), float(ear[0]), float(mar[0])
+
+    def snapshot(self, last=None):
+        """Return (timestamps, ear, mar) arrays for the newest `last` samples, oldest first"""
+        before = self.count
+        n = min(before, self.capacity) if last is None else min(last, before, self.capacity)
+        start = before - n
+
+        idx = np.arange(start, before) % self.capacity
+        t = self._t[idx]
+        ear = self._ear[idx]
+        mar = self._mar[idx]
+
+        # Anything the writer lapped while we were copying is discarded
+        after = self.count
+        overwritten = max(0, after - self.capacity + 1 - start)
+        if overwritten:
+            t, ear, mar = t[overwritten:], ear[overwritten:], mar[overwritten:]
+        return t, ear, mar
+
+    # ---------- Lifecycle ----------
+    def close(self):
+        """Detach; the owning writer also removes the segment"""
+        self._header = self._t = self._ear = self._mar = None
+        try:
+            self._shm.close()
+            if self.owner:
+                self._shm.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+def _untrack(shm):
+    """Stop the resource tracker from unlinking a segment this process only reads"""
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+
+
+# ---------- CLI Viewer ----------
+def _sparkline(values, width=40):
+    bars = " ▁▂▃▄▅▆▇█"
+    values = values[~np.isnan(values)][-width:]
+    if len(values) == 0:
+        return ""
+    lo, hi = values.min(), values.max()
+    span = (hi - lo) or 1.0
+    return "".join(bars[int((v - lo) / span * (len(bars) - 1))] for v in values)
+
+
+def watch(name=DEFAULT_NAME, interval=0.5):
+    """Print a live text view of a running detector's metrics"""
+    buf = MetricsRingBuffer.attach(name)
+    try:
+        while True:
+            t, ear, mar = buf.snapshot(120)
+            if len(t):
+                last_ear = "--" if np.isnan(ear[-1]) else f"{ear[-1]:.3f}"
+                last_mar = "--" if np.isnan(mar[-1]) else f"{mar[-1]:.3f}"
+                print(f"\rEAR {last_ear} {_sparkline(ear):<40} | "
+                      f"MAR {last_mar} {_sparkline(mar):<40}", end="", flush=True)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        buf.close()
+
+
+if __name__ == "__main__":
+    try:
+        watch(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_NAME)
+    except FileNotFoundError:
+        print("No detector is publishing metrics (is monitoring running?)")
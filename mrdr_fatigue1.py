@@ -1,74 +1,52 @@
-import cv2
+from startup import StartupTimer, ModelLoader, rebuild_on_config_change
+
 import numpy as np
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-from scipy.spatial import distance as dist
 import threading
 import time
 import datetime
-import winsound
 import os
 from collections import deque
 
-try:
-    import mediapipe as mp
-except ImportError:
-    mp = None
-
-# ---------- Landmarks ----------
-L_EYE = [33, 160, 158, 133, 153, 144]
-R_EYE = [263, 387, 385, 362, 380, 373]
-UPPER_LIP = [13, 14]
-LOWER_LIP = [17, 18]
-LEFT_MOUTH = 78
-RIGHT_MOUTH = 308
+from fatigue_core import (L_EYE, R_EYE, UPPER_LIP, LOWER_LIP, LEFT_MOUTH, RIGHT_MOUTH,
+                          landmark_points)
+from detector import FatigueDetector
+from metrics_buffer import MetricsRingBuffer, BufferInUseError, unique_name
+from calibration import CalibrationSession, OnlineBaseline
+from metrics import DetectorMetrics, start_metrics_server
+from clip_recorder import AlertClipRecorder
+from alert_log import LOG_FILE
+from context import create_provider, UIContextProvider
+from config import current_config
+from telemetry import TelemetryRecorder
+from session_summary import SessionSummary, export_report, new_summary_path, format_report
+from camera import CaptureManager, CaptureConfig, CAMERA_LOST, fit_frame
+from profile_store import (load_profile, save_profile, record_calibration,
+                           merge_ear_stats, driver_from_argv, RunningStats)
+
+# OpenCV and Pillow are bound by _load_heavy_modules() on the loader thread
+cv2 = None
+Image = ImageTk = None
 
 # ============ Helper Functions ============
-def eye_aspect_ratio(eye):
-    if len(eye) < 6:
-        return 0.0
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
-    if C == 0:
-        return 0.0
-    return (A + B) / (2.0 * C)
-
-def mouth_aspect_ratio(upper_pts, lower_pts, left_pt, right_pt):
-    vertical = np.mean([dist.euclidean(u, l) for u, l in zip(upper_pts, lower_pts)])
-    horizontal = dist.euclidean(left_pt, right_pt)
-    if horizontal == 0:
-        return 0.0
-    return vertical / horizontal
-
-def get_fatigue_threshold(speed, weather, time_period):
-    """Returns threshold in seconds for eye closure"""
-    base_thresh = 2.0  # Reduced from 10 for faster detection
-    
-    if speed < 15:
-        return float('inf')
-    elif speed < 40:
-        base_thresh = 3.0
-    elif speed >= 80:
-        base_thresh = 1.5  # Very strict at high speeds
-    
-    if time_period.lower() == "night":
-        base_thresh *= 0.7
-    
-    if weather.lower() in ["fog", "rain", "storm"]:
-        base_thresh *= 0.8
-    
-    return base_thresh
+def _load_heavy_modules():
+    """Import OpenCV and Pillow off the UI thread"""
+    global cv2, Image, ImageTk
+    import cv2
+    from PIL import Image, ImageTk
+
+def beep():
+    """Audible alert; winsound only exists on Windows"""
+    try:
+        import winsound
+        winsound.Beep(1000, 500)
+    except:
+        pass
 
 # ============ Main Class ============
 class DriverFatigueDashboard:
-    def __init__(self, root):
-        if mp is None:
-            messagebox.showerror("Missing dependency", "mediapipe required")
-            root.destroy()
-            return
-
+    def __init__(self, root, timer=None, driver=None):
         self.root = root
         self.root.title("🚗 Advanced Driver Fatigue Detection System")
         self.root.geometry("1400x800")
@@ -76,38 +54,96 @@ class DriverFatigueDashboard:
 
         self.demo_mode = tk.BooleanVar(value=False)
         self.cap = None
+        self.telemetry = None
+        self.summary = None
         self.running = False
-        self.mp_face = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face.FaceMesh(
-            static_image_mode=False,
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
 
-        # Detection variables - IMPROVED
-        self.eyes_closed_start = None
-        self.yawn_start = None
+        # Model loads in the background while the window is built
+        self.timer = timer or StartupTimer()
+        self.face_mesh = None
+        self.loader = ModelLoader(
+            self.timer, preload=_load_heavy_modules,
+            on_ready=lambda fm: self.root.after(0, self._on_model_ready, fm),
+            on_error=lambda e: self.root.after(0, self._on_model_error, e)
+        ).start()
+        # A face mesh config change builds a new backend; the video loop swaps it in
+        self._next_face_mesh = None
+        self._backend_lock = threading.Lock()
+        self._stop_rebuilds = rebuild_on_config_change(
+            self._on_backend_rebuilt, on_error=lambda e: print(f"Backend rebuild failed: {e}"))
+
+        # Detection settings; the state machine itself lives in self.detector
         self.base_open_ear = None
-        self.EAR_THRESH = 0.25  # Increased default threshold
-        self.MAR_THRESH = 0.65
+        self.calibration = None
+        self.config = current_config()
         self.current_status = "Ready"
-        self.ear_history = deque(maxlen=3)  # Reduced smoothing for faster response
-        self.consecutive_drowsy = 0
-        self.total_alerts = 0
         self.session_start = None
+
+        # Per-driver profile: saved baseline and thresholds skip re-calibration
+        self.profile = load_profile(driver) if driver else None
+        self.session_ear_stats = RunningStats()
+        ear_thresh = mar_thresh = None
+        if self.profile:
+            self.base_open_ear = self.profile['base_open_ear']
+            ear_thresh = self.profile['ear_thresh'] or None
+            mar_thresh = self.profile['mar_thresh'] or None
+
+        # Continuous recalibration from attentive frames
+        self.auto_adapt = tk.BooleanVar(value=True)
+        self.online_baseline = OnlineBaseline(self.base_open_ear)
         
         # Real-time metrics
         self.ear_values = deque(maxlen=100)
         self.mar_values = deque(maxlen=100)
         self.timestamps = deque(maxlen=100)
+        try:
+            self.metrics_buffer = MetricsRingBuffer()
+        except BufferInUseError:
+            # Another dashboard is publishing under the default name
+            self.metrics_buffer = MetricsRingBuffer(unique_name())
+            print(f"Metrics buffer: python metrics_buffer.py {self.metrics_buffer.name}")
+        self.metrics = DetectorMetrics()
+        start_metrics_server()
+        self.clip_recorder = AlertClipRecorder()
+        self.low_light = tk.BooleanVar(value=True)
 
         self.speed_var = tk.DoubleVar(value=60)
         self.weather_var = tk.StringVar(value="Clear")
         self.time_var = tk.StringVar(value="Day")
+        # The detection thread only reads the provider's snapshot, never the Tk variables
+        self.context = create_provider(speed=60, weather="Clear", time_period="Day").start()
+        if isinstance(self.context, UIContextProvider):
+            for var in (self.speed_var, self.weather_var, self.time_var):
+                var.trace_add("write", self._publish_context)
+
+        # Shared with the Streamlit dashboard and the server; this class only draws and alerts
+        self.detector = FatigueDetector(ear_thresh=ear_thresh, mar_thresh=mar_thresh,
+                                        metrics=self.metrics, context=self.context)
+        self._shown_ear_thresh = self.detector.EAR_THRESH
+        self._shown_mar_thresh = self.detector.MAR_THRESH
 
         self.setup_ui()
+        self.timer.mark("ui ready")
+        if not self.loader.ready:
+            self.status_label.config(text="● Loading model...", fg="#ffa500")
+
+    # ---------- Model Loading ----------
+    def _on_model_ready(self, face_mesh):
+        self.face_mesh = face_mesh
+        if not self.running:
+            self.status_label.config(text="● Ready", fg="#00ff88")
+        print(f"Startup: {self.timer.report()}")
+
+    def _on_model_error(self, error):
+        messagebox.showerror("Missing dependency",
+                             f"Could not load the detection model:\n{error}")
+        self.root.destroy()
+
+    def _model_ready(self):
+        if self.face_mesh is None:
+            messagebox.showinfo("Please wait", "The detection model is still loading.")
+            return False
+        return True
 
     # ---------- UI Setup ----------
     def setup_ui(self):
@@ -143,6 +179,12 @@ class DriverFatigueDashboard:
                                        fg="#ff6b6b", font=("Courier", 14, "bold"))
         self.blink_display.pack(side="left", padx=20)
 
+        # Live EAR/MAR chart, redrawn from the shared metrics buffer
+        self.chart_canvas = tk.Canvas(left_panel, bg="#0f3460", height=140,
+                                      highlightthickness=0)
+        self.chart_canvas.pack(fill="x", padx=15, pady=(0, 15))
+        self.root.after(200, self.refresh_chart)
+
         # RIGHT PANEL - Controls
         right_panel = tk.Frame(main_container, bg="#16213e", relief="ridge", bd=3)
         right_panel.pack(side="right", fill="both", padx=(0, 0))
@@ -206,22 +248,22 @@ class DriverFatigueDashboard:
         # Detection Settings
         settings_frame = self._create_section(controls, "⚙️ Detection Settings")
         
-        tk.Label(settings_frame, text=f"EAR Threshold: {self.EAR_THRESH:.2f}", 
+        tk.Label(settings_frame, text=f"EAR Threshold: {self.detector.EAR_THRESH:.2f}", 
                 bg="#16213e", fg="#aaaaaa", font=("Helvetica", 10)).pack(pady=(5, 2))
         
         self.ear_thresh_scale = ttk.Scale(settings_frame, from_=0.15, to=0.35, 
                                           orient="horizontal", 
                                           command=self._update_ear_threshold)
-        self.ear_thresh_scale.set(self.EAR_THRESH)
+        self.ear_thresh_scale.set(self.detector.EAR_THRESH)
         self.ear_thresh_scale.pack(fill="x", padx=20, pady=(0, 8))
 
-        tk.Label(settings_frame, text=f"MAR Threshold: {self.MAR_THRESH:.2f}", 
+        tk.Label(settings_frame, text=f"MAR Threshold: {self.detector.MAR_THRESH:.2f}", 
                 bg="#16213e", fg="#aaaaaa", font=("Helvetica", 10)).pack(pady=(5, 2))
         
         self.mar_thresh_scale = ttk.Scale(settings_frame, from_=0.5, to=0.8, 
                                           orient="horizontal",
                                           command=self._update_mar_threshold)
-        self.mar_thresh_scale.set(self.MAR_THRESH)
+        self.mar_thresh_scale.set(self.detector.MAR_THRESH)
         self.mar_thresh_scale.pack(fill="x", padx=20, pady=(0, 15))
 
         # Demo mode and calibration
@@ -232,10 +274,16 @@ class DriverFatigueDashboard:
                                      variable=self.demo_mode)
         demo_check.pack(pady=8)
 
-        tk.Button(options_frame, text="📸 CALIBRATE EYES (3s)", 
+        ttk.Checkbutton(options_frame, text="Auto-adapt EAR threshold", 
+                        variable=self.auto_adapt).pack(pady=(0, 8))
+        ttk.Checkbutton(options_frame, text="Low-light boost (auto)", 
+                        variable=self.low_light).pack(pady=(0, 8))
+
+        self.calibrate_btn = tk.Button(options_frame, text="📸 CALIBRATE EYES (3s)", 
                  bg="#3498db", fg="white", font=("Helvetica", 11, "bold"),
                  command=self.calibrate_open_eye, relief="flat",
-                 cursor="hand2").pack(fill="x", padx=20, pady=(8, 15))
+                 cursor="hand2")
+        self.calibrate_btn.pack(fill="x", padx=20, pady=(8, 15))
 
         # Main Control Buttons
         btn_frame = self._create_section(controls, "🎮 System Control")
@@ -262,6 +310,44 @@ class DriverFatigueDashboard:
                                       font=("Courier", 10))
         self.session_label.pack(pady=8)
 
+    # ---------- Live Chart ----------
+    def refresh_chart(self):
+        """Redraw the EAR/MAR chart from the ring buffer on the Tk main thread"""
+        if self.metrics_buffer is None:
+            return
+        canvas = self.chart_canvas
+        canvas.delete("all")
+        w = canvas.winfo_width()
+        h = canvas.winfo_height()
+        t, ear, mar = self.metrics_buffer.snapshot(300)
+
+        if len(t) > 1 and w > 1:
+            t_min, span = t[0], max(t[-1] - t[0], 1e-6)
+            y_max = 1.0
+
+            def to_xy(times, values):
+                xs = (times - t_min) / span * (w - 10) + 5
+                ys = h - 5 - np.clip(values, 0, y_max) / y_max * (h - 10)
+                return xs, ys
+
+            # EAR threshold line
+            _, thr_y = to_xy(np.array([t_min]), np.array([self.detector.EAR_THRESH]))
+            canvas.create_line(0, thr_y[0], w, thr_y[0], fill="#ffa500", dash=(4, 2))
+
+            for values, fill in ((ear, "#00ff88"), (mar, "#3498db")):
+                ok = ~np.isnan(values)
+                if ok.sum() < 2:
+                    continue
+                xs, ys = to_xy(t[ok], values[ok])
+                canvas.create_line(*np.column_stack((xs, ys)).ravel().tolist(),
+                                   fill=fill, width=2)
+
+        canvas.create_text(10, 10, anchor="nw", text="EAR", fill="#00ff88",
+                           font=("Courier", 9, "bold"))
+        canvas.create_text(50, 10, anchor="nw", text="MAR", fill="#3498db",
+                           font=("Courier", 9, "bold"))
+        self.root.after(200, self.refresh_chart)
+
     def _create_section(self, parent, title):
         frame = tk.Frame(parent, bg="#0f3460", relief="solid", bd=1)
         frame.pack(fill="x", padx=15, pady=10)
@@ -285,242 +371,278 @@ class DriverFatigueDashboard:
                          variable=var)
         scale.pack(fill="x", padx=20, pady=(8, 15))
 
+    def _publish_context(self, *_):
+        self.context.publish(self.speed_var.get(), self.weather_var.get(), self.time_var.get())
+
     def _update_ear_threshold(self, val):
-        self.EAR_THRESH = float(val)
+        self.detector.EAR_THRESH = self._shown_ear_thresh = float(val)
 
     def _update_mar_threshold(self, val):
-        self.MAR_THRESH = float(val)
+        self.detector.MAR_THRESH = self._shown_mar_thresh = float(val)
 
     # ---------- Calibration ----------
     def calibrate_open_eye(self):
-        if self.running:
-            messagebox.showinfo("Calibration", "Please stop detection first.")
-            return
-        
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            messagebox.showerror("Error", "Camera not available")
+        """Calibrate from the live stream, starting monitoring first if needed"""
+        if not self._model_ready():
             return
-        
-        messagebox.showinfo("Calibration", 
-                           "Keep your eyes WIDE OPEN and look straight ahead.\n"
-                           "Calibration will run for 3 seconds.")
-        
-        ear_vals = []
-        start = time.time()
-        
-        while time.time() - start < 3:
-            ret, frame = cap.read()
-            if not ret:
-                continue
-            ear = self._compute_frame_ear(frame)
-            if ear is not None and ear > 0.1:  # Filter out bad readings
-                ear_vals.append(ear)
-            time.sleep(0.03)
-        
-        cap.release()
-        
-        if len(ear_vals) < 10:
-            messagebox.showerror("Calibration", 
-                               "Not enough data. Face not detected properly.")
+        if self.calibration is not None and self.calibration.active:
             return
-        
-        # Remove outliers
-        ear_vals = sorted(ear_vals)
-        ear_vals = ear_vals[len(ear_vals)//4:-len(ear_vals)//4]  # Remove top/bottom 25%
-        
-        self.base_open_ear = np.mean(ear_vals)
-        self.EAR_THRESH = max(0.18, self.base_open_ear * 0.65)  # More sensitive
-        
-        self.ear_thresh_scale.set(self.EAR_THRESH)
-        
+
+        if not self.running:
+            self.start_detection()
+            if not self.running:
+                return
+
+        # Callbacks fire on the detection thread; hop to Tk before touching widgets
+        self.calibration = CalibrationSession(
+            on_progress=lambda frac: self.root.after(0, self._on_calibration_progress, frac),
+            on_complete=lambda base, thresh: self.root.after(
+                0, self._on_calibration_complete, base, thresh),
+            on_error=lambda msg: self.root.after(0, self._on_calibration_error, msg)
+        )
+        self.calibrate_btn.config(text="📸 CALIBRATING... 0%", state="disabled")
+        self.status_label.config(text="● Keep eyes WIDE OPEN", fg="#3498db")
+
+    def _on_calibration_progress(self, fraction):
+        self.calibrate_btn.config(text=f"📸 CALIBRATING... {int(fraction * 100)}%")
+
+    def _on_calibration_complete(self, base_open_ear, ear_thresh):
+        self._reset_calibrate_button()
+        self.base_open_ear = base_open_ear
+        self.detector.EAR_THRESH = ear_thresh
+        if self.profile:
+            # Use the smoothed long-term baseline rather than this one reading
+            record_calibration(self.profile, base_open_ear, ear_thresh)
+            self.base_open_ear = self.profile['base_open_ear']
+            self.detector.EAR_THRESH = self.profile['ear_thresh']
+            self.save_driver_profile()
+        self.online_baseline.reset(self.base_open_ear)
+        self.ear_thresh_scale.set(self.detector.EAR_THRESH)
+
         messagebox.showinfo("Calibration", 
                            f"✓ Calibration Complete!\n\n"
                            f"Your open-eye EAR: {self.base_open_ear:.3f}\n"
-                           f"Alert threshold: {self.EAR_THRESH:.3f}\n\n"
+                           f"Alert threshold: {self.detector.EAR_THRESH:.3f}\n\n"
                            f"The system will alert if EAR drops below this threshold.")
 
+    def _on_calibration_error(self, message):
+        self._reset_calibrate_button()
+        messagebox.showerror("Calibration", message)
+
+    def _reset_calibrate_button(self):
+        self.calibrate_btn.config(text="📸 CALIBRATE EYES (3s)", state="normal")
+
+    # ---------- Driver Profile ----------
+    def save_driver_profile(self):
+        if not self.profile:
+            return
+        self.profile['ear_thresh'] = self.detector.EAR_THRESH
+        if self.online_baseline.base_open_ear is not None:
+            self.profile['base_open_ear'] = self.online_baseline.base_open_ear
+        self.profile['mar_thresh'] = self.detector.MAR_THRESH
+        merge_ear_stats(self.profile, self.session_ear_stats)
+        self.session_ear_stats = RunningStats()
+        try:
+            save_profile(self.profile)
+        except OSError as e:
+            print(f"Could not save driver profile: {e}")
+
     # ---------- Start/Stop Detection ----------
     def start_detection(self):
-        if self.running:
+        if self.running or not self._model_ready():
             return
+        self._sync_config()
         
         if self.demo_mode.get():
             video_path = "driver_demo.mp4"
             if not os.path.exists(video_path):
                 messagebox.showerror("Error", "Demo video 'driver_demo.mp4' not found")
                 return
-            self.cap = cv2.VideoCapture(video_path)
+            self.cap = CaptureManager(video_path, loop=True, metrics=self.metrics)
         else:
-            self.cap = cv2.VideoCapture(0)
+            capture = self.config.capture
+            self.cap = CaptureManager(0, metrics=self.metrics,
+                                      config=CaptureConfig(*capture.desktop_size, capture.fps))
         
-        if not self.cap.isOpened():
+        if not self.cap.open():
             messagebox.showerror("Error", "Cannot access camera/video")
             return
         
         self.running = True
         self.session_start = time.time()
-        self.total_alerts = 0
-        self.consecutive_drowsy = 0
+        self.telemetry = self.detector.telemetry = TelemetryRecorder()
+        self.summary = SessionSummary(self.session_start)
+        self.detector.reset()
         self.status_label.config(text="● Monitoring...", fg="#00ff88")
         
+        self.metrics.running(True)
         threading.Thread(target=self.update_video_feed, daemon=True).start()
         threading.Thread(target=self.update_session_info, daemon=True).start()
 
     def stop_detection(self):
         self.running = False
-        self.eyes_closed_start = None
-        self.yawn_start = None
-        self.ear_history.clear()
-        self.consecutive_drowsy = 0
+        self.metrics.running(False)
+        self.save_driver_profile()
+        if self.calibration is not None and self.calibration.active:
+            self.calibration.cancel()
+            self._reset_calibrate_button()
         self.status_label.config(text="● Stopped", fg="#ff6b6b")
+        self.show_session_summary()
+
+    def show_session_summary(self):
+        """Report the finished session (aggregated while running) and save it"""
+        if not self.summary:
+            return
+        report = self.summary.report(time.time())
+        self.summary = None
+        path = export_report(report, new_summary_path("json"))
+        export_report(report, path[:-len("json")] + "csv")
+        messagebox.showinfo("Session Summary",
+                            "\n".join(format_report(report)) + f"\n\nSaved to {path}")
+
+    # ---------- Live Configuration ----------
+    def _on_backend_rebuilt(self, face_mesh):
+        # A rebuild the video loop never picked up is superseded by this one
+        with self._backend_lock:
+            old, self._next_face_mesh = self._next_face_mesh, face_mesh
+        if old is not None:
+            old.close()
+
+    def _sync_config(self):
+        """Apply a reloaded config on the video thread, between two frames.
+
+        The detector applies detection settings itself; here the rebuilt
+        backend is swapped in and the capture size picked up.
+        """
+        with self._backend_lock:
+            new, self._next_face_mesh = self._next_face_mesh, None
+        if new is not None:
+            old, self.face_mesh = self.face_mesh, new
+            if old is not None:
+                old.close()
+        self.detector.face_mesh = self.face_mesh
+        self.config = current_config()
+
+    def _show_thresholds(self):
+        """Move the sliders to thresholds changed by auto-adapt or a config reload"""
+        if abs(self.detector.EAR_THRESH - self._shown_ear_thresh) > 0.005:
+            self._shown_ear_thresh = self.detector.EAR_THRESH
+            self.root.after(0, self.ear_thresh_scale.set, self.detector.EAR_THRESH)
+        if self.detector.MAR_THRESH != self._shown_mar_thresh:
+            self._shown_mar_thresh = self.detector.MAR_THRESH
+            self.root.after(0, self.mar_thresh_scale.set, self.detector.MAR_THRESH)
 
     # ---------- Video Feed & Detection ----------
+    def _describe(self, result):
+        """Status text, label colour and overlay colour for a detector result"""
+        status = result["status"]
+        closed, off_road = result["closed_secs"], result["off_road_secs"]
+        if status == "NO_FACE":
+            return "NO FACE", "#ff6b6b", (0, 165, 255)
+        if status == "EYES_CLOSING":
+            return f"Drowsy... ({closed:.1f}s)", "#ffa500", (0, 165, 255)
+        if status == "EYES_OFF_ROAD":
+            return f"Eyes off road... ({off_road:.1f}s)", "#ffa500", (0, 165, 255)
+        if status == "DROWSINESS":
+            return f"⚠️ EYES CLOSED ({closed:.1f}s)", "#ff0000", (0, 0, 255)
+        if status == "DISTRACTION":
+            return f"⚠️ EYES OFF ROAD ({off_road:.1f}s)", "#ff0000", (0, 0, 255)
+        if status == "YAWNING":
+            return "⚠️ YAWNING DETECTED", "#ff0000", (0, 0, 255)
+        if status == "NODDING":
+            return "⚠️ HEAD NOD DETECTED", "#ff0000", (0, 0, 255)
+        return "ATTENTIVE", "#00ff88", (0, 255, 0)
+
     def update_video_feed(self):
+        detector = self.detector
         while self.running:
-            ret, frame = self.cap.read()
-            if not ret:
-                if self.demo_mode.get():
-                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Loop demo video
-                    continue
-                break
-
-            frame = cv2.resize(frame, (800, 600))
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = self.face_mesh.process(frame_rgb)
-            
-            avg_ear = None
-            mar = None
-
-            if results.multi_face_landmarks:
-                lm = results.multi_face_landmarks[0]
-                h, w = frame.shape[:2]
-
-                # Eyes
-                left_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) 
-                           for i in L_EYE]
-                right_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) 
-                            for i in R_EYE]
-                
-                left_ear = eye_aspect_ratio(left_pts)
-                right_ear = eye_aspect_ratio(right_pts)
-                avg_ear = (left_ear + right_ear) / 2.0
-
-                # Mouth
-                up = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) 
-                     for i in UPPER_LIP]
-                low = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) 
-                      for i in LOWER_LIP]
-                left_mouth = (int(lm.landmark[LEFT_MOUTH].x * w), 
-                             int(lm.landmark[LEFT_MOUTH].y * h))
-                right_mouth = (int(lm.landmark[RIGHT_MOUTH].x * w), 
-                              int(lm.landmark[RIGHT_MOUTH].y * h))
-                mar = mouth_aspect_ratio(up, low, left_mouth, right_mouth)
+            self._sync_config()
+            t_capture = time.perf_counter()
+            frame = self.cap.read()
+            if frame is None:
+                if self.cap.is_file:
+                    break
+                if not self.cap.connected:
+                    # Keep monitoring; the capture manager reconnects in the background
+                    self.status_label.config(text=f"● {CAMERA_LOST} - reconnecting...",
+                                             fg="#ff6b6b")
+                    detector.camera_lost()
+                continue
+
+            frame = fit_frame(frame, self.config.capture.desktop_size)
+            self.clip_recorder.add_frame(frame)
+            t_preprocess = time.perf_counter()
+            detector.enhancer.enabled = self.low_light.get()
+            frame_rgb, lm = detector.detect(frame)
+            t_logic = time.perf_counter()
+
+            h, w = frame.shape[:2]
+            current_time = time.time()
+            result = detector.process_landmarks(lm, w, h, current_time)
+            smooth_ear, mar = result["ear"], result["mar"]
 
+            if lm is not None:
                 # Draw eye contours
+                left_pts = landmark_points(lm, L_EYE, w, h)
+                right_pts = landmark_points(lm, R_EYE, w, h)
                 cv2.polylines(frame, [np.array(left_pts)], True, (0, 255, 0), 1)
                 cv2.polylines(frame, [np.array(right_pts)], True, (0, 255, 0), 1)
-                
+
                 # Draw mouth
+                left_mouth, right_mouth = landmark_points(lm, [LEFT_MOUTH, RIGHT_MOUTH], w, h)
                 cv2.line(frame, left_mouth, right_mouth, (255, 0, 0), 2)
-                for pt in up + low:
+                for pt in landmark_points(lm, UPPER_LIP + LOWER_LIP, w, h):
                     cv2.circle(frame, pt, 2, (255, 0, 0), -1)
 
-            # Minimal smoothing for faster response
-            if avg_ear is not None:
-                self.ear_history.append(avg_ear)
-                smooth_ear = np.mean(self.ear_history)
-            else:
-                smooth_ear = None
-                self.ear_history.clear()
+            # Calibration piggybacks on the live stream
+            if self.calibration is not None and self.calibration.active:
+                self.calibration.feed(result["frame_ear"])
 
             # Store for display
-            current_time = time.time()
             if smooth_ear is not None:
                 self.ear_values.append(smooth_ear)
                 self.timestamps.append(current_time)
             if mar is not None:
                 self.mar_values.append(mar)
+            self.metrics_buffer.push(current_time, smooth_ear, mar)
+
+            # Attentive frames keep the open-eye baseline current
+            if result["face"] and detector.eyes_closed_start is None:
+                self.session_ear_stats.add(smooth_ear)
+                if self.auto_adapt.get() and detector.yawn_start is None:
+                    detector.EAR_THRESH = self.online_baseline.update(smooth_ear,
+                                                                      detector.EAR_THRESH)
+            self._show_thresholds()
+
+            status_text, status_color, color = self._describe(result)
+
+            # Alerts are debounced by the detector
+            if result["alert"]:
+                beep()
+                clip = self.clip_recorder.trigger(result["alert"])
+                self.log_event(smooth_ear, mar, result["alert"], clip)
+
+                # Flash effect
+                cv2.rectangle(frame, (0, 0), (w, h), (0, 0, 255), 20)
+
+            if self.summary:
+                self.summary.update(current_time, result["status"], smooth_ear,
+                                    detector.EAR_THRESH, detector.speed, result["alert"])
 
-            # Detection logic
-            threshold_time = get_fatigue_threshold(
-                self.speed_var.get(), 
-                self.weather_var.get(), 
-                self.time_var.get()
-            )
-
-            alert = False
-            color = (0, 255, 0)
-            status_text = "ATTENTIVE"
-            status_color = "#00ff88"
-
-            if smooth_ear is None:
-                status_text = "NO FACE"
-                status_color = "#ff6b6b"
-                color = (0, 165, 255)
-                self.eyes_closed_start = None
-                self.consecutive_drowsy = 0
-            else:
-                # Eyes closed detection - IMPROVED
-                if smooth_ear < self.EAR_THRESH:
-                    if self.eyes_closed_start is None:
-                        self.eyes_closed_start = time.time()
-                    
-                    elapsed = time.time() - self.eyes_closed_start
-                    
-                    if elapsed > threshold_time:
-                        alert = True
-                        status_text = f"⚠️ EYES CLOSED ({elapsed:.1f}s)"
-                        self.consecutive_drowsy += 1
-                    else:
-                        status_text = f"Drowsy... ({elapsed:.1f}s)"
-                        status_color = "#ffa500"
-                        color = (0, 165, 255)
-                else:
-                    self.eyes_closed_start = None
-                    self.consecutive_drowsy = max(0, self.consecutive_drowsy - 1)
-
-                # Yawn detection
-                if mar is not None and mar > self.MAR_THRESH:
-                    if self.yawn_start is None:
-                        self.yawn_start = time.time()
-                    
-                    yawn_duration = time.time() - self.yawn_start
-                    if yawn_duration > 1.0:  # Yawn for more than 1 second
-                        alert = True
-                        status_text = "⚠️ YAWNING DETECTED"
-                else:
-                    self.yawn_start = None
-
-                # Trigger alert
-                if alert:
-                    status_color = "#ff0000"
-                    color = (0, 0, 255)
-                    self.total_alerts += 1
-                    
-                    # Sound alert
-                    try:
-                        winsound.Beep(1000, 500)
-                    except:
-                        pass
-                    
-                    self.log_event(smooth_ear, mar)
-                    
-                    # Flash effect
-                    cv2.rectangle(frame, (0, 0), (w, h), (0, 0, 255), 20)
+            t_render = time.perf_counter()
 
             # Update UI labels
             self.status_label.config(text=f"● {status_text}", fg=status_color)
             self.ear_display.config(text=f"EAR: {smooth_ear:.3f}" if smooth_ear else "EAR: --")
             self.mar_display.config(text=f"MAR: {mar:.3f}" if mar else "MAR: --")
-            self.blink_display.config(text=f"Alerts: {self.total_alerts}")
+            self.blink_display.config(text=f"Alerts: {detector.total_alerts}")
 
             # Draw on frame
             cv2.putText(frame, f"EAR: {smooth_ear:.3f}" if smooth_ear else "EAR: --", 
                        (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2)
             cv2.putText(frame, f"MAR: {mar:.3f}" if mar else "MAR: --", 
                        (20, 80), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 2)
-            cv2.putText(frame, f"Threshold: {self.EAR_THRESH:.3f}", 
+            cv2.putText(frame, f"Threshold: {detector.EAR_THRESH:.3f}", 
                        (20, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
 
             # Convert for Tkinter
@@ -529,10 +651,22 @@ class DriverFatigueDashboard:
             self.video_label.imgtk = imgtk
             self.video_label.configure(image=imgtk)
 
+            if self.timer.elapsed("first frame") is None:
+                self.timer.mark("first frame")
+                print(f"Startup: {self.timer.report()}")
+
+            t_done = time.perf_counter()
+            self.metrics.observe_stage("capture", t_preprocess - t_capture)
+            self.metrics.observe_stage("logic", t_render - t_logic)
+            self.metrics.observe_stage("render", t_done - t_render)
+
             time.sleep(0.03)
 
         if self.cap:
             self.cap.release()
+        if self.telemetry:
+            self.detector.telemetry = None
+            self.telemetry.close()
 
     # ---------- Session Info Update ----------
     def update_session_info(self):
@@ -541,58 +675,51 @@ class DriverFatigueDashboard:
             mins = elapsed // 60
             secs = elapsed % 60
             self.session_label.config(text=f"Duration: {mins:02d}:{secs:02d}")
+            if not isinstance(self.context, UIContextProvider):
+                # Mirror an external feed in the controls
+                ctx = self.context.snapshot
+                self.speed_var.set(round(ctx.speed))
+                self.weather_var.set(ctx.weather)
+                self.time_var.set(ctx.time_period)
             time.sleep(1)
 
-    # ---------- Compute EAR ----------
-    def _compute_frame_ear(self, frame):
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(frame_rgb)
-        if not results.multi_face_landmarks:
-            return None
-        
-        lm = results.multi_face_landmarks[0]
-        h, w = frame.shape[:2]
-        
-        left_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) 
-                   for i in L_EYE]
-        right_pts = [(int(lm.landmark[i].x * w), int(lm.landmark[i].y * h)) 
-                    for i in R_EYE]
-        
-        l_ear = eye_aspect_ratio(left_pts)
-        r_ear = eye_aspect_ratio(right_pts)
-        
-        if l_ear > 0 and r_ear > 0:
-            return (l_ear + r_ear) / 2
-        elif l_ear > 0:
-            return l_ear
-        elif r_ear > 0:
-            return r_ear
-        else:
-            return None
-
     # ---------- Log Event ----------
-    def log_event(self, ear, mar):
+    def log_event(self, ear, mar, alert_type=None, clip=None):
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        with open("fatigue_log.txt", "a") as f:
-            f.write(f"{timestamp} | ALERT #{self.total_alerts} | "
+        ctx = self.context.snapshot
+        with open(LOG_FILE, "a") as f:
+            f.write(f"{timestamp} | ALERT #{self.detector.total_alerts} | "
                    f"EAR={ear:.3f} | MAR={mar:.3f} | "
-                   f"Speed={int(self.speed_var.get())} km/h | "
-                   f"Weather={self.weather_var.get()} | "
-                   f"Time={self.time_var.get()}\n")
+                   f"Speed={int(ctx.speed)} km/h | "
+                   f"Weather={ctx.weather} | "
+                   f"Time={ctx.time_period}"
+                   + (f" | Type={alert_type}" if alert_type else "")
+                   + (f" | Clip={clip}" if clip else "") + "\n")
 
     # ---------- Close System ----------
     def close_system(self):
         self.running = False
+        self.save_driver_profile()
         if self.cap:
             self.cap.release()
+        self._stop_rebuilds()
         try:
-            self.face_mesh.close()
+            if self.face_mesh:
+                self.face_mesh.close()
+            if self._next_face_mesh:
+                self._next_face_mesh.close()
         except:
             pass
+        self.metrics_buffer.close()
+        self.metrics_buffer = None
+        self.clip_recorder.close()
+        self.context.stop()
+        if self.telemetry:
+            self.telemetry.close()
         self.root.destroy()
 
 # ============ MAIN ============
 if __name__ == "__main__":
     root = tk.Tk()
-    app = DriverFatigueDashboard(root)
+    app = DriverFatigueDashboard(root, driver=driver_from_argv())
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""Per-driver calibration profiles.
+
+Each driver gets one small JSON file under PROFILE_DIR named after their
+username, so loading a profile at login is a single file read regardless of
+how many drivers the unit has seen. Writes go to a temp file and are moved
+into place with os.replace so a power cut never leaves a half-written
+profile behind.
+"""
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+from urllib.parse import quote
+
+# ---------- Configuration ----------
+PROFILE_DIR = "profiles"
+BASELINE_WEIGHT = 0.3   # Weight of a new calibration against the long-term baseline
+
+
+# ---------- Helper Functions ----------
+def profile_path(username):
+    return os.path.join(PROFILE_DIR, quote(username, safe="") + ".json")
+
+def new_profile(username):
+    return {
+        'username': username,
+        'base_open_ear': None,
+        'ear_thresh': None,
+        'mar_thresh': None,
+        'calibrations': 0,
+        'ear_stats': {'count': 0, 'mean': 0.0, 'm2': 0.0},
+        'updated_at': None
+    }
+
+def load_profile(username):
+    """Load a driver's profile, or a blank one if they have never calibrated"""
+    try:
+        with open(profile_path(username), 'r') as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return new_profile(username)
+    # Tolerate profiles written by older versions
+    return {**new_profile(username), **profile}
+
+def save_profile(profile):
+    """Atomically write a profile to disk"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile['updated_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    fd, tmp_path = tempfile.mkstemp(dir=PROFILE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(profile, f, indent=4)
+        os.replace(tmp_path, profile_path(profile['username']))
+    except:
+        os.unlink(tmp_path)
+        raise
+
+def record_calibration(profile, base_open_ear, ear_thresh):
+    """Blend a fresh calibration into the driver's long-term baseline"""
+    if profile['base_open_ear'] is None:
+        profile['base_open_ear'] = base_open_ear
+        profile['ear_thresh'] = ear_thresh
+    else:
+        w = BASELINE_WEIGHT
+        profile['base_open_ear'] = (1 - w) * profile['base_open_ear'] + w * base_open_ear
+        profile['ear_thresh'] = (1 - w) * profile['ear_thresh'] + w * ear_thresh
+    profile['calibrations'] += 1
+    return profile
+
+def merge_ear_stats(profile, stats):
+    """Fold a session's running EAR statistics into the profile (Chan et al. merge)"""
+    total = profile['ear_stats']
+    if stats.count == 0:
+        return profile
+    n = total['count'] + stats.count
+    delta = stats.mean - total['mean']
+    total['mean'] += delta * stats.count / n
+    total['m2'] += stats.m2 + delta * delta * total['count'] * stats.count / n
+    total['count'] = n
+    return profile
+
+def driver_from_argv(argv=None):
+    """Return the value of a `--driver NAME` argument, if present"""
+    argv = sys.argv if argv is None else argv
+    if "--driver" in argv:
+        i = argv.index("--driver")
+        if i + 1 < len(argv):
+            return argv[i + 1]
+    return None
+
+
+# ---------- Session Statistics ----------
+class RunningStats:
+    """Welford running mean/variance with O(1) memory"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else 0.0
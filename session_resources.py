@@ -0,0 +1,68 @@
+"""Per-browser-session resources for the Streamlit pages.
+
+Objects that own threads or shared memory (the alert clip recorder, the
+metrics ring buffer) must not be shared between sessions, and must be
+closed when their session goes away. Streamlit has no session-end
+callback: a closed tab only disconnects, and the session is dropped later.
+`session_resource()` keeps one object per session id and name, `release()`
+closes one early (stop, leaving the page), and a reaper thread per process
+closes everything a session still holds once the runtime no longer lists
+it as active.
+"""
+import threading
+import time
+
+# ---------- Configuration ----------
+REAP_CHECK_SECS = 5.0
+
+_resources = {}      # session id -> {name: object with close()}
+_lock = threading.Lock()
+_reaper = None
+
+
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    return get_script_run_ctx().session_id
+
+
+# ---------- API ----------
+def session_resource(name, factory):
+    """This session's `name` object, built with factory() on first use"""
+    global _reaper
+    session_id = _session_id()
+    with _lock:
+        owned = _resources.setdefault(session_id, {})
+        if name not in owned:
+            owned[name] = factory()
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reap, daemon=True, name="session-reaper")
+            _reaper.start()
+        return owned[name]
+
+
+def release(name):
+    """Close this session's `name` object now; the next session_resource() builds a new one"""
+    with _lock:
+        resource = _resources.get(_session_id(), {}).pop(name, None)
+    if resource is not None:
+        resource.close()
+
+
+# ---------- Reaper ----------
+def _reap():
+    from streamlit import runtime
+
+    while True:
+        time.sleep(REAP_CHECK_SECS)
+        if not runtime.exists():
+            continue
+        rt = runtime.get_instance()
+        with _lock:
+            ended = [sid for sid in _resources if not rt.is_active_session(sid)]
+            orphans = [_resources.pop(sid) for sid in ended]
+        for owned in orphans:
+            for name, resource in owned.items():
+                try:
+                    resource.close()
+                except Exception as e:
+                    print(f"Could not close session {name}: {e}")
@@ -0,0 +1,163 @@
+"""Trip summary maintained incrementally while detection runs.
+
+`SessionSummary.update()` is called once per frame and only bumps a few
+running totals (time per status, eyes-closed time, closures, alerts per type
+and speed band), so `report()` at the end of a trip costs the same whether
+the drive lasted five minutes or five hours; nothing is re-read from the
+logs. Reports export to JSON or to a flat metric,value CSV:
+
+    summary = SessionSummary()
+    summary.update(now, "ATTENTIVE", ear=0.31, ear_thresh=0.25, speed=60)
+    export_report(summary.report(), "summaries/trip.json")
+"""
+import csv
+import io
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+from fatigue_core import speed_band
+
+# ---------- Configuration ----------
+SUMMARY_DIR = "summaries"
+BLINK_MAX_SECS = 0.5     # Closures shorter than this count as blinks
+MAX_FRAME_GAP = 1.0      # Longer gaps (paused loop, reruns) aren't credited to any status
+
+
+class SessionSummary:
+    """Running aggregates of one monitoring session"""
+
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.time()
+        self.last = None
+        self.status = None
+        self.face = False
+        self.status_secs = Counter()
+        self.alerts = Counter()
+        self.band_alerts = Counter()
+        self.band_secs = Counter()
+        self.face_secs = 0.0
+        self.closed_secs = 0.0
+        self.closure_start = None
+        self.longest_closure = 0.0
+        self.blinks = 0
+
+    def update(self, now, status, ear=None, ear_thresh=None, speed=None, alert=None):
+        """Account the time since the previous frame and fold in this frame's state"""
+        if self.last is not None:
+            dt = now - self.last
+            if 0 < dt <= MAX_FRAME_GAP:
+                self.status_secs[self.status] += dt
+                if speed is not None:
+                    self.band_secs[speed_band(speed)] += dt
+                if self.closure_start is not None:
+                    self.closed_secs += dt
+                if self.face:
+                    self.face_secs += dt
+        # The interval up to this frame belongs to the previous frame's state
+        self.last = now
+        self.status = status
+        self.face = ear is not None
+
+        closed = ear is not None and ear_thresh is not None and ear < ear_thresh
+        if closed and self.closure_start is None:
+            self.closure_start = now
+        elif not closed and self.closure_start is not None:
+            duration = now - self.closure_start
+            self.longest_closure = max(self.longest_closure, duration)
+            # A lost face ends the closure but says nothing about a blink
+            if ear is not None and duration <= BLINK_MAX_SECS:
+                self.blinks += 1
+            self.closure_start = None
+
+        if alert:
+            self.alerts[alert] += 1
+            if speed is not None:
+                self.band_alerts[speed_band(speed)] += 1
+
+    def report(self, now=None):
+        """Snapshot of the session so far as a JSON-friendly dict"""
+        now = now if now is not None else (self.last or self.start)
+        longest = self.longest_closure
+        if self.closure_start is not None:
+            longest = max(longest, now - self.closure_start)
+        face_minutes = self.face_secs / 60.0
+        return {
+            "start": datetime.fromtimestamp(self.start).isoformat(timespec="seconds"),
+            "end": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+            "duration_secs": round(now - self.start, 1),
+            "total_alerts": sum(self.alerts.values()),
+            "alerts": dict(self.alerts),
+            "longest_closure_secs": round(longest, 2),
+            # Share of face-visible time with the eyes below threshold
+            "perclos": round(self.closed_secs / self.face_secs, 4) if self.face_secs else None,
+            "blinks": self.blinks,
+            "blinks_per_min": round(self.blinks / face_minutes, 1) if face_minutes else None,
+            "status_secs": {k: round(v, 1) for k, v in self.status_secs.items()},
+            "speed_bands": {band: {"minutes": round(self.band_secs[band] / 60.0, 1),
+                                   "alerts": self.band_alerts[band]}
+                            for band in sorted(set(self.band_secs) | set(self.band_alerts))},
+        }
+
+
+# ---------- Export ----------
+def flatten(report, prefix=""):
+    """(metric, value) rows with nested keys joined by dots"""
+    rows = []
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            rows.extend(flatten(value, name + "."))
+        else:
+            rows.append((name, value))
+    return rows
+
+
+def write_csv(report, f):
+    """metric,value CSV of a report to an open text file"""
+    writer = csv.writer(f)
+    writer.writerow(["metric", "value"])
+    writer.writerows(flatten(report))
+
+
+def report_csv(report):
+    """The CSV export as a string (for download buttons)"""
+    buf = io.StringIO()
+    write_csv(report, buf)
+    return buf.getvalue()
+
+
+def export_report(report, path):
+    """Write a report as JSON, or as metric,value CSV when the path ends in .csv"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            write_csv(report, f)
+    else:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    return path
+
+
+def new_summary_path(ext="json", directory=SUMMARY_DIR):
+    return os.path.join(directory, datetime.now().strftime("%Y%m%d_%H%M%S") + "." + ext)
+
+
+def format_report(report):
+    """Short human-readable lines for dialogs and the console"""
+    mins, secs = divmod(int(report["duration_secs"]), 60)
+    alerts = ", ".join(f"{k.title()} {v}" for k, v in report["alerts"].items()) or "none"
+    perclos = report["perclos"]
+    lines = [
+        f"Duration: {mins:02d}:{secs:02d}",
+        f"Alerts: {report['total_alerts']} ({alerts})",
+        f"Longest eye closure: {report['longest_closure_secs']:.1f}s",
+        f"PERCLOS: {perclos:.1%}" if perclos is not None else "PERCLOS: --",
+        f"Blinks: {report['blinks']}" + (f" ({report['blinks_per_min']:.1f}/min)"
+                                         if report["blinks_per_min"] is not None else ""),
+    ]
+    for band, row in report["speed_bands"].items():
+        lines.append(f"{band} km/h: {row['minutes']:.1f} min, {row['alerts']} alerts")
+    return lines
@@ -0,0 +1,135 @@
+"""Startup timing and background loading of the detection model.
+
+Import this module first so the timer starts as close to process launch as
+possible. Heavy work (cv2/mediapipe import, landmark backend construction
+and a warm-up pass) runs on a background thread while the UI is being drawn.
+"""
+import threading
+import time
+
+_PROCESS_START = time.perf_counter()
+
+
+# ---------- Startup Timer ----------
+class StartupTimer:
+    """Records named milestones relative to process start"""
+
+    def __init__(self):
+        self.marks = []
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        with self._lock:
+            if name not in dict(self.marks):
+                self.marks.append((name, time.perf_counter() - _PROCESS_START))
+
+    def elapsed(self, name):
+        return dict(self.marks).get(name)
+
+    def report(self):
+        with self._lock:
+            return " | ".join(f"{name} {secs:.2f}s" for name, secs in self.marks)
+
+
+# ---------- Background Model Loader ----------
+class ModelLoader:
+    """Builds and warms up the landmark backend on a daemon thread"""
+
+    def __init__(self, timer=None, preload=None, on_ready=None, on_error=None, backend=None):
+        self.timer = timer or StartupTimer()
+        self.backend = backend
+        self.preload = preload
+        self.on_ready = on_ready
+        self.on_error = on_error
+        self.face_mesh = None
+        self.error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._load, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _load(self):
+        from landmark_backends import create_backend
+
+        try:
+            if self.preload:
+                self.preload()
+            self.timer.mark("modules")
+            face_mesh = create_backend(self.backend)
+            face_mesh.warm_up()
+            self.timer.mark("model warm")
+            self.face_mesh = face_mesh
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+        if self.error is None and self.on_ready:
+            self.on_ready(self.face_mesh)
+        elif self.error is not None and self.on_error:
+            self.on_error(self.error)
+
+    @property
+    def ready(self):
+        return self._done.is_set() and self.error is None
+
+    def wait(self, timeout=None):
+        """Block until loading finishes and return the landmark backend"""
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.face_mesh
+
+
+RETIRE_GRACE_SECS = 5.0      # Frames already inside a replaced backend finish well within this
+
+
+def retire_backend(backend, delay=RETIRE_GRACE_SECS):
+    """Close a replaced backend once detect() calls already using it have returned"""
+    if backend is None:
+        return
+    timer = threading.Timer(delay, backend.close)
+    timer.daemon = True
+    timer.start()
+
+
+def rebuild_on_config_change(on_ready, backend=None, on_error=None):
+    """Build a fresh backend in the background whenever the face mesh settings change.
+
+    MediaPipe fixes its confidences when the graph is built, so a new one is
+    loaded and warmed up while the old one keeps detecting; on_ready gets it
+    to swap in and is responsible for closing the backend it replaces. A
+    build overtaken by a newer one, or finishing after unsubscribing, is
+    closed here instead. Returns the unsubscribe function.
+    """
+    from config import config_store, diff
+
+    store = config_store()
+    state = {"generation": 0, "active": True}
+    lock = threading.Lock()
+
+    def built(generation, face_mesh):
+        with lock:
+            current = state["active"] and generation == state["generation"]
+        if current:
+            on_ready(face_mesh)
+        else:
+            face_mesh.close()
+
+    def changed(old, new):
+        if "face_mesh" in diff(old, new):
+            with lock:
+                state["generation"] += 1
+                generation = state["generation"]
+            ModelLoader(backend=backend, on_ready=lambda fm: built(generation, fm),
+                        on_error=on_error).start()
+
+    def unsubscribe():
+        with lock:
+            state["active"] = False
+        store.unsubscribe(changed)
+
+    store.subscribe(changed)
+    return unsubscribe
@@ -0,0 +1,126 @@
+"""Full-rate per-frame telemetry in a fixed-width binary file.
+
+Each frame becomes one 36-byte record (`TELEMETRY_DTYPE`). Records are
+collected in a preallocated numpy buffer and appended in batches, so the
+detection loop does one small write every couple of seconds. The file is a
+16-byte header followed by raw records, so `load_telemetry` can memory-map
+it straight into a structured array for analysis:
+
+    data = load_telemetry("telemetry/20240101_080000.bin")
+    closed = data["left_ear"] < data["ear_thresh"]
+
+    python telemetry.py telemetry/20240101_080000.bin   # quick summary
+"""
+import os
+import struct
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from detector import STATUSES, ALERT_TYPES
+
+# ---------- Format ----------
+TELEMETRY_DIR = "telemetry"
+MAGIC = b"FTLM"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8x")      # magic, version, record size, reserved
+TELEMETRY_DTYPE = np.dtype([
+    ("t", "<f8"),                # Unix time
+    ("left_ear", "<f4"),         # NaN when no face
+    ("right_ear", "<f4"),
+    ("mar", "<f4"),
+    ("face", "u1"),
+    ("status", "u1"),            # Index into detector.STATUSES
+    ("alert", "u1"),             # Index into detector.ALERT_TYPES (0 = none)
+    ("reserved", "u1"),
+    ("ear_thresh", "<f4"),
+    ("mar_thresh", "<f4"),
+    ("closure_secs", "<f4"),     # Eye-closure threshold in force (inf below 15 km/h)
+])
+BATCH_RECORDS = 64
+
+
+def new_telemetry_path(directory=TELEMETRY_DIR):
+    return os.path.join(directory, datetime.now().strftime("%Y%m%d_%H%M%S") + ".bin")
+
+
+# ---------- Writer ----------
+class TelemetryRecorder:
+    """Buffers records and appends them to disk in batches"""
+
+    def __init__(self, path=None, batch=BATCH_RECORDS):
+        self.path = path or new_telemetry_path()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, "ab")
+        if new_file:
+            self._file.write(HEADER.pack(MAGIC, VERSION, TELEMETRY_DTYPE.itemsize))
+        self._buf = np.zeros(batch, dtype=TELEMETRY_DTYPE)
+        self._n = 0
+        self.records = 0
+
+    def record(self, t, left_ear, right_ear, mar, status, alert=None,
+               ear_thresh=np.nan, mar_thresh=np.nan, closure_secs=np.nan):
+        """Add one frame; status / alert are names from detector.STATUSES / ALERT_TYPES"""
+        rec = self._buf[self._n]
+        rec["t"] = t
+        rec["left_ear"] = np.nan if left_ear is None else left_ear
+        rec["right_ear"] = np.nan if right_ear is None else right_ear
+        rec["mar"] = np.nan if mar is None else mar
+        rec["face"] = left_ear is not None
+        rec["status"] = STATUSES.index(status)
+        rec["alert"] = ALERT_TYPES.index(alert)
+        rec["ear_thresh"] = ear_thresh
+        rec["mar_thresh"] = mar_thresh
+        rec["closure_secs"] = closure_secs
+        self._n += 1
+        self.records += 1
+        if self._n == len(self._buf):
+            self.flush()
+
+    def flush(self):
+        if self._n and self._file:
+            self._file.write(self._buf[:self._n].tobytes())
+            self._file.flush()
+            self._n = 0
+
+    def close(self):
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+# ---------- Reader ----------
+def load_telemetry(path):
+    """Memory-map a telemetry file as a structured array (read-only)"""
+    with open(path, "rb") as f:
+        magic, version, size = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or size != TELEMETRY_DTYPE.itemsize:
+        raise ValueError(f"{path} is not a version {VERSION} telemetry file")
+    # A crash can leave a partial final record; map whole records only
+    count = (os.path.getsize(path) - HEADER.size) // size
+    if count == 0:
+        return np.zeros(0, dtype=TELEMETRY_DTYPE)
+    return np.memmap(path, dtype=TELEMETRY_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
+
+
+def summarize(data):
+    if len(data) == 0:
+        return "empty"
+    duration = data["t"][-1] - data["t"][0]
+    counts = np.bincount(data["status"], minlength=len(STATUSES))
+    lines = [f"{len(data)} records over {duration:.0f}s "
+             f"({len(data) / max(duration, 1e-9):.1f}/s), face found {data['face'].mean():.1%}"]
+    lines += [f"  {name:14s} {n / len(data):6.1%}" for name, n in zip(STATUSES, counts) if n]
+    alerts = np.bincount(data["alert"], minlength=len(ALERT_TYPES))[1:]
+    lines.append("  alerts: " + (", ".join(f"{name} {n}" for name, n in zip(ALERT_TYPES[1:], alerts)
+                                           if n) or "none"))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(path)
+        print(summarize(load_telemetry(path)))
@@ -0,0 +1,159 @@
+"""Eye-closure threshold policy as data, compiled into a dense lookup table.
+
+The policy lives in threshold_policy.json (or $FATIGUE_THRESHOLD_POLICY) so
+a fleet safety officer can change it without a code release:
+
+    speed_edges     band boundaries in km/h; [15, 40, 80] gives 0-15, 15-40, 40-80, 80+
+    base_secs       seconds per band, null for "never alert" (parked / crawling)
+    weather_factor  multiplier per weather condition (first entry is the fallback)
+    time_factor     multiplier per time period (first entry is the fallback)
+    overrides       optional exact cells: {"band": "80+", "weather": "Storm",
+                    "time_period": "Night", "secs": 1.0}
+
+At load every band x weather x time cell is computed once into a flat
+table, so a lookup is a few list / dict indexings. A watcher thread checks
+the file's mtime every RELOAD_CHECK_SECS and swaps a changed policy in whole;
+an invalid edit is reported and the previous policy stays active.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# ---------- Configuration ----------
+POLICY_FILE = os.environ.get("FATIGUE_THRESHOLD_POLICY", "threshold_policy.json")
+RELOAD_CHECK_SECS = 2.0
+MAX_SPEED = 300              # Speeds at or above this share the top band's entry
+
+# The rules get_fatigue_threshold always had; used when no policy file exists
+DEFAULT_POLICY = {
+    "speed_edges": [15, 40, 80],
+    "base_secs": [None, 3.0, 2.0, 1.5],
+    "weather_factor": {"Clear": 1.0, "Fog": 0.8, "Rain": 0.8, "Storm": 0.8},
+    "time_factor": {"Day": 1.0, "Night": 0.7},
+    "overrides": [],
+}
+
+
+def band_labels(edges):
+    bounds = [0] + list(edges)
+    return [f"{lo}-{hi}" for lo, hi in zip(bounds, bounds[1:])] + [f"{bounds[-1]}+"]
+
+
+class ThresholdPolicy:
+    """Compiled policy; immutable, replaced as a whole on reload"""
+
+    def __init__(self, spec, source="default"):
+        self.source = source
+        edges = [int(e) for e in spec["speed_edges"]]
+        if edges != sorted(edges) or (edges and edges[0] <= 0):
+            raise ValueError("speed_edges must be increasing positive integers")
+        self.bands = band_labels(edges)
+        base = [float("inf") if v is None else float(v) for v in spec["base_secs"]]
+        if len(base) != len(self.bands):
+            raise ValueError(f"base_secs needs {len(self.bands)} entries, one per speed band")
+        self.weathers = list(spec["weather_factor"])
+        self.time_periods = list(spec["time_factor"])
+        if not self.weathers or not self.time_periods:
+            raise ValueError("weather_factor and time_factor need at least one entry")
+
+        # table[band, weather, time]
+        weather = np.array([float(spec["weather_factor"][w]) for w in self.weathers])
+        period = np.array([float(spec["time_factor"][t]) for t in self.time_periods])
+        table = np.array(base)[:, None, None] * weather[None, :, None] * period[None, None, :]
+        for cell in spec.get("overrides", []):
+            secs = cell["secs"]
+            table[self.bands.index(cell["band"]), self.weathers.index(cell["weather"]),
+                  self.time_periods.index(cell["time_period"])] = \
+                float("inf") if secs is None else float(secs)
+        self.table = table
+
+        self._flat = table.ravel().tolist()
+        self._band_of = [0] * MAX_SPEED
+        for i, edge in enumerate(edges):
+            for s in range(min(edge, MAX_SPEED), MAX_SPEED):
+                self._band_of[s] = i + 1
+        n_time = len(self.time_periods)
+        self._weather_offset = {}
+        for i, w in enumerate(self.weathers):
+            self._weather_offset[w] = self._weather_offset[w.lower()] = i * n_time
+        self._time_index = {}
+        for i, t in enumerate(self.time_periods):
+            self._time_index[t] = self._time_index[t.lower()] = i
+        self._band_stride = len(self.weathers) * n_time
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f), source=path)
+
+    def lookup(self, speed, weather, time_period):
+        """Seconds of eye closure allowed; unknown conditions use the first weather / time entry"""
+        s = int(speed)
+        band = self._band_of[s] if 0 <= s < MAX_SPEED else (0 if s < 0 else self._band_of[-1])
+        w = self._weather_offset.get(weather)
+        if w is None:
+            w = self._weather_offset.get(str(weather).lower(), 0)
+        t = self._time_index.get(time_period)
+        if t is None:
+            t = self._time_index.get(str(time_period).lower(), 0)
+        return self._flat[band * self._band_stride + w + t]
+
+
+# ---------- Hot Reload ----------
+class PolicyStore:
+    """Current policy for a file; a watcher thread swaps in a new one when the file changes"""
+
+    def __init__(self, path=POLICY_FILE):
+        self.path = path
+        self.policy = ThresholdPolicy(DEFAULT_POLICY)
+        self._mtime = None
+        self.reload_if_changed()
+
+    def start(self):
+        threading.Thread(target=self._watch, daemon=True, name="threshold-policy").start()
+        return self
+
+    def _watch(self):
+        while True:
+            time.sleep(RELOAD_CHECK_SECS)
+            self.reload_if_changed()
+
+    def reload_if_changed(self):
+        """Load the file if its mtime changed; returns True when a new policy was applied"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        if mtime is None:
+            return False
+        try:
+            self.policy = ThresholdPolicy.from_file(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Threshold policy {self.path} not applied, keeping previous: {e}")
+            return False
+        print(f"Threshold policy loaded from {self.path}")
+        return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def active_policy():
+    """The process-wide policy, hot-reloaded from POLICY_FILE"""
+    if _store is None:
+        _start_store()
+    return _store.policy
+
+
+def _start_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PolicyStore().start()
@@ -0,0 +1,165 @@
+"""SQLite-backed user accounts.
+
+Replaces loading and rewriting the whole of users.json on every login.
+Usernames are the primary key and emails carry a unique index, so the
+sign-up uniqueness check is an index hit and a login only updates one row.
+The database runs in WAL mode so several processes can share it, and every
+change is an atomic transaction.
+
+Reads are served from an in-memory copy of the table. The copy is reloaded
+only when another connection has committed (SQLite's `data_version`) or the
+database file has been replaced (inode change); this store's own writes are
+applied to it directly. A login burst is therefore dictionary lookups, not
+disk reads.
+
+On first use the accounts in the legacy users.json are imported.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+# ---------- Configuration ----------
+USER_DB_FILE = "users.db"
+LEGACY_USER_FILE = "users.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username   TEXT PRIMARY KEY,
+    email      TEXT NOT NULL,
+    password   TEXT NOT NULL,
+    full_name  TEXT,
+    created_at TEXT,
+    last_login TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email ON users (email);
+"""
+_FIELDS = ("email", "password", "full_name", "created_at", "last_login")
+
+
+class DuplicateUserError(Exception):
+    """Raised when a username or email is already registered"""
+
+    def __init__(self, field):
+        super().__init__(field)
+        self.field = field
+
+
+# ---------- User Store ----------
+class UserStore:
+    """Thread-safe, cached access to the users table"""
+
+    def __init__(self, path=USER_DB_FILE, legacy_path=LEGACY_USER_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inode = None
+        self._users = None
+        self._emails = None
+        self._version = None
+        with self._lock:
+            self._connect()
+            self._import_legacy(legacy_path)
+
+    def _connect(self):
+        """Return the shared connection, reopening it (and ensuring the schema) if the file was replaced"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            inode = None
+        if self._conn is None or inode != self._inode:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # A deleted file comes back empty; every new connection gets the schema
+            with self._conn:
+                self._conn.executescript(_SCHEMA)
+            self._inode = os.stat(self.path).st_ino
+            self._users = None
+        return self._conn
+
+    def _import_legacy(self, legacy_path):
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        conn = self._conn
+        if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                users = json.load(f)
+        except (OSError, ValueError):
+            return
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO users (username, email, password, full_name, "
+                "created_at, last_login) VALUES (?, ?, ?, ?, ?, ?)",
+                [(name, *(data.get(k) for k in _FIELDS)) for name, data in users.items()]
+            )
+
+    # ---------- Cache ----------
+    def _cached(self):
+        """Return (users, emails); caller holds the lock"""
+        conn = self._connect()
+        # data_version only changes when *another* connection commits
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if self._users is None or version != self._version:
+            rows = conn.execute("SELECT * FROM users").fetchall()
+            self._users = {row["username"]: _row_to_user(row) for row in rows}
+            self._emails = {user["email"] for user in self._users.values()}
+            self._version = version
+        return self._users, self._emails
+
+    def invalidate(self):
+        with self._lock:
+            self._users = None
+
+    # ---------- Queries ----------
+    def get(self, username):
+        """Return a copy of a user's record, or None"""
+        with self._lock:
+            user = self._cached()[0].get(username)
+        return dict(user) if user is not None else None
+
+    def email_exists(self, email):
+        with self._lock:
+            return email in self._cached()[1]
+
+    def all_users(self):
+        """Return {username: record} for every account"""
+        with self._lock:
+            return {name: dict(user) for name, user in self._cached()[0].items()}
+
+    # ---------- Updates ----------
+    def add(self, username, user):
+        """Insert a new account; raises DuplicateUserError on username/email clash"""
+        record = {k: user.get(k) for k in _FIELDS}
+        with self._lock:
+            users, emails = self._cached()
+            conn = self._conn
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT INTO users (username, email, password, full_name, "
+                        "created_at, last_login) VALUES (?, ?, ?, ?, ?, ?)",
+                        (username, *record.values())
+                    )
+            except sqlite3.IntegrityError as e:
+                raise DuplicateUserError("email" if "email" in str(e) else "username")
+            users[username] = record
+            emails.add(record["email"])
+
+    def touch_login(self, username, timestamp):
+        with self._lock:
+            users, _ = self._cached()
+            with self._conn as conn:
+                conn.execute("UPDATE users SET last_login = ? WHERE username = ?",
+                             (timestamp, username))
+            if username in users:
+                users[username] = {**users[username], 'last_login': timestamp}
+
+
+def _row_to_user(row):
+    return {k: row[k] for k in _FIELDS}